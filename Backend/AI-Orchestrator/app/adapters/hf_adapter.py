@@ -1,8 +1,56 @@
-from typing import List, Any
+from typing import List, Any, AsyncIterator
 import httpx
 import asyncio
+import weakref
 
+from app.adapters.streaming import iter_chat_completion_deltas
 from app.config import settings
+from app.http_pool import get_async_client
+from app.model_registry import EMBEDDING, TEXT_GENERATION, get_model_registry
+from app.singleflight import SingleFlight
+
+# Concurrent identical embedding requests share one call (e.g. a burst of the same query)
+_embed_flights = SingleFlight()
+
+# HF_EMBED_MAX_CONCURRENCY bounds the feature-extraction requests in flight across all embed
+# calls of an event loop (semaphores are bound to the loop that uses them).
+_embed_limits: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = weakref.WeakKeyDictionary()
+
+
+def _get_embed_limit() -> asyncio.Semaphore:
+    loop = asyncio.get_running_loop()
+    limit = _embed_limits.get(loop)
+    if limit is None:
+        limit = asyncio.Semaphore(max(1, settings.HF_EMBED_MAX_CONCURRENCY))
+        _embed_limits[loop] = limit
+    return limit
+
+
+def _chat_client() -> httpx.AsyncClient:
+    """Shared keep-alive client for the generation endpoints (router and legacy Inference API)."""
+    return get_async_client(
+        "hf-chat",
+        timeout=120.0,
+        max_connections=settings.HF_HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.HF_HTTP_MAX_KEEPALIVE,
+    )
+
+
+def _pool_embedding(item: Any) -> List[float]:
+    """Reduce one feature-extraction result to a sentence vector.
+
+    Sentence-transformers models return a flat vector per input; token-level models return
+    a matrix of token vectors which is mean-pooled.
+    """
+    import numpy as np
+
+    arr = np.asarray(item, dtype=float)
+    if arr.ndim == 1:
+        return arr.tolist()
+    if arr.ndim == 2:
+        return arr.mean(axis=0).tolist()
+    # sometimes returns nested shape, attempt flatten
+    return arr.reshape(-1).tolist()
 
 
 class HFAdapter:
@@ -11,6 +59,12 @@ class HFAdapter:
         self.default_model = default_model or settings.HF_DEFAULT_MODEL
         self.embedding_model = embedding_model or settings.HF_EMBEDDING_MODEL
 
+    def embedding_model_name(self) -> str:
+        """Name of the model `embed` will actually use (remote or local fallback)."""
+        if self.api_key:
+            return self.embedding_model
+        return settings.HF_LOCAL_EMBEDDING_MODEL or settings.HF_LOCAL_MODEL or self.embedding_model
+
     async def generate(self, prompt: str, model: str | None = None, stream: bool = False) -> str:
         """Generate text using Hugging Face Inference Providers API (router.huggingface.co).
 
@@ -39,27 +93,27 @@ class HFAdapter:
                 "stream": False
             }
             
-            async with httpx.AsyncClient(timeout=120.0) as client:
+            client = _chat_client()
+            resp = await client.post(url, json=payload, headers=headers)
+            
+            # Handle common errors
+            if resp.status_code == 503:
+                # Model loading, retry once
+                await asyncio.sleep(5)
                 resp = await client.post(url, json=payload, headers=headers)
-                
-                # Handle common errors
-                if resp.status_code == 503:
-                    # Model loading, retry once
-                    await asyncio.sleep(5)
-                    resp = await client.post(url, json=payload, headers=headers)
-                
-                if resp.status_code == 404:
-                    return f"[Modelo {model} no encontrado. Verifique HF_DEFAULT_MODEL]"
-                
-                if resp.status_code in (401, 403):
-                    return "[Error de autenticación con HuggingFace. Verifique su HUGGINGFACE_API_KEY]"
-                
-                if resp.status_code == 422:
-                    # Try fallback to old API format for non-chat models
-                    return await self._generate_legacy(prompt, model)
-                
-                resp.raise_for_status()
-                data = resp.json()
+            
+            if resp.status_code == 404:
+                return f"[Modelo {model} no encontrado. Verifique HF_DEFAULT_MODEL]"
+            
+            if resp.status_code in (401, 403):
+                return "[Error de autenticación con HuggingFace. Verifique su HUGGINGFACE_API_KEY]"
+            
+            if resp.status_code == 422:
+                # Try fallback to old API format for non-chat models
+                return await self._generate_legacy(prompt, model)
+            
+            resp.raise_for_status()
+            data = resp.json()
 
             # OpenAI-compatible response format
             if "choices" in data and len(data["choices"]) > 0:
@@ -72,13 +126,11 @@ class HFAdapter:
             # Fallback: stringify response
             return str(data)
 
-        # Local fallback (best-effort)
+        # Local fallback (best-effort): model loaded once per process, run off the event loop
         if settings.HF_USE_LOCAL and settings.HF_LOCAL_MODEL:
             try:
-                from transformers import pipeline
-
-                pipe = pipeline("text-generation", model=settings.HF_LOCAL_MODEL, device_map="auto")
-                out = pipe(prompt, max_new_tokens=256)
+                registry = get_model_registry()
+                out = await registry.run(TEXT_GENERATION, settings.HF_LOCAL_MODEL, lambda pipe: pipe(prompt, max_new_tokens=256))
                 if isinstance(out, list) and len(out) > 0 and "generated_text" in out[0]:
                     return out[0]["generated_text"]
                 return str(out)
@@ -87,6 +139,40 @@ class HFAdapter:
 
         raise RuntimeError("No HF API key configured and no local model available for generation")
 
+    async def stream_generate(self, prompt: str, model: str | None = None) -> AsyncIterator[str]:
+        """Stream tokens from the router.huggingface.co chat completions API (`stream: true`).
+
+        Error statuses (model loading, not found, auth, non-chat model) and the local fallback
+        are delegated to `generate`, whose full answer is yielded as a single chunk.
+        """
+        model = model or self.default_model
+        if not self.api_key:
+            yield await self.generate(prompt, model=model)
+            return
+
+        url = "https://router.huggingface.co/v1/chat/completions"
+        headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        }
+        payload = {
+            "model": model,
+            "messages": [
+                {"role": "user", "content": prompt}
+            ],
+            "max_tokens": 512,
+            "temperature": 0.7,
+            "stream": True
+        }
+
+        client = _chat_client()
+        async with client.stream("POST", url, json=payload, headers=headers) as resp:
+            if resp.status_code == 200:
+                async for delta in iter_chat_completion_deltas(resp):
+                    yield delta
+                return
+        yield await self.generate(prompt, model=model)
+
     async def _generate_legacy(self, prompt: str, model: str) -> str:
         """Fallback to legacy Inference API for non-chat models."""
         url = f"https://api-inference.huggingface.co/models/{model}"
@@ -97,12 +183,11 @@ class HFAdapter:
             "options": {"wait_for_model": True}
         }
         
-        async with httpx.AsyncClient(timeout=120.0) as client:
-            resp = await client.post(url, json=payload, headers=headers)
-            if resp.status_code == 410:
-                return f"[Modelo {model} no disponible en HuggingFace]"
-            resp.raise_for_status()
-            data = resp.json()
+        resp = await _chat_client().post(url, json=payload, headers=headers)
+        if resp.status_code == 410:
+            return f"[Modelo {model} no disponible en HuggingFace]"
+        resp.raise_for_status()
+        data = resp.json()
         
         if isinstance(data, list) and len(data) > 0:
             r = data[0]
@@ -112,46 +197,50 @@ class HFAdapter:
             return data["generated_text"]
         return str(data)
 
-    async def embed(self, texts: List[str], model: str | None = None) -> List[List[float]]:
+    async def embed(self, texts: List[str], model: str | None = None, batch_size: int | None = None) -> List[List[float]]:
         """Create embeddings using HF Inference API feature-extraction or local sentence-transformers.
 
-        Batches requests to avoid overly large payloads.
+        Remote calls send `batch_size` texts per feature-extraction request over a shared,
+        keep-alive client, with at most HF_EMBED_MAX_CONCURRENCY requests in flight.
+        Vectors are returned in the same order as `texts`. Concurrent calls for the same texts
+        and model are coalesced into one.
         """
         model = model or self.embedding_model
+        key = (bool(self.api_key), model, tuple(texts))
+        return await _embed_flights.do(key, lambda: self._embed(texts, model, batch_size))
+
+    async def _embed(self, texts: List[str], model: str, batch_size: int | None) -> List[List[float]]:
         if self.api_key:
             url = f"https://api-inference.huggingface.co/models/{model}"
             headers = {"Authorization": f"Bearer {self.api_key}"}
+            batch_size = max(1, batch_size or settings.HF_EMBED_BATCH_SIZE)
+            client = get_async_client(
+                "hf-embed",
+                timeout=60.0,
+                max_connections=settings.HF_HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.HF_HTTP_MAX_KEEPALIVE,
+            )
+            limit = _get_embed_limit()
+
+            async def embed_batch(batch: List[str]) -> List[List[float]]:
+                async with limit:
+                    resp = await client.post(url, json={"inputs": batch, "options": {"wait_for_model": True}}, headers=headers)
+                resp.raise_for_status()
+                data = resp.json()
+                if not isinstance(data, list) or len(data) != len(batch):
+                    raise RuntimeError(f"Unexpected feature-extraction response for {len(batch)} inputs")
+                return [_pool_embedding(item) for item in data]
 
-            async def embed_one(text: str):
-                async with httpx.AsyncClient(timeout=60.0) as client:
-                    resp = await client.post(url, json={"inputs": text, "options": {"wait_for_model": True}}, headers=headers)
-                    resp.raise_for_status()
-                    data = resp.json()
-                    # HF returns nested lists for feature-extraction
-                    if isinstance(data, list):
-                        # if data is list of token vectors, aggregate by mean
-                        import numpy as np
-
-                        arr = np.array(data)
-                        if len(arr.shape) == 2:
-                            vec = arr.mean(axis=0).tolist()
-                            return vec
-                        # sometimes returns nested shape, attempt flatten
-                        return np.array(data).reshape(-1).tolist()
-                    # other types
-                    return data
-
-            tasks = [embed_one(t) for t in texts]
-            res = await asyncio.gather(*tasks)
-            return res
-
-        # local fallback: sentence-transformers
-        if settings.HF_USE_LOCAL and settings.HF_LOCAL_MODEL:
-            try:
-                from sentence_transformers import SentenceTransformer
+            batches = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+            results = await asyncio.gather(*(embed_batch(b) for b in batches))
+            return [vec for batch in results for vec in batch]
 
-                model_local = SentenceTransformer(settings.HF_LOCAL_MODEL)
-                embeddings = model_local.encode(texts, show_progress_bar=False)
+        # local fallback: sentence-transformers (cached per process, encoded off the event loop)
+        local_model = settings.HF_LOCAL_EMBEDDING_MODEL or settings.HF_LOCAL_MODEL
+        if settings.HF_USE_LOCAL and local_model:
+            try:
+                registry = get_model_registry()
+                embeddings = await registry.run(EMBEDDING, local_model, lambda m: m.encode(texts, show_progress_bar=False))
                 # embeddings may be numpy array
                 return [list(map(float, e)) for e in embeddings]
             except Exception as e:
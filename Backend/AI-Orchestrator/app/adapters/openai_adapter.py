@@ -1,6 +1,8 @@
 from typing import AsyncIterator, Any
 import httpx
+from app.adapters.streaming import iter_chat_completion_deltas
 from app.config import settings
+from app.http_pool import get_async_client
 
 
 class OpenAIAdapter:
@@ -11,7 +13,7 @@ class OpenAIAdapter:
     async def generate(self, prompt: str, stream: bool = False) -> Any:
         """Call OpenAI Chat Completions endpoint (simple, non-streaming).
 
-        For streaming support implement Server-sent events or websocket logic.
+        Use `stream_generate` to receive tokens as they are produced.
         """
         if not self.api_key:
             raise RuntimeError("OpenAI API key is not configured")
@@ -35,3 +37,24 @@ class OpenAIAdapter:
             return data["choices"][0]["message"]["content"]
 
         return ""
+
+    async def stream_generate(self, prompt: str) -> AsyncIterator[str]:
+        """Stream the completion token by token (`stream: true`, Server-Sent Events)."""
+        if not self.api_key:
+            raise RuntimeError("OpenAI API key is not configured")
+
+        url = "https://api.openai.com/v1/chat/completions"
+        headers = {"Authorization": f"Bearer {self.api_key}", "Content-Type": "application/json"}
+        payload = {
+            "model": self.model,
+            "messages": [{"role": "user", "content": prompt}],
+            "max_tokens": 512,
+            "temperature": 0.2,
+            "stream": True,
+        }
+
+        client = get_async_client("openai", timeout=60.0)
+        async with client.stream("POST", url, json=payload, headers=headers) as resp:
+            resp.raise_for_status()
+            async for delta in iter_chat_completion_deltas(resp):
+                yield delta
@@ -0,0 +1,26 @@
+from typing import AsyncIterator
+import json
+
+import httpx
+
+
+async def iter_chat_completion_deltas(resp: httpx.Response) -> AsyncIterator[str]:
+    """Yield content deltas from an OpenAI-compatible `stream: true` chat completion.
+
+    The body is Server-Sent Events: `data: {json chunk}` lines terminated by `data: [DONE]`.
+    """
+    async for line in resp.aiter_lines():
+        line = line.strip()
+        if not line.startswith("data:"):
+            continue
+        data = line[5:].strip()
+        if data == "[DONE]":
+            break
+        try:
+            chunk = json.loads(data)
+        except ValueError:
+            continue
+        for choice in chunk.get("choices") or []:
+            content = (choice.get("delta") or {}).get("content") or choice.get("text")
+            if content:
+                yield content
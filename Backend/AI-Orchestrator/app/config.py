@@ -1,3 +1,5 @@
+from typing import Dict
+
 from pydantic_settings import BaseSettings
 
 
@@ -10,14 +12,78 @@ class Settings(BaseSettings):
     HF_EMBEDDING_MODEL: str | None = "sentence-transformers/all-mpnet-base-v2"
     HF_LOCAL_MODEL: str | None = None  # path or model id for local fallback
     HF_USE_LOCAL: bool = False
+    HF_LOCAL_EMBEDDING_MODEL: str | None = None  # defaults to HF_LOCAL_MODEL
+    # Local model registry: models kept loaded (LRU), inference threads, load at startup
+    HF_LOCAL_MAX_MODELS: int = 2
+    HF_LOCAL_WORKERS: int = 1
+    HF_LOCAL_WARMUP: bool = False
+    # Remote embeddings: texts per feature-extraction call and max concurrent calls
+    HF_EMBED_BATCH_SIZE: int = 32
+    HF_EMBED_MAX_CONCURRENCY: int = 4
+    # Shared httpx pool limits for Hugging Face calls
+    HF_HTTP_MAX_CONNECTIONS: int = 20
+    HF_HTTP_MAX_KEEPALIVE: int = 10
+
+    # Ingestion: number of chunks embedded/upserted per batch while streaming a document
+    INGEST_BATCH_SIZE: int = 64
+    # Manifest of ingested chunks per document; enables incremental re-ingestion. Unset to disable.
+    # The API and the Celery worker both ingest: point them at the same file (shared volume).
+    INGEST_MANIFEST_PATH: str | None = "data/ingest_manifests.sqlite3"
+
+    # Embedding cache keyed by (model, sha256(text)). Unset the path to disable it.
+    EMBEDDING_CACHE_PATH: str | None = "data/embedding_cache.sqlite3"
+    EMBEDDING_CACHE_MAX_ENTRIES: int = 200000
+    EMBEDDING_CACHE_REDIS_URL: str | None = None
+    EMBEDDING_CACHE_REDIS_TTL_SECONDS: int = 604800
 
     QDRANT_URL: str | None = None
     QDRANT_API_KEY: str | None = None
+    QDRANT_PREFER_GRPC: bool = True  # used only when grpcio is installed
+    # Bulk upserts: points per request, requests in flight, wait for indexing. With wait=True an
+    # ingested document is searchable as soon as /ingest returns; the parallel batches overlap
+    # their waits. Set False for bulk loads that do not query right away.
+    QDRANT_UPSERT_BATCH_SIZE: int = 256
+    QDRANT_UPSERT_PARALLEL: int = 4
+    QDRANT_UPSERT_WAIT: bool = True
     JWKS_URL: str | None = None
+    # JWKS keys are refreshed in the background after JWKS_REFRESH_SECONDS; an unknown kid forces
+    # a refetch at most every JWKS_MIN_REFRESH_SECONDS. Verified tokens are cached until their exp.
+    JWKS_REFRESH_SECONDS: int = 300
+    JWKS_MIN_REFRESH_SECONDS: int = 30
+    JWKS_FETCH_TIMEOUT: float = 5.0
+    JWKS_TOKEN_CACHE_SIZE: int = 1024
+
+    # Retrieval (RAG) for /chat: collection searched, prompt budget for retrieved chunks
+    RAG_ENABLED: bool = True
+    RAG_COLLECTION: str = "documents"
+    RAG_TOKEN_BUDGET: int = 1500
+    RAG_SCORE_THRESHOLD: float | None = None
+    RAG_QUERY_CACHE_SIZE: int = 1024
+    RAG_QUERY_CACHE_TTL_SECONDS: int = 3600
+
+    # Semantic answer cache for LLM answers: minimum cosine similarity, TTL, answers per model
+    SEMANTIC_CACHE_ENABLED: bool = True
+    SEMANTIC_CACHE_THRESHOLD: float = 0.95
+    SEMANTIC_CACHE_TTL_SECONDS: int = 3600
+    SEMANTIC_CACHE_MAX_ENTRIES: int = 1000
 
     # Tools / Django integration
     DJANGO_TOOLS_URL: str | None = "http://django:8000/api_rest/tools"
     TOOLS_API_KEY: str | None = "dev-secret"
+    # Shared httpx pool for tool calls (HTTP/2 needs the optional `h2` package)
+    TOOLS_HTTP_TIMEOUT: float = 30.0
+    TOOLS_HTTP_MAX_CONNECTIONS: int = 50
+    TOOLS_HTTP_MAX_KEEPALIVE: int = 20
+    TOOLS_HTTP_KEEPALIVE_EXPIRY: float = 60.0
+    TOOLS_HTTP2: bool = False
+    # Per-tool timeout overrides in seconds, e.g. TOOLS_TIMEOUTS='{"resumen_ventas": 60}'
+    TOOLS_TIMEOUTS: Dict[str, float] = {}
+    # Read-through cache for GET tools (TTL per tool in the registry metadata)
+    TOOL_CACHE_ENABLED: bool = True
+    TOOL_CACHE_MAX_ENTRIES: int = 2048
+    TOOL_CACHE_REDIS_URL: str | None = None
+    # Invalidation counters shared by the API and worker processes (same file/volume)
+    TOOL_CACHE_GENERATIONS_PATH: str | None = "data/tool_cache_generations.sqlite3"
 
     HOST: str = "0.0.0.0"
     PORT: int = 8080
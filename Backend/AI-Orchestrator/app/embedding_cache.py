@@ -0,0 +1,164 @@
+from array import array
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+import asyncio
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def text_hash(text: str) -> str:
+    """Content hash used as the cache key for a chunk of text."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _pack(vector: List[float]) -> bytes:
+    return array("d", vector).tobytes()
+
+
+def _unpack(blob: bytes) -> List[float]:
+    vec = array("d")
+    vec.frombytes(blob)
+    return vec.tolist()
+
+
+class EmbeddingCache:
+    """Embedding cache keyed by (model, sha256(text)).
+
+    The primary tier is a local SQLite file bounded to `max_entries` rows (least recently used
+    rows are evicted). An optional Redis tier is shared between API and worker processes and
+    checked first; SQLite hits are written back to Redis.
+    """
+
+    def __init__(self, path: str | Path, max_entries: int = 200_000, redis_url: str | None = None, redis_ttl: int = 7 * 24 * 3600):
+        self._path = Path(path)
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        self._max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self._path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " model TEXT NOT NULL, hash TEXT NOT NULL, vector BLOB NOT NULL, last_used REAL NOT NULL,"
+            " PRIMARY KEY (model, hash))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+        self._conn.commit()
+
+        self._redis = None
+        self._redis_ttl = redis_ttl
+        if redis_url:
+            try:
+                import redis.asyncio as aioredis
+            except Exception as e:
+                raise RuntimeError("redis.asyncio is required for the Redis embedding cache tier") from e
+            self._redis = aioredis.from_url(redis_url)
+
+    # ----- SQLite tier (blocking; async callers go through a worker thread) -----
+
+    def get_many(self, model: str, hashes: Iterable[str]) -> Dict[str, List[float]]:
+        hashes = list(dict.fromkeys(hashes))
+        found: Dict[str, List[float]] = {}
+        if not hashes:
+            return found
+        with self._lock:
+            # stay well below SQLite's bound-parameter limit
+            for i in range(0, len(hashes), 500):
+                part = hashes[i:i + 500]
+                marks = ",".join("?" * len(part))
+                rows = self._conn.execute(
+                    f"SELECT hash, vector FROM embeddings WHERE model = ? AND hash IN ({marks})",
+                    [model, *part],
+                ).fetchall()
+                found.update({h: _unpack(v) for h, v in rows})
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE model = ? AND hash = ?",
+                    [(now, model, h) for h in found],
+                )
+                self._conn.commit()
+        return found
+
+    def put_many(self, model: str, items: Dict[str, List[float]]) -> None:
+        if not items:
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, hash, vector, last_used) VALUES (?, ?, ?, ?)",
+                [(model, h, _pack(v), now) for h, v in items.items()],
+            )
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+            if count > self._max_entries:
+                self._conn.execute(
+                    "DELETE FROM embeddings WHERE rowid IN (SELECT rowid FROM embeddings ORDER BY last_used LIMIT ?)",
+                    (count - self._max_entries,),
+                )
+            self._conn.commit()
+
+    # ----- async API (Redis tier first, then SQLite) -----
+
+    def _redis_key(self, model: str, h: str) -> str:
+        return f"emb:{model}:{h}"
+
+    async def aget_many(self, model: str, hashes: Iterable[str]) -> Dict[str, List[float]]:
+        hashes = list(dict.fromkeys(hashes))
+        found: Dict[str, List[float]] = {}
+        if self._redis is not None and hashes:
+            try:
+                values = await self._redis.mget([self._redis_key(model, h) for h in hashes])
+                found.update({h: _unpack(v) for h, v in zip(hashes, values) if v})
+            except Exception:
+                logger.warning("Redis embedding cache lookup failed", exc_info=True)
+
+        missing = [h for h in hashes if h not in found]
+        if missing:
+            local = await asyncio.to_thread(self.get_many, model, missing)
+            found.update(local)
+            if local:
+                await self._redis_put(model, local)
+        return found
+
+    async def aput_many(self, model: str, items: Dict[str, List[float]]) -> None:
+        if not items:
+            return
+        await asyncio.to_thread(self.put_many, model, items)
+        await self._redis_put(model, items)
+
+    async def _redis_put(self, model: str, items: Dict[str, List[float]]) -> None:
+        if self._redis is None:
+            return
+        try:
+            pipe = self._redis.pipeline()
+            for h, v in items.items():
+                pipe.set(self._redis_key(model, h), _pack(v), ex=self._redis_ttl)
+            await pipe.execute()
+        except Exception:
+            logger.warning("Redis embedding cache write failed", exc_info=True)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+_default_cache: Optional[EmbeddingCache] = None
+
+
+def get_embedding_cache() -> Optional[EmbeddingCache]:
+    """Return the process-wide embedding cache, or None when EMBEDDING_CACHE_PATH is unset."""
+    global _default_cache
+    if _default_cache is None and settings.EMBEDDING_CACHE_PATH:
+        _default_cache = EmbeddingCache(
+            settings.EMBEDDING_CACHE_PATH,
+            max_entries=settings.EMBEDDING_CACHE_MAX_ENTRIES,
+            redis_url=settings.EMBEDDING_CACHE_REDIS_URL,
+            redis_ttl=settings.EMBEDDING_CACHE_REDIS_TTL_SECONDS,
+        )
+    return _default_cache
@@ -0,0 +1,67 @@
+from typing import Dict
+import asyncio
+import logging
+import weakref
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# Long-lived httpx clients, one per (event loop, name). httpx connections are bound to the
+# loop that opened them, so FastAPI and each Celery worker loop get their own pool.
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, httpx.AsyncClient]]" = weakref.WeakKeyDictionary()
+
+
+def get_async_client(
+    name: str,
+    timeout: float = 30.0,
+    max_connections: int | None = 20,
+    max_keepalive_connections: int | None = 10,
+    keepalive_expiry: float | None = 30.0,
+    http2: bool = False,
+) -> httpx.AsyncClient:
+    """Return the shared AsyncClient registered under `name` for the running loop.
+
+    The client is created on first use with the given timeout and connection limits and
+    reused afterwards, so repeated calls share keep-alive connections. `http2` is honoured
+    only when the optional `h2` package is installed.
+    """
+    loop = asyncio.get_running_loop()
+    clients = _clients.setdefault(loop, {})
+    client = clients.get(name)
+    if client is None or getattr(client, "is_closed", False):
+        limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        client = httpx.AsyncClient(timeout=timeout, limits=limits, http2=http2 and _h2_available())
+        clients[name] = client
+    return client
+
+
+def _h2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except Exception:
+        logger.warning("HTTP/2 requested but the 'h2' package is not installed; using HTTP/1.1")
+        return False
+    return True
+
+
+async def aclose(name: str) -> None:
+    """Close the shared client registered under `name` for the running loop, if any."""
+    clients = _clients.get(asyncio.get_running_loop(), {})
+    client = clients.pop(name, None)
+    if client is not None:
+        await client.aclose()
+
+
+async def aclose_all() -> None:
+    """Close every shared client owned by the running loop."""
+    clients = _clients.pop(asyncio.get_running_loop(), {})
+    for name, client in clients.items():
+        try:
+            await client.aclose()
+        except Exception:
+            logger.warning("Error closing shared httpx client %s", name, exc_info=True)
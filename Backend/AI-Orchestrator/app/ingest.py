@@ -1,7 +1,14 @@
-from typing import List
+from typing import Iterable, Iterator, List, Tuple
 from pathlib import Path
+import asyncio
+import re
+import uuid
+import weakref
 from app.adapters.hf_adapter import HFAdapter
-from app.qdrant_client import upsert_embeddings
+from app.config import settings
+from app.embedding_cache import get_embedding_cache, text_hash
+from app.ingest_manifest import get_manifest_store
+from app.qdrant_client import adelete_points, aupsert_embeddings
 
 # Placeholder utilities for document ingestion: extraction, chunking, embedding, and vector upsert.
 # Implement concrete logic using PyMuPDF/pdfplumber, pytesseract for OCR, and qdrant-client for vector DB.
@@ -56,39 +63,149 @@ def extract_text_from_image(path: Path) -> str:
     return text
 
 
-def chunk_text(text: str, chunk_size: int = 1000, overlap: int = 200, page: int | None = None) -> List[dict]:
-    """Chunk text into overlapping pieces with provenance metadata.
+def estimate_tokens(s: str) -> int:
+    """Rough token estimate for a string (1 token ~ 4 chars)."""
+    return max(1, len(s) // 4)
 
-    Returns list of dicts: {"text": str, "page": int|None, "start_token_est": int, "end_token_est": int}
-    Uses a rough token estimate heuristic (1 token ~ 4 chars). Replace with tokenizer for accuracy later.
-    """
-    def estimate_tokens(s: str) -> int:
-        return max(1, len(s) // 4)
 
-    chunks: List[dict] = []
+def iter_chunks(
+    text: str, chunk_size: int = 1000, overlap: int = 200, page: int | None = None, offset: int = 0
+) -> Iterator[dict]:
+    """Lazily yield overlapping chunks of `text` with provenance metadata.
+
+    Offsets are tracked as running character positions, so token estimates are computed
+    from the offset instead of re-slicing the prefix for every chunk (linear in len(text)).
+    `offset` is the position of `text` inside its page, for the token estimates.
+    """
     start = 0
     text_len = len(text)
     while start < text_len:
         end = min(start + chunk_size, text_len)
-        chunk_text = text[start:end]
-        start_token_est = estimate_tokens(text[:start])
-        end_token_est = start_token_est + estimate_tokens(chunk_text)
-        chunks.append({
-            "text": chunk_text,
+        piece = text[start:end]
+        # same value as estimate_tokens(text[:start]) without copying the prefix
+        start_token_est = max(1, (offset + start) // 4)
+        yield {
+            "text": piece,
             "page": page,
             "start_token_est": start_token_est,
-            "end_token_est": end_token_est,
-        })
+            "end_token_est": start_token_est + estimate_tokens(piece),
+        }
         start = end - overlap if end - overlap > start else end
-    return chunks
+
+
+# Where content-defined chunks may be cut, coarsest first: paragraphs, lines, sentences
+_SEPARATORS = [re.compile(r"\n[ \t]*\n"), re.compile(r"\n"), re.compile(r"(?<=[.!?])\s+")]
+# Past the minimum size a chunk closes after one piece in ANCHOR_EVERY (see iter_content_chunks)
+ANCHOR_EVERY = 4
+
+
+def _pieces(text: str, start: int, end: int, max_size: int, level: int = 0) -> Iterator[Tuple[int, int]]:
+    """Spans of text[start:end] cut at the coarsest separator that makes them fit in `max_size`.
+
+    Spans that still do not fit after splitting at sentence ends are yielded whole.
+    """
+    if end - start <= max_size or level == len(_SEPARATORS):
+        yield start, end
+        return
+    piece_start = start
+    for match in _SEPARATORS[level].finditer(text, start, end):
+        yield from _pieces(text, piece_start, match.start(), max_size, level + 1)
+        piece_start = match.end()
+    yield from _pieces(text, piece_start, end, max_size, level + 1)
+
+
+def _is_anchor(piece: str) -> bool:
+    return int(text_hash(piece)[:8], 16) % ANCHOR_EVERY == 0
+
+
+def iter_content_chunks(text: str, chunk_size: int = 1000, overlap: int = 200, page: int | None = None) -> Iterator[dict]:
+    """Yield chunks whose boundaries depend on the content, not on absolute offsets.
+
+    The text is cut into pieces at paragraph breaks, or, for pieces longer than `chunk_size`,
+    at line breaks and then at sentence ends (PDF pages usually have no blank lines). Pieces are
+    packed into chunks of up to `chunk_size` characters; past a quarter of that, a chunk closes
+    after an anchor piece (chosen by its hash). An edit only moves the boundaries up to the next
+    anchors, so the chunks after it keep their text and hash. Only a piece longer than
+    `chunk_size` with no sentence end is split into overlapping fixed windows.
+    """
+    min_size = chunk_size // 4
+    chunk_start = chunk_end = None
+
+    def close():
+        piece = text[chunk_start:chunk_end]
+        start_token_est = max(1, chunk_start // 4)
+        return {
+            "text": piece,
+            "page": page,
+            "start_token_est": start_token_est,
+            "end_token_est": start_token_est + estimate_tokens(piece),
+        }
+
+    for start, end in _pieces(text, 0, len(text), chunk_size):
+        piece = text[start:end]
+        if not piece.strip():
+            continue
+        if chunk_start is not None and end - chunk_start > chunk_size:
+            yield close()
+            chunk_start = None
+        if end - start > chunk_size:
+            yield from iter_chunks(piece, chunk_size=chunk_size, overlap=overlap, page=page, offset=start)
+            continue
+        if chunk_start is None:
+            chunk_start = start
+        chunk_end = end
+        if chunk_end - chunk_start >= min_size and _is_anchor(piece):
+            yield close()
+            chunk_start = None
+    if chunk_start is not None:
+        yield close()
+
+
+def iter_page_chunks(
+    pages: Iterable[Tuple[int, str]], chunk_size: int = 1000, overlap: int = 200, content_defined: bool = False
+) -> Iterator[dict]:
+    """Yield chunks for an iterable of (page_number, text) tuples, one page at a time.
+
+    Accepts the lazy iterator from `iter_text_pages` so only the current page is held in memory.
+    With `content_defined` pages are chunked with `iter_content_chunks` instead of fixed windows.
+    """
+    chunker = iter_content_chunks if content_defined else iter_chunks
+    for page_num, page_text in pages:
+        yield from chunker(page_text or "", chunk_size=chunk_size, overlap=overlap, page=page_num)
+
+
+def chunk_text(text: str, chunk_size: int = 1000, overlap: int = 200, page: int | None = None) -> List[dict]:
+    """Chunk text into overlapping pieces with provenance metadata.
+
+    Returns list of dicts: {"text": str, "page": int|None, "start_token_est": int, "end_token_est": int}
+    Uses a rough token estimate heuristic (1 token ~ 4 chars). Replace with tokenizer for accuracy later.
+    """
+    return list(iter_chunks(text, chunk_size=chunk_size, overlap=overlap, page=page))
 
 
 async def create_embeddings_for_chunks(chunks: List[dict]) -> List[List[float]]:
-    """Create embeddings for a list of chunk dicts using HF adapter."""
+    """Create embeddings for a list of chunk dicts using HF adapter.
+
+    Vectors are looked up in the content-hash embedding cache first; only cache misses
+    (deduplicated by text) are sent to the model.
+    """
     hf = HFAdapter()
     texts = [c["text"] for c in chunks]
-    embeddings = await hf.embed(texts)
-    return embeddings
+    cache = get_embedding_cache()
+    if cache is None:
+        return await hf.embed(texts)
+
+    model = hf.embedding_model_name()
+    hashes = [text_hash(t) for t in texts]
+    vectors = await cache.aget_many(model, hashes)
+
+    missing = {h: t for h, t in zip(hashes, texts) if h not in vectors}
+    if missing:
+        fresh = await hf.embed(list(missing.values()))
+        new_vectors = dict(zip(missing.keys(), fresh))
+        await cache.aput_many(model, new_vectors)
+        vectors.update(new_vectors)
+    return [vectors[h] for h in hashes]
 
 
 async def upsert_to_qdrant(points: List[dict], collection_name: str = "documents"):
@@ -96,69 +213,202 @@ async def upsert_to_qdrant(points: List[dict], collection_name: str = "documents
     ids = [p["id"] for p in points]
     vectors = [p["vector"] for p in points]
     payloads = [p["payload"] for p in points]
-    upsert_embeddings(collection_name=collection_name, ids=ids, vectors=vectors, payloads=payloads)
+    await aupsert_embeddings(collection_name=collection_name, ids=ids, vectors=vectors, payloads=payloads)
 
 
-def extract_text_pages(path: Path) -> List[tuple]:
-    """Return list of (page_number, text) tuples for a PDF. Page numbers are 1-based."""
+def iter_text_pages(path: Path) -> Iterator[Tuple[int, str]]:
+    """Lazily yield (page_number, text) tuples for a PDF. Page numbers are 1-based."""
     try:
         import fitz
     except Exception:
         fitz = None
 
-    pages: List[tuple] = []
     if fitz:
         doc = fitz.open(str(path))
-        for i, page in enumerate(doc):
-            pages.append((i + 1, page.get_text()))
-        doc.close()
-        return pages
+        try:
+            for i, page in enumerate(doc):
+                yield (i + 1, page.get_text())
+        finally:
+            doc.close()
+        return
 
     try:
         import pdfplumber
-        with pdfplumber.open(path) as pdf:
-            for i, p in enumerate(pdf.pages):
-                pages.append((i + 1, p.extract_text() or ""))
-        return pages
+        pdf = pdfplumber.open(path)
+    except Exception:
+        return  # no extractor available
+    with pdf:
+        for i, p in enumerate(pdf.pages):
+            yield (i + 1, p.extract_text() or "")
+
+
+def extract_text_pages(path: Path) -> List[tuple]:
+    """Return list of (page_number, text) tuples for a PDF. Page numbers are 1-based."""
+    try:
+        return list(iter_text_pages(path))
     except Exception:
         return []
 
 
-async def ingest_document(path: Path, collection_name: str = "documents"):
-    # Basic ingestion flow supporting plain text and PDF files
-    chunks: List[dict] = []
-    if path.suffix.lower() == ".txt":
-        text = path.read_text(encoding="utf-8")
-        chunks = chunk_text(text)
-    elif path.suffix.lower() == ".pdf":
-        pages = extract_text_pages(path)
-        for page_num, page_text in pages:
-            page_chunks = chunk_text(page_text or "", page=page_num)
-            chunks.extend(page_chunks)
+def iter_document_chunks(path: Path, content_defined: bool = False) -> Iterator[dict]:
+    """Yield chunks for a document on disk without materializing the full text or chunk list for PDFs.
+
+    Incremental ingestion passes `content_defined` so that edits keep the other chunks' hashes.
+    """
+    chunker = iter_content_chunks if content_defined else iter_chunks
+    suffix = path.suffix.lower()
+    if suffix == ".txt":
+        yield from chunker(path.read_text(encoding="utf-8"))
+    elif suffix == ".pdf":
+        yield from iter_page_chunks(iter_text_pages(path), content_defined=content_defined)
     else:
         # fallback to general extractor
-        text = extract_text_from_pdf(path)
-        chunks = chunk_text(text)
+        yield from chunker(extract_text_from_pdf(path))
 
-    if not chunks:
-        return {"status": "no_content", "chunks": 0}
 
-    embeddings = await create_embeddings_for_chunks(chunks)
-
-    points = []
-    for i, (chunk, emb) in enumerate(zip(chunks, embeddings)):
-        page = chunk.get("page")
-        points.append({
-            "id": f"{path.name}-p{page or 0}-{i}",
-            "vector": emb,
-            "payload": {
-                "text": chunk["text"],
-                "doc": str(path),
-                "page": page,
-                "start_token_est": chunk.get("start_token_est"),
-                "end_token_est": chunk.get("end_token_est"),
-            },
-        })
-
-    await upsert_to_qdrant(points, collection_name=collection_name)
-    return {"status": "ok", "chunks": len(chunks)}
+def chunk_hash(chunk: dict) -> str:
+    """Identity of a chunk inside its document: its page and text.
+
+    The offset is left out so that text inserted earlier in the page does not change the
+    identity of the chunks after it.
+    """
+    return text_hash(f"{chunk.get('page') or 0}|{chunk['text']}")
+
+
+def chunk_point_id(doc_id: str, chunk_key: str) -> str:
+    """Stable Qdrant point id (UUID) for a chunk of a document."""
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"{doc_id}#{chunk_key}"))
+
+
+def _point_payload(chunk: dict, path: Path) -> dict:
+    return {
+        "text": chunk["text"],
+        "doc": str(path),
+        "page": chunk.get("page"),
+        "start_token_est": chunk.get("start_token_est"),
+        "end_token_est": chunk.get("end_token_est"),
+    }
+
+
+async def ingest_document(
+    path: Path,
+    collection_name: str = "documents",
+    batch_size: int | None = None,
+    doc_id: str | None = None,
+    incremental: bool | None = None,
+):
+    """Ingest a document into Qdrant, streaming chunks in batches of `batch_size`.
+
+    In incremental mode (default when the manifest store is configured) the document is
+    diffed against its manifest: only new or changed chunks are embedded and upserted and
+    the points of chunks that disappeared are deleted. `doc_id` identifies the document
+    across uploads (defaults to the file name). Incremental mode cuts content-defined chunks
+    (`iter_content_chunks`) and re-ingests one document at a time per process; the full mode
+    keeps fixed windows.
+    """
+    batch_size = batch_size or settings.INGEST_BATCH_SIZE
+    doc_id = doc_id or path.name
+    manifest_store = get_manifest_store()
+    if incremental is None:
+        incremental = manifest_store is not None
+    if incremental and manifest_store is None:
+        raise RuntimeError("Incremental ingestion requires INGEST_MANIFEST_PATH")
+    if not incremental:
+        return await _ingest_full(path, collection_name, batch_size)
+    # Two uploads of the same document would both diff against the old manifest
+    async with _document_lock(collection_name, doc_id):
+        return await _ingest_incremental(path, collection_name, batch_size, doc_id, manifest_store)
+
+
+# Per event loop: (collection, doc_id) -> lock held while the document is re-ingested
+_document_locks: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, weakref.WeakValueDictionary]" = weakref.WeakKeyDictionary()
+
+
+def _document_lock(collection_name: str, doc_id: str) -> asyncio.Lock:
+    locks = _document_locks.setdefault(asyncio.get_running_loop(), weakref.WeakValueDictionary())
+    lock = locks.get((collection_name, doc_id))
+    if lock is None:
+        lock = asyncio.Lock()
+        locks[(collection_name, doc_id)] = lock
+    return lock
+
+
+async def _ingest_incremental(path: Path, collection_name: str, batch_size: int, doc_id: str, manifest_store):
+    previous = manifest_store.get(collection_name, doc_id)
+    current: dict = {}
+    total = 0
+    upserted = 0
+    batch: List[dict] = []
+
+    async def flush(items: List[dict]):
+        embeddings = await create_embeddings_for_chunks(items)
+        points = []
+        for chunk, emb in zip(items, embeddings):
+            payload = _point_payload(chunk, path)
+            payload["doc_id"] = doc_id
+            payload["chunk_hash"] = chunk["_key"]
+            points.append({"id": current[chunk["_key"]], "vector": emb, "payload": payload})
+        await upsert_to_qdrant(points, collection_name=collection_name)
+
+    for chunk in iter_document_chunks(path, content_defined=True):
+        total += 1
+        key = chunk_hash(chunk)
+        if key in current:
+            continue
+        current[key] = previous.get(key) or chunk_point_id(doc_id, key)
+        if key in previous:
+            continue  # unchanged chunk, already in the collection
+        batch.append({**chunk, "_key": key})
+        if len(batch) >= batch_size:
+            await flush(batch)
+            upserted += len(batch)
+            batch = []
+
+    if batch:
+        await flush(batch)
+        upserted += len(batch)
+
+    stale = [pid for key, pid in previous.items() if key not in current]
+    for i in range(0, len(stale), batch_size):
+        await adelete_points(collection_name=collection_name, ids=stale[i:i + batch_size])
+
+    manifest_store.replace(collection_name, doc_id, current)
+
+    stats = {"upserted": upserted, "deleted": len(stale), "unchanged": len(current) - upserted}
+    if not total:
+        return {"status": "no_content", "chunks": 0, **stats}
+    return {"status": "ok", "chunks": total, **stats}
+
+
+async def _ingest_full(path: Path, collection_name: str, batch_size: int):
+    # Streaming ingestion: chunks are embedded and upserted in fixed-size batches so memory
+    # stays bounded by `batch_size` instead of the document size.
+    total = 0
+    batch: List[dict] = []
+
+    async def flush(items: List[dict], offset: int):
+        embeddings = await create_embeddings_for_chunks(items)
+        points = []
+        for i, (chunk, emb) in enumerate(zip(items, embeddings), start=offset):
+            page = chunk.get("page")
+            points.append({
+                "id": f"{path.name}-p{page or 0}-{i}",
+                "vector": emb,
+                "payload": _point_payload(chunk, path),
+            })
+        await upsert_to_qdrant(points, collection_name=collection_name)
+
+    for chunk in iter_document_chunks(path):
+        batch.append(chunk)
+        if len(batch) >= batch_size:
+            await flush(batch, total)
+            total += len(batch)
+            batch = []
+
+    if batch:
+        await flush(batch, total)
+        total += len(batch)
+
+    if not total:
+        return {"status": "no_content", "chunks": 0}
+    return {"status": "ok", "chunks": total}
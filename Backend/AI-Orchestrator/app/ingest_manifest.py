@@ -0,0 +1,73 @@
+from pathlib import Path
+from typing import Dict, Optional
+import sqlite3
+import threading
+import time
+
+from app.config import settings
+
+
+class IngestManifestStore:
+    """Per-document manifest of ingested chunks: chunk hash -> Qdrant point id.
+
+    Lets `ingest_document` diff a re-uploaded document against what is already in the
+    collection, upserting only new chunks and deleting the points that disappeared.
+    The API and the Celery worker open the same file (a shared volume in docker-compose),
+    so writers from the other process wait on SQLite's lock for up to `timeout` seconds.
+    """
+
+    def __init__(self, path: str | Path, timeout: float = 30.0):
+        self._path = Path(path)
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self._path), timeout=timeout, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS manifest_chunks ("
+            " collection TEXT NOT NULL, doc_id TEXT NOT NULL, chunk_hash TEXT NOT NULL, point_id TEXT NOT NULL,"
+            " PRIMARY KEY (collection, doc_id, chunk_hash))"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS manifests ("
+            " collection TEXT NOT NULL, doc_id TEXT NOT NULL, updated_at REAL NOT NULL,"
+            " PRIMARY KEY (collection, doc_id))"
+        )
+        self._conn.commit()
+
+    def get(self, collection: str, doc_id: str) -> Dict[str, str]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT chunk_hash, point_id FROM manifest_chunks WHERE collection = ? AND doc_id = ?",
+                (collection, doc_id),
+            ).fetchall()
+        return dict(rows)
+
+    def replace(self, collection: str, doc_id: str, chunks: Dict[str, str]) -> None:
+        """Atomically replace the manifest of a document (an empty dict removes it)."""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM manifest_chunks WHERE collection = ? AND doc_id = ?", (collection, doc_id))
+            self._conn.executemany(
+                "INSERT INTO manifest_chunks (collection, doc_id, chunk_hash, point_id) VALUES (?, ?, ?, ?)",
+                [(collection, doc_id, h, pid) for h, pid in chunks.items()],
+            )
+            if chunks:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO manifests (collection, doc_id, updated_at) VALUES (?, ?, ?)",
+                    (collection, doc_id, time.time()),
+                )
+            else:
+                self._conn.execute("DELETE FROM manifests WHERE collection = ? AND doc_id = ?", (collection, doc_id))
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+_default_store: Optional[IngestManifestStore] = None
+
+
+def get_manifest_store() -> Optional[IngestManifestStore]:
+    """Return the process-wide manifest store, or None when INGEST_MANIFEST_PATH is unset."""
+    global _default_store
+    if _default_store is None and settings.INGEST_MANIFEST_PATH:
+        _default_store = IngestManifestStore(settings.INGEST_MANIFEST_PATH)
+    return _default_store
@@ -0,0 +1,384 @@
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+
+def _any_of(patterns: Sequence[str]) -> re.Pattern:
+    return re.compile("|".join(f"(?:{p})" for p in patterns))
+
+
+class IntentMatcher:
+    """Match a text against several named pattern sets, in declaration order.
+
+    Each rule is `(name, patterns)` or `(name, patterns, keywords)`. The patterns of a rule are
+    compiled once into one alternation; the optional keywords are literal substrings, at least one
+    of which appears in every text the patterns can match. Keywords are checked with `in` (a C-level
+    substring scan) before running the rule's regex, so a message skips every rule whose keywords
+    it lacks: most messages run one or two regexes instead of all of them. The result is the same
+    as a separate `re.search` per rule.
+    """
+
+    def __init__(self, rules: Sequence[Tuple]):
+        self.names = [rule[0] for rule in rules]
+        self._rules = [
+            (rule[0], _any_of(rule[1]), tuple(rule[2]) if len(rule) > 2 else ())
+            for rule in rules
+        ]
+
+    def _search(self, text: str):
+        for name, regex, keywords in self._rules:
+            if keywords and not any(keyword in text for keyword in keywords):
+                continue
+            found = regex.search(text)
+            if found is not None:
+                yield name, found.group(0)
+
+    def matches(self, text: str) -> Dict[str, str]:
+        """Return {rule name: first matching substring} for every rule that matches."""
+        return dict(self._search(text))
+
+    def first(self, text: str) -> Optional[str]:
+        """Return the first rule (in declaration order) that matches, or None."""
+        for name, _ in self._search(text):
+            return name
+        return None
+
+
+@dataclass
+class Intent:
+    """Result of `match()`: the detected intent, the tool to run and its parameters."""
+
+    name: Optional[str] = None
+    tool: Optional[str] = None
+    params: Dict[str, Any] = field(default_factory=dict)
+    missing: List[str] = field(default_factory=list)
+
+    def __bool__(self) -> bool:
+        return self.name is not None
+
+    def as_dict(self) -> dict | None:
+        """Legacy `detect_intent` shape: {'tool', 'params' | 'missing', 'intent'} or None."""
+        if self.name is None:
+            return None
+        if self.tool is None:
+            return {'tool': None, 'intent': self.name, 'missing': list(self.missing)}
+        return {'tool': self.tool, 'params': self.params, 'intent': self.name}
+
+
+# Reglas en orden de prioridad: la primera que coincide define la intención.
+# resumen_ventas va ANTES de buscar_servicios para evitar conflicto.
+# El tercer elemento son palabras que aparecen en todo texto que la regla puede
+# reconocer: si el mensaje no contiene ninguna, la regla no se evalúa.
+_INTENTS = IntentMatcher([
+    ('crear_reserva', [
+        r'(crear|hacer|agendar|reservar|quiero|necesito|me gustar[ií]a)\s+(una\s+)?(reserva|cita)',
+        r'reserv(ar|a)\s+(el|un|una|para)',
+        r'agendar\s+(el|un|una|para)',
+        r'quiero\s+(el\s+)?servicio',
+        r'me\s+gustar[ií]a\s+(agendar|reservar)',
+    ], ['reserv', 'cita', 'agendar', 'servicio']),
+    ('ver_reserva', [
+        r'(ver|consultar|mostrar|cual|donde|estado)\s+(mi|la|una)?\s*reserva',
+        r'reserva\s+(número|numero|#|id)\s*(\d+)',
+        r'mis\s+reservas',
+    ], ['reserva']),
+    ('procesar_pago', [
+        r'(pagar|hacer\s+pago|procesar\s+pago|registrar\s+pago)',
+        r'(quiero|necesito)\s+pagar',
+        r'pago\s+(de|para)\s+(la\s+)?reserva',
+    ], ['pag']),
+    ('resumen_ventas', [
+        r'resumen\s+(de\s+)?ventas',
+        r'reporte\s+(de\s+)?ventas',
+        r'informe\s+(de\s+)?ventas',
+        r'cu[aá]nto\s+(vend[ií]|se\s+ha\s+vendido)',
+        r'ventas\s+(del|de)\s+(d[ií]a|mes|semana)',
+    ], ['venta', 'vend']),
+    ('buscar_servicios', [
+        r'(busca|buscar|encuentra|lista|listar|muestra|mostrar|dame|dime|cu[aá]les|hay).*(servicio|producto)',
+        r'servicio[s]?\s+(disponible|de\s+|con\s+|que)',
+        r'qu[eé]\s+servicios',
+    ], ['servicio', 'producto']),
+])
+
+_CATEGORIAS = IntentMatcher([
+    ('belleza', [r'belleza|peluquer|cabello|corte']),
+    ('hogar', [r'reparacion|hogar|plomer|electric']),
+    ('clases', [r'clases|educaci|particular|enseñ']),
+    ('salud', [r'm[eé]dic|salud|cita']),
+])
+
+_CATEGORIA_NOMBRES = {
+    'belleza': 'Servicios de belleza',
+    'hogar': 'Reparaciones del hogar',
+    'clases': 'Clases particulares',
+    'salud': 'Salud',
+}
+
+_PRECIO_MIN = re.compile(r'(?:precio\s+)?(?:mayor|m[aá]s|superior)\s*(?:a|de|que)?\s*\$?\s*(\d+)')
+_PRECIO_MAX = re.compile(r'(?:precio\s+)?(?:menor|menos|inferior)\s*(?:a|de|que)?\s*\$?\s*(\d+)')
+_BUSQUEDA = re.compile(r'servicios?\s+(?:de\s+|llamado\s+)?["\']?([a-záéíóúñ\s]+)["\']?(?:\s+para|\s+con|\s*$)')
+_BUSQUEDA_STOPWORDS = re.compile(r'\b(con|de|del|la|el|los|las|un|una|que|tiene|tienen|precio|mayor|menor|disponibles?)\b')
+_NUMERO = re.compile(r'(\d+)')
+
+# Palabras clave que indican que la pregunta ES sobre el sistema (no off-topic)
+ON_TOPIC_KEYWORDS = [
+    'servicio', 'reserva', 'reservar', 'cita', 'agendar', 'pago', 'pagar',
+    'precio', 'costo', 'disponible', 'horario', 'cliente', 'buscar',
+    'corte', 'cabello', 'peluquer', 'masaje', 'spa', 'belleza', 'manicure',
+    'pedicure', 'facial', 'tratamiento', 'venta', 'resumen', 'reporte',
+    'findyourwork', 'plataforma', 'ayuda', 'hola', 'gracias', 'adios',
+    'salud', 'medic', 'cita', 'consulta'
+]
+_ON_TOPIC = re.compile("|".join(re.escape(kw) for kw in ON_TOPIC_KEYWORDS))
+
+# Patrones que indican preguntas off-topic
+_OFF_TOPIC = _any_of([
+    r'qu[eé]\s+es\s+(el|la|un|una)\s+\w+',  # "qué es la democracia"
+    r'c[oó]mo\s+(funciona|se\s+hace)\s+\w+(?!\s*(reserva|pago|servicio))',  # "cómo funciona X" (no relacionado)
+    r'cu[aá]l\s+es\s+(el|la)\s+(capital|presidente|rey)',  # preguntas de geografía/política
+    r'qui[eé]n\s+(es|fue|era)\s+\w+',  # "quién es X"
+    r'(cu[eé]ntame|dime|explica)\s+(sobre|acerca|de)\s+(?!(servicio|reserva|pago))',  # "cuéntame sobre X"
+    r'(historia|matem[aá]tica|f[ií]sica|qu[ií]mica|biolog[ií]a|geograf[ií]a)',
+    r'(pol[ií]tica|econom[ií]a|filosof[ií]a|religi[oó]n)',
+    r'(chiste|broma|adivinanza|trabalenguas)',
+    r'(clima|tiempo|temperatura)\s+(en|de)',
+    r'(receta|cocina|ingrediente)',
+    r'(pel[ií]cula|serie|libro|m[uú]sica|canci[oó]n)',
+    r'(deporte|f[uú]tbol|basket|tenis)',
+    r'(c[oó]digo|programar|python|javascript|html)',
+    r'(juego|videojuego|minecraft|fortnite)',
+])
+
+# Patrones como "reserva #3", "reserva 3", "a la reserva 3" (en orden de preferencia)
+_PAGO_RESERVA_PATTERNS = [re.compile(p) for p in [
+    r'(?:a\s+la\s+)?reserva\s*(?:#|n[úu]mero|num|id)?\s*(\d+)',
+    r'(?:#|n[úu]mero|num|id)\s*(\d+)\s*(?:de\s+)?(?:la\s+)?reserva',
+    r'para\s+(?:la\s+)?reserva\s*(?:#)?\s*(\d+)',
+]]
+
+# Patrones: "$100", "$100 dolares", "100 dolares", "monto de $100"
+_PAGO_MONTO_PATTERNS = [re.compile(p) for p in [
+    r'\$\s*(\d+(?:\.\d{1,2})?)',  # $100 o $100.00
+    r'(\d+(?:\.\d{1,2})?)\s*d[oó]lares?',  # 100 dolares
+    r'monto\s+(?:de\s+)?\$?\s*(\d+(?:\.\d{1,2})?)',  # monto de $100
+    r'pagar\s+\$?\s*(\d+(?:\.\d{1,2})?)',  # pagar $100
+]]
+
+_SERVICIO_ENTRE_COMILLAS = re.compile(r'["\']([^"\']+)["\']')
+_SERVICIO_NOMBRE = re.compile(r'(?:el\s+)?servicio\s+(?:que\s+se\s+llama\s+)?["\']?([^"\',.]+)["\']?')
+
+# Patrones: "19 de enero", "lunes 19", "2026-01-19", "19/01/2026"
+_FECHA_PATTERNS = [re.compile(p) for p in [
+    r'(\d{4})-(\d{2})-(\d{2})',  # YYYY-MM-DD
+    r'(\d{1,2})[/\-](\d{1,2})[/\-](\d{4})',  # DD/MM/YYYY
+    r'(\d{1,2})\s+de\s+(enero|febrero|marzo|abril|mayo|junio|julio|agosto|septiembre|octubre|noviembre|diciembre)',
+    r'(lunes|martes|mi[eé]rcoles|jueves|viernes|s[aá]bado|domingo)\s+(\d{1,2})',
+]]
+
+_HORA_PATTERNS = [re.compile(p) for p in [
+    r'(\d{1,2}):(\d{2})',  # 12:00
+    r'(\d{1,2})\s*(am|pm|hrs?|horas?)',  # 12pm, 12 hrs
+    r'a\s+las?\s+(\d{1,2})(?::(\d{2}))?',  # "a las 12" o "a las 12:00"
+]]
+
+_MESES = {
+    'enero': '01', 'febrero': '02', 'marzo': '03', 'abril': '04',
+    'mayo': '05', 'junio': '06', 'julio': '07', 'agosto': '08',
+    'septiembre': '09', 'octubre': '10', 'noviembre': '11', 'diciembre': '12'
+}
+
+
+def match(query: str) -> Intent:
+    """
+    Detecta la intención del usuario basándose en palabras clave.
+    Sólo se evalúan las reglas cuyas palabras clave aparecen en el mensaje; gana la
+    primera intención (en orden de prioridad) que coincide.
+    """
+    query_lower = query.lower().strip()
+    intent = _INTENTS.first(query_lower)
+
+    if intent == 'crear_reserva':
+        params = extract_reservation_params(query_lower, query)
+        if params.get('servicio_nombre') or params.get('servicio_id'):
+            return Intent('crear_reserva', 'crear_reserva', params)
+        # Necesita más información
+        return Intent('crear_reserva_incomplete', missing=['servicio'])
+
+    if intent == 'ver_reserva':
+        # Buscar número de reserva
+        id_match = _NUMERO.search(query_lower)
+        if id_match:
+            return Intent('ver_reserva', 'ver_reserva', {'reserva_id': int(id_match.group(1))})
+        return Intent('ver_reserva_incomplete', missing=['reserva_id'])
+
+    if intent == 'procesar_pago':
+        params = extract_payment_params(query_lower, query)
+        if params.get('reserva_id') and params.get('monto'):
+            return Intent('procesar_pago', 'procesar_pago', params)
+        return Intent('procesar_pago_incomplete', missing=['reserva_id', 'monto'])
+
+    if intent == 'resumen_ventas':
+        # Por defecto, último mes
+        end_date = datetime.now().strftime('%Y-%m-%d')
+        start_date = (datetime.now() - timedelta(days=30)).strftime('%Y-%m-%d')
+        return Intent('resumen_ventas', 'resumen_ventas', {'start_date': start_date, 'end_date': end_date})
+
+    if intent == 'buscar_servicios':
+        params = extract_search_params(query_lower)
+        logger.info(f"Búsqueda detectada con params: {params}")
+        return Intent('buscar_servicios', 'buscar_productos', params)
+
+    # No se detectó intención clara
+    return Intent()
+
+
+def detect_intent(query: str) -> dict | None:
+    """
+    Detecta la intención del usuario basándose en palabras clave.
+    Retorna un dict con 'tool' y 'params' o None si no detecta intención.
+    """
+    return match(query).as_dict()
+
+
+def is_off_topic(query: str) -> bool:
+    """
+    Detecta si la pregunta está fuera del tema del sistema FindYourWork.
+    Retorna True si es off-topic.
+    """
+    query_lower = query.lower().strip()
+    # Si contiene palabras del sistema, no es off-topic
+    if _ON_TOPIC.search(query_lower):
+        return False
+    return _OFF_TOPIC.search(query_lower) is not None
+
+
+def extract_search_params(query_lower: str) -> dict:
+    """Extrae filtros de búsqueda de servicios (precio, categoría y texto)."""
+    params = {}
+
+    precio_min_match = _PRECIO_MIN.search(query_lower)
+    if precio_min_match:
+        params['precio_min'] = int(precio_min_match.group(1))
+
+    precio_max_match = _PRECIO_MAX.search(query_lower)
+    if precio_max_match:
+        params['precio_max'] = int(precio_max_match.group(1))
+
+    categoria = _CATEGORIAS.first(query_lower)
+    if categoria:
+        params['categoria'] = _CATEGORIA_NOMBRES[categoria]
+
+    # Buscar "servicios de X" donde X es el término de búsqueda
+    busqueda_match = _BUSQUEDA.search(query_lower)
+    if busqueda_match:
+        q = busqueda_match.group(1).strip()
+        # Limpiar palabras comunes y muy cortas
+        q = _BUSQUEDA_STOPWORDS.sub('', q).strip()
+        if q and len(q) >= 2:
+            params['q'] = q
+
+    return params
+
+
+def extract_payment_params(query_lower: str, query_original: str) -> dict:
+    """Extrae parámetros de pago del mensaje del usuario."""
+    params = {}
+
+    # PRIMERO: Buscar ID de reserva (patrones específicos para evitar confusión con monto)
+    reserva_id = None
+    for pattern in _PAGO_RESERVA_PATTERNS:
+        reserva_match = pattern.search(query_lower)
+        if reserva_match:
+            reserva_id = int(reserva_match.group(1))
+            params['reserva_id'] = reserva_id
+            break
+
+    # SEGUNDO: Buscar monto (excluyendo el número de reserva ya encontrado)
+    for pattern in _PAGO_MONTO_PATTERNS:
+        monto_match = pattern.search(query_lower)
+        if monto_match:
+            monto_valor = monto_match.group(1)
+            # Asegurarse de que no sea el mismo número que la reserva
+            if reserva_id is None or int(float(monto_valor)) != reserva_id:
+                params['monto'] = monto_valor
+                break
+
+    # Buscar método de pago
+    if 'tarjeta' in query_lower:
+        params['metodo_pago'] = 'tarjeta'
+    elif 'efectivo' in query_lower:
+        params['metodo_pago'] = 'efectivo'
+    elif 'transferencia' in query_lower:
+        params['metodo_pago'] = 'transferencia'
+    else:
+        params['metodo_pago'] = 'tarjeta'  # Default
+
+    logger.info(f"Payment params extracted: {params}")
+    return params
+
+
+def extract_reservation_params(query_lower: str, query_original: str) -> dict:
+    """Extrae parámetros de reserva del mensaje del usuario."""
+    params = {}
+
+    # Buscar nombre de servicio entre comillas
+    quoted_match = _SERVICIO_ENTRE_COMILLAS.search(query_original)
+    if quoted_match:
+        params['servicio_nombre'] = quoted_match.group(1)
+
+    # Buscar "servicio X" o "el servicio X"
+    if not params.get('servicio_nombre'):
+        servicio_match = _SERVICIO_NOMBRE.search(query_lower)
+        if servicio_match:
+            params['servicio_nombre'] = servicio_match.group(1).strip()
+
+    for pattern in _FECHA_PATTERNS:
+        fecha_match = pattern.search(query_lower)
+        if fecha_match:
+            groups = fecha_match.groups()
+            if len(groups) == 3 and groups[0].isdigit():
+                # YYYY-MM-DD o DD/MM/YYYY
+                if len(groups[0]) == 4:
+                    params['fecha'] = f"{groups[0]}-{groups[1]}-{groups[2]}"
+                else:
+                    params['fecha'] = f"{groups[2]}-{groups[1].zfill(2)}-{groups[0].zfill(2)}"
+            elif len(groups) == 2:
+                # "19 de enero" o "lunes 19"
+                dia = None
+                mes = None
+                for g in groups:
+                    if g.isdigit():
+                        dia = g.zfill(2)
+                    elif g in _MESES:
+                        mes = _MESES[g]
+                if dia:
+                    # Asumir año actual o 2026
+                    year = '2026'
+                    if mes:
+                        params['fecha'] = f"{year}-{mes}-{dia}"
+                    else:
+                        # Asumir mes actual (enero 2026)
+                        params['fecha'] = f"2026-01-{dia}"
+            break
+
+    for pattern in _HORA_PATTERNS:
+        hora_match = pattern.search(query_lower)
+        if hora_match:
+            groups = hora_match.groups()
+            hora = groups[0]
+            minutos = '00'
+
+            if len(groups) > 1 and groups[1] and groups[1].isdigit():
+                minutos = groups[1]
+            elif len(groups) > 1 and groups[1] in ['pm', 'p.m.']:
+                hora = str(int(hora) + 12) if int(hora) < 12 else hora
+
+            params['hora'] = f"{hora.zfill(2)}:{minutos}"
+            break
+
+    return params
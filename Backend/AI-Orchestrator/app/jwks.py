@@ -1,26 +1,157 @@
-from jwt import PyJWKClient, decode, InvalidTokenError
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+import asyncio
+import logging
+import time
+
+from jwt import PyJWK, PyJWTError, InvalidTokenError, decode, get_unverified_header
 from fastapi import HTTPException
+
+from app import http_pool
 from app.config import settings
 
+logger = logging.getLogger(__name__)
+
 
 class JWKSVerifier:
-    def __init__(self, jwks_url: str):
+    """Verify RS256 tokens against a JWKS endpoint without blocking the event loop.
+
+    Signing keys are fetched with the shared async HTTP pool, parsed once and kept in memory by
+    `kid`. Once they are older than `refresh_seconds` they keep being used while a background task
+    refreshes them (stale-while-revalidate). A token with an unknown `kid` (key rotation) forces a
+    refresh, at most once every `min_refresh_seconds`. Verified tokens are remembered in a small LRU
+    until their `exp`, so repeated requests with the same token skip the RSA verification.
+    """
+
+    def __init__(
+        self,
+        jwks_url: str,
+        refresh_seconds: float = 300,
+        min_refresh_seconds: float = 30,
+        fetch_timeout: float = 5.0,
+        token_cache_size: int = 1024,
+    ):
         if not jwks_url:
             raise RuntimeError("JWKS URL not configured")
         self.jwks_url = jwks_url
-        self._client = PyJWKClient(jwks_url)
+        self._refresh_seconds = refresh_seconds
+        self._min_refresh_seconds = min_refresh_seconds
+        self._fetch_timeout = fetch_timeout
+        self._token_cache_size = token_cache_size
+        self._keys: Dict[Optional[str], PyJWK] = {}
+        self._fetched_at: float | None = None
+        self._attempted_at: float | None = None
+        self._fetching: asyncio.Task | None = None
+        self._verified: "OrderedDict[str, Tuple[float, dict]]" = OrderedDict()
 
-    def verify(self, token: str) -> dict:
+    async def prefetch(self) -> None:
+        """Load the keys ahead of the first request; failures are logged and retried on demand."""
         try:
-            signing_key = self._client.get_signing_key_from_jwt(token)
+            await self.refresh()
         except Exception as e:
-            raise HTTPException(status_code=401, detail=f"Invalid token (key fetch): {e}")
+            logger.warning("JWKS prefetch from %s failed: %s", self.jwks_url, e)
+
+    async def refresh(self) -> None:
+        """Fetch the key set now. Concurrent callers share a single request."""
+        task = self._in_flight()
+        if task is None:
+            task = self._fetching = asyncio.get_running_loop().create_task(self._fetch())
+        await asyncio.shield(task)
+
+    def _in_flight(self) -> asyncio.Task | None:
+        task = self._fetching
+        if task is None or task.done() or task.get_loop() is not asyncio.get_running_loop():
+            return None
+        return task
+
+    async def _fetch(self) -> None:
+        self._attempted_at = time.monotonic()
+        client = http_pool.get_async_client(
+            "jwks", timeout=self._fetch_timeout, max_connections=2, max_keepalive_connections=1
+        )
+        resp = await client.get(self.jwks_url)
+        resp.raise_for_status()
+        keys: Dict[Optional[str], PyJWK] = {}
+        for data in resp.json().get("keys", []):
+            if data.get("use", "sig") != "sig":
+                continue
+            try:
+                jwk = PyJWK(data)
+            except PyJWTError as e:
+                logger.warning("Skipping unusable JWKS key %s: %s", data.get("kid"), e)
+                continue
+            keys[jwk.key_id] = jwk
+        if not keys:
+            raise RuntimeError("JWKS endpoint returned no usable signing keys")
+        self._keys = keys
+        self._fetched_at = time.monotonic()
+
+    def _refresh_in_background(self) -> None:
+        if self._in_flight() is not None:
+            return
+        task = self._fetching = asyncio.get_running_loop().create_task(self._fetch())
+        task.add_done_callback(self._log_background_failure)
+
+    def _log_background_failure(self, task: asyncio.Task) -> None:
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning("JWKS background refresh failed, keeping cached keys: %s", task.exception())
+
+    async def _signing_key(self, kid: Optional[str]) -> PyJWK:
+        now = time.monotonic()
+        key = self._keys.get(kid)
+        if key is not None:
+            if now - self._fetched_at >= self._refresh_seconds:
+                self._refresh_in_background()
+            return key
+
+        # Unknown kid: the keys may have rotated. Refetch, but never more than once per interval.
+        if self._attempted_at is None or now - self._attempted_at >= self._min_refresh_seconds:
+            try:
+                await self.refresh()
+            except Exception as e:
+                raise HTTPException(status_code=401, detail=f"Invalid token (key fetch): {e}")
+            key = self._keys.get(kid)
+        if key is None:
+            raise HTTPException(status_code=401, detail=f"Invalid token (key fetch): unknown kid {kid!r}")
+        return key
+
+    def _cached_payload(self, token: str) -> Optional[dict]:
+        entry = self._verified.get(token)
+        if entry is None:
+            return None
+        expires_at, payload = entry
+        if expires_at <= time.time():
+            del self._verified[token]
+            return None
+        self._verified.move_to_end(token)
+        return dict(payload)
+
+    def _remember(self, token: str, payload: dict) -> None:
+        # Only tokens with an expiry are cached: the entry must not outlive the token.
+        exp = payload.get("exp")
+        if self._token_cache_size <= 0 or not isinstance(exp, (int, float)):
+            return
+        self._verified[token] = (float(exp), dict(payload))
+        while len(self._verified) > self._token_cache_size:
+            self._verified.popitem(last=False)
+
+    async def verify(self, token: str) -> dict:
+        payload = self._cached_payload(token)
+        if payload is not None:
+            return payload
+
+        try:
+            kid = get_unverified_header(token).get("kid")
+        except PyJWTError as e:
+            raise HTTPException(status_code=401, detail=f"Invalid token: {e}")
+        signing_key = await self._signing_key(kid)
 
         try:
             payload = decode(token, signing_key.key, algorithms=["RS256"], options={"require": ["sub"]})
-            return payload
         except InvalidTokenError as e:
             raise HTTPException(status_code=401, detail=f"Invalid token: {e}")
+        self._remember(token, payload)
+        return payload
 
 
 _verifier: JWKSVerifier | None = None
@@ -31,10 +162,16 @@ def get_verifier() -> JWKSVerifier:
     if _verifier is None:
         if not getattr(settings, 'JWKS_URL', None):
             raise RuntimeError("JWKS_URL not configured in settings")
-        _verifier = JWKSVerifier(str(settings.JWKS_URL))
+        _verifier = JWKSVerifier(
+            str(settings.JWKS_URL),
+            refresh_seconds=settings.JWKS_REFRESH_SECONDS,
+            min_refresh_seconds=settings.JWKS_MIN_REFRESH_SECONDS,
+            fetch_timeout=settings.JWKS_FETCH_TIMEOUT,
+            token_cache_size=settings.JWKS_TOKEN_CACHE_SIZE,
+        )
     return _verifier
 
 
-def verify_jwt_token(token: str) -> dict:
+async def verify_jwt_token(token: str) -> dict:
     v = get_verifier()
-    return v.verify(token)
+    return await v.verify(token)
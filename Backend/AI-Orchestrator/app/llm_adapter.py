@@ -3,28 +3,62 @@ from typing import Protocol, Dict, Any, AsyncIterator
 from app.adapters.openai_adapter import OpenAIAdapter as OpenAIAdapterImpl
 from app.adapters.hf_adapter import HFAdapter as HFAdapterImpl
 from app.config import settings
+from app.singleflight import SingleFlight, StreamFlight
+
+# Identical prompts generated concurrently (bursts of the same question) share one LLM call
+_generate_flights = SingleFlight()
+# ...and, on /chat/stream, one upstream stream replayed to every caller
+_stream_flights = StreamFlight()
 
 
 class LLMAdapter(Protocol):
     async def generate(self, prompt: str, stream: bool = False) -> Any:  # could be str or AsyncIterator
         ...
 
+    def model_name(self) -> str:
+        ...
+
+    def stream_generate(self, prompt: str) -> AsyncIterator[str]:
+        ...
+
 
 class OpenAIAdapter:
     def __init__(self, api_key: str | None = None, model: str = "gpt-4o-mini"):
         # wrapper that instantiates the concrete adapter implementation
         self._impl = OpenAIAdapterImpl(api_key=api_key, model=model)
 
+    def model_name(self) -> str:
+        return f"openai:{self._impl.model}"
+
     async def generate(self, prompt: str, stream: bool = False):
-        return await self._impl.generate(prompt=prompt, stream=stream)
+        if stream:
+            return await self._impl.generate(prompt=prompt, stream=stream)
+        key = ("openai", self._impl.model, prompt)
+        return await _generate_flights.do(key, lambda: self._impl.generate(prompt=prompt))
+
+    async def stream_generate(self, prompt: str) -> AsyncIterator[str]:
+        key = ("openai", self._impl.model, prompt)
+        async for chunk in _stream_flights.stream(key, lambda: self._impl.stream_generate(prompt)):
+            yield chunk
 
 
 class HuggingFaceAdapter:
     def __init__(self, api_key: str | None = None, model: str | None = None):
         self._impl = HFAdapterImpl(api_key=api_key, default_model=model)
 
+    def model_name(self) -> str:
+        return f"hf:{self._impl.default_model}"
+
     async def generate(self, prompt: str, stream: bool = False):
-        return await self._impl.generate(prompt=prompt, stream=stream)
+        if stream:
+            return await self._impl.generate(prompt=prompt, stream=stream)
+        key = ("hf", self._impl.default_model, prompt)
+        return await _generate_flights.do(key, lambda: self._impl.generate(prompt=prompt))
+
+    async def stream_generate(self, prompt: str) -> AsyncIterator[str]:
+        key = ("hf", self._impl.default_model, prompt)
+        async for chunk in _stream_flights.stream(key, lambda: self._impl.stream_generate(prompt)):
+            yield chunk
 
 
 def get_default_adapter():
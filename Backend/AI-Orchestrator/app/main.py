@@ -1,10 +1,31 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.routes import ingest, chat
 from app.config import settings
-
-app = FastAPI(title="AI Orchestrator")
+from app import http_pool
+from app.jwks import get_verifier
+from app.model_registry import configured_local_models, get_model_registry
+from app.tools import get_default_registry
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Open the pooled tools client and load the JWKS keys up front; close every shared client on shutdown
+    await get_default_registry().client.start()
+    if settings.JWKS_URL:
+        await get_verifier().prefetch()
+    if settings.HF_LOCAL_WARMUP:
+        await get_model_registry().warm_up(configured_local_models())
+    try:
+        yield
+    finally:
+        await http_pool.aclose_all()
+
+
+app = FastAPI(title="AI Orchestrator", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
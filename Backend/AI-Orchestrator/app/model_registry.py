@@ -0,0 +1,122 @@
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
+import asyncio
+import logging
+import threading
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING = "embedding"
+TEXT_GENERATION = "text-generation"
+
+
+def _load_sentence_transformer(model_id: str) -> Any:
+    from sentence_transformers import SentenceTransformer
+
+    return SentenceTransformer(model_id)
+
+
+def _load_text_generation(model_id: str) -> Any:
+    from transformers import pipeline
+
+    return pipeline("text-generation", model=model_id, device_map="auto")
+
+
+DEFAULT_LOADERS: Dict[str, Callable[[str], Any]] = {
+    EMBEDDING: _load_sentence_transformer,
+    TEXT_GENERATION: _load_text_generation,
+}
+
+
+class ModelRegistry:
+    """Process-wide cache of local models (sentence-transformers, transformers pipelines).
+
+    Each (kind, model_id) is loaded lazily at most once, even when several requests ask for it
+    concurrently. When more than `max_models` are loaded the least recently used one is dropped.
+    Inference runs on a dedicated thread pool so the event loop is never blocked.
+    """
+
+    def __init__(self, max_models: int = 2, max_workers: int = 1, loaders: Dict[str, Callable[[str], Any]] | None = None):
+        self._max_models = max(1, max_models)
+        self._loaders = dict(loaders or DEFAULT_LOADERS)
+        self._models: "OrderedDict[Tuple[str, str], Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._load_locks: Dict[Tuple[str, str], threading.Lock] = {}
+        self._executor = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="local-model")
+
+    def get(self, kind: str, model_id: str) -> Any:
+        """Return the loaded model, loading it on first use (blocking; call from a worker thread)."""
+        key = (kind, model_id)
+        with self._lock:
+            if key in self._models:
+                self._models.move_to_end(key)
+                return self._models[key]
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+
+        # Per-model lock: concurrent callers wait for a single load instead of loading twice
+        with load_lock:
+            with self._lock:
+                if key in self._models:
+                    self._models.move_to_end(key)
+                    return self._models[key]
+            loader = self._loaders.get(kind)
+            if loader is None:
+                raise RuntimeError(f"No loader registered for local model kind '{kind}'")
+            logger.info("Loading local %s model %s", kind, model_id)
+            model = loader(model_id)
+            with self._lock:
+                self._models[key] = model
+                while len(self._models) > self._max_models:
+                    evicted, _ = self._models.popitem(last=False)
+                    self._load_locks.pop(evicted, None)
+                    logger.info("Evicted local %s model %s", *evicted)
+            return model
+
+    def loaded(self) -> list:
+        with self._lock:
+            return list(self._models.keys())
+
+    async def run(self, kind: str, model_id: str, fn: Callable[[Any], Any]) -> Any:
+        """Run `fn(model)` on the registry executor, loading the model there if needed."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, lambda: fn(self.get(kind, model_id)))
+
+    async def warm_up(self, models: Dict[str, str]) -> None:
+        """Load the given {kind: model_id} models ahead of the first request."""
+        loop = asyncio.get_running_loop()
+        for kind, model_id in models.items():
+            try:
+                await loop.run_in_executor(self._executor, self.get, kind, model_id)
+            except Exception:
+                logger.warning("Warm-up failed for local %s model %s", kind, model_id, exc_info=True)
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False)
+
+
+_default_registry: Optional[ModelRegistry] = None
+
+
+def get_model_registry() -> ModelRegistry:
+    global _default_registry
+    if _default_registry is None:
+        _default_registry = ModelRegistry(
+            max_models=settings.HF_LOCAL_MAX_MODELS,
+            max_workers=settings.HF_LOCAL_WORKERS,
+        )
+    return _default_registry
+
+
+def configured_local_models() -> Dict[str, str]:
+    """Local models to warm up, based on HF_LOCAL_MODEL / HF_LOCAL_EMBEDDING_MODEL."""
+    models: Dict[str, str] = {}
+    if not settings.HF_USE_LOCAL:
+        return models
+    if settings.HF_LOCAL_EMBEDDING_MODEL or settings.HF_LOCAL_MODEL:
+        models[EMBEDDING] = settings.HF_LOCAL_EMBEDDING_MODEL or settings.HF_LOCAL_MODEL
+    if settings.HF_LOCAL_MODEL:
+        models[TEXT_GENERATION] = settings.HF_LOCAL_MODEL
+    return models
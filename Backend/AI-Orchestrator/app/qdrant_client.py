@@ -1,39 +1,184 @@
-from qdrant_client import QdrantClient
+from qdrant_client import AsyncQdrantClient, QdrantClient
 from qdrant_client.http import models as rest
-from qdrant_client.http import exceptions as qdrant_exceptions
+from concurrent.futures import ThreadPoolExecutor
 from app.config import settings
 from typing import List, Dict, Any
+import asyncio
+import threading
+import weakref
 
+# Shared clients: one sync client per process, one async client per event loop.
+_client: QdrantClient | None = None
+_client_lock = threading.Lock()
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncQdrantClient]" = weakref.WeakKeyDictionary()
 
-def get_qdrant_client() -> QdrantClient:
+# Known collections and their vector size, so upserts skip the get_collection round trip.
+_known_collections: Dict[str, int] = {}
+_collections_lock = threading.Lock()
+
+_upsert_executor: ThreadPoolExecutor | None = None
+# Upserts in flight per event loop for the async path (the executor bounds the sync one)
+_upsert_limits: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = weakref.WeakKeyDictionary()
+
+
+def _client_kwargs() -> Dict[str, Any]:
     if settings.QDRANT_URL:
         # If QDRANT_URL is e.g. http://localhost:6333
-        return QdrantClient(url=settings.QDRANT_URL, api_key=settings.QDRANT_API_KEY)
+        return {
+            "url": settings.QDRANT_URL,
+            "api_key": settings.QDRANT_API_KEY,
+            "prefer_grpc": settings.QDRANT_PREFER_GRPC and _grpc_available(),
+        }
     # default local
-    return QdrantClient()
+    return {}
 
 
-def ensure_collection(collection_name: str, vector_size: int = 768, distance: str = "Cosine"):
-    client = get_qdrant_client()
+def _grpc_available() -> bool:
     try:
-        if not client.get_collection(collection_name):
-            schema = rest.CreateCollection(name=collection_name, vectors=rest.VectorParams(size=vector_size, distance=distance))
-            client.create_collection(collection_name=collection_name, vectors=rest.VectorParams(size=vector_size, distance=distance))
-    except qdrant_exceptions.ResponseHandlingException:
-        # if the get_collection call fails (collection doesn't exist) try to create
-        client.create_collection(collection_name=collection_name, vectors=rest.VectorParams(size=vector_size, distance=distance))
+        import grpc  # noqa: F401
+    except Exception:
+        return False
+    return True
+
+
+def get_qdrant_client() -> QdrantClient:
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = QdrantClient(**_client_kwargs())
+    return _client
+
+
+def get_async_qdrant_client() -> AsyncQdrantClient:
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = AsyncQdrantClient(**_client_kwargs())
+        _async_clients[loop] = client
+    return client
+
+
+def _get_upsert_executor() -> ThreadPoolExecutor:
+    global _upsert_executor
+    if _upsert_executor is None:
+        with _client_lock:
+            if _upsert_executor is None:
+                _upsert_executor = ThreadPoolExecutor(
+                    max_workers=max(1, settings.QDRANT_UPSERT_PARALLEL),
+                    thread_name_prefix="qdrant-upsert",
+                )
+    return _upsert_executor
+
+
+def _get_upsert_limit() -> asyncio.Semaphore:
+    loop = asyncio.get_running_loop()
+    limit = _upsert_limits.get(loop)
+    if limit is None:
+        limit = asyncio.Semaphore(max(1, settings.QDRANT_UPSERT_PARALLEL))
+        _upsert_limits[loop] = limit
+    return limit
+
+
+def forget_collection(collection_name: str | None = None):
+    """Drop cached collection metadata (all collections when no name is given)."""
+    with _collections_lock:
+        if collection_name is None:
+            _known_collections.clear()
+        else:
+            _known_collections.pop(collection_name, None)
+
+
+def ensure_collection(collection_name: str, vector_size: int = 768, distance: str = "Cosine"):
+    size = _known_collections.get(collection_name)
+    if size is None:
+        with _collections_lock:
+            size = _known_collections.get(collection_name)
+            if size is None:
+                client = get_qdrant_client()
+                if client.collection_exists(collection_name):
+                    info = client.get_collection(collection_name)
+                    size = getattr(info.config.params.vectors, "size", None) or vector_size
+                else:
+                    client.create_collection(collection_name=collection_name, vectors_config=rest.VectorParams(size=vector_size, distance=distance))
+                    size = vector_size
+                _known_collections[collection_name] = size
+    if size != vector_size:
+        raise ValueError(f"Collection '{collection_name}' expects vectors of size {size}, got {vector_size}")
+
+
+def _point_batches(ids: List[str], vectors: List[List[float]], payloads: List[Dict[str, Any]]) -> List[List[rest.PointStruct]]:
+    points = [rest.PointStruct(id=i, vector=v, payload=p) for i, v, p in zip(ids, vectors, payloads)]
+    batch_size = max(1, settings.QDRANT_UPSERT_BATCH_SIZE)
+    return [points[i:i + batch_size] for i in range(0, len(points), batch_size)]
+
 
+def upsert_embeddings(collection_name: str, ids: List[str], vectors: List[List[float]], payloads: List[Dict[str, Any]], wait: bool | None = None):
+    """Upsert points in batches of QDRANT_UPSERT_BATCH_SIZE, sent in parallel.
 
-def upsert_embeddings(collection_name: str, ids: List[str], vectors: List[List[float]], payloads: List[Dict[str, Any]]):
+    `wait` defaults to QDRANT_UPSERT_WAIT (True: points are searchable when this returns);
+    bulk loads can pass wait=False so Qdrant acknowledges batches without waiting for them
+    to be indexed.
+    """
     client = get_qdrant_client()
     # ensure collection exists with vector size of first vector
     if vectors and len(vectors[0]) > 0:
         ensure_collection(collection_name, vector_size=len(vectors[0]))
-    points = [rest.PointStruct(id=i, vector=v, payload=p) for i, v, p in zip(ids, vectors, payloads)]
-    client.upsert(collection_name=collection_name, points=points)
+    wait = settings.QDRANT_UPSERT_WAIT if wait is None else wait
+    batches = _point_batches(ids, vectors, payloads)
+    if len(batches) <= 1:
+        for batch in batches:
+            client.upsert(collection_name=collection_name, points=batch, wait=wait)
+        return
+    executor = _get_upsert_executor()
+    futures = [executor.submit(client.upsert, collection_name=collection_name, points=batch, wait=wait) for batch in batches]
+    for f in futures:
+        f.result()
+
+
+async def aupsert_embeddings(collection_name: str, ids: List[str], vectors: List[List[float]], payloads: List[Dict[str, Any]], wait: bool | None = None):
+    """Async `upsert_embeddings` for code running on the event loop.
+
+    Batches go through the loop's AsyncQdrantClient, at most QDRANT_UPSERT_PARALLEL in flight
+    per loop, so waiting for Qdrant never blocks other requests.
+    """
+    if vectors and len(vectors[0]) > 0:
+        if collection_name in _known_collections:
+            ensure_collection(collection_name, vector_size=len(vectors[0]))  # cached, no request
+        else:
+            await asyncio.to_thread(ensure_collection, collection_name, len(vectors[0]))
+    wait = settings.QDRANT_UPSERT_WAIT if wait is None else wait
+    client = get_async_qdrant_client()
+    limit = _get_upsert_limit()
 
+    async def send(batch: List[rest.PointStruct]):
+        async with limit:
+            await client.upsert(collection_name=collection_name, points=batch, wait=wait)
 
-def search(collection_name: str, vector: List[float], limit: int = 5):
+    await asyncio.gather(*(send(batch) for batch in _point_batches(ids, vectors, payloads)))
+
+
+def delete_points(collection_name: str, ids: List[str]):
+    if not ids:
+        return
     client = get_qdrant_client()
-    res = client.search(collection_name=collection_name, query_vector=vector, limit=limit)
-    return res
+    client.delete(collection_name=collection_name, points_selector=rest.PointIdsList(points=ids))
+
+
+async def adelete_points(collection_name: str, ids: List[str]):
+    if not ids:
+        return
+    client = get_async_qdrant_client()
+    await client.delete(collection_name=collection_name, points_selector=rest.PointIdsList(points=ids))
+
+
+def search(collection_name: str, vector: List[float], limit: int = 5, query_filter: rest.Filter | None = None):
+    client = get_qdrant_client()
+    res = client.query_points(collection_name=collection_name, query=vector, limit=limit, query_filter=query_filter)
+    return res.points
+
+
+async def asearch(collection_name: str, vector: List[float], limit: int = 5, query_filter: rest.Filter | None = None):
+    client = get_async_qdrant_client()
+    res = await client.query_points(collection_name=collection_name, query=vector, limit=limit, query_filter=query_filter)
+    return res.points
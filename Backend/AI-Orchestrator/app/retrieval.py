@@ -0,0 +1,131 @@
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+import logging
+import re
+import time
+
+from qdrant_client.http import models as rest
+
+from app.adapters.hf_adapter import HFAdapter
+from app.config import settings
+from app.ingest import estimate_tokens
+from app.qdrant_client import asearch
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_query(query: str) -> str:
+    """Lowercase and collapse whitespace so trivially different queries share cache entries."""
+    return re.sub(r"\s+", " ", query.lower()).strip()
+
+
+class QueryEmbeddingCache:
+    """Small in-process LRU of query embeddings keyed by (model, normalized query), with TTL."""
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: int = 3600):
+        self._max_entries = max_entries
+        self._ttl = ttl_seconds
+        self._items: "OrderedDict[Tuple[str, str], Tuple[float, List[float]]]" = OrderedDict()
+
+    def get(self, model: str, query: str) -> Optional[List[float]]:
+        key = (model, query)
+        item = self._items.get(key)
+        if item is None:
+            return None
+        created_at, vector = item
+        if time.monotonic() - created_at > self._ttl:
+            del self._items[key]
+            return None
+        self._items.move_to_end(key)
+        return vector
+
+    def put(self, model: str, query: str, vector: List[float]) -> None:
+        self._items[(model, query)] = (time.monotonic(), vector)
+        self._items.move_to_end((model, query))
+        while len(self._items) > self._max_entries:
+            self._items.popitem(last=False)
+
+    def clear(self) -> None:
+        self._items.clear()
+
+
+_query_cache = QueryEmbeddingCache(
+    max_entries=settings.RAG_QUERY_CACHE_SIZE,
+    ttl_seconds=settings.RAG_QUERY_CACHE_TTL_SECONDS,
+)
+
+
+async def embed_query(query: str) -> List[float]:
+    hf = HFAdapter()
+    model = hf.embedding_model_name()
+    normalized = normalize_query(query)
+    vector = _query_cache.get(model, normalized)
+    if vector is None:
+        vector = (await hf.embed([normalized]))[0]
+        _query_cache.put(model, normalized, vector)
+    return vector
+
+
+def build_filter(filters: Dict[str, Any] | None) -> rest.Filter | None:
+    """Translate {"field": value} pairs into a Qdrant payload filter (all must match)."""
+    if not filters:
+        return None
+    return rest.Filter(must=[
+        rest.FieldCondition(key=key, match=rest.MatchValue(value=value))
+        for key, value in filters.items()
+    ])
+
+
+def pack_context(sources: List[dict], token_budget: int) -> List[dict]:
+    """Keep the best-ranked sources whose text fits in `token_budget` estimated tokens."""
+    packed: List[dict] = []
+    used = 0
+    for source in sources:
+        cost = estimate_tokens(source["text"])
+        if used + cost > token_budget:
+            continue
+        packed.append(source)
+        used += cost
+    return packed
+
+
+async def retrieve(
+    query: str,
+    top_k: int = 5,
+    filters: Dict[str, Any] | None = None,
+    collection_name: str | None = None,
+    token_budget: int | None = None,
+) -> List[dict]:
+    """Retrieve the top-k chunks for `query` that fit the prompt token budget.
+
+    Retrieval is best-effort: if embeddings or Qdrant are unavailable it logs and returns [].
+    """
+    if not settings.RAG_ENABLED or top_k <= 0:
+        return []
+    try:
+        vector = await embed_query(query)
+        points = await asearch(
+            collection_name or settings.RAG_COLLECTION,
+            vector,
+            limit=top_k,
+            query_filter=build_filter(filters),
+        )
+    except Exception as e:
+        logger.warning("Retrieval skipped: %s", e)
+        return []
+
+    sources = []
+    for point in points:
+        payload = point.payload or {}
+        if settings.RAG_SCORE_THRESHOLD is not None and point.score < settings.RAG_SCORE_THRESHOLD:
+            continue
+        if not payload.get("text"):
+            continue
+        sources.append({
+            "id": str(point.id),
+            "score": point.score,
+            "doc": payload.get("doc_id") or payload.get("doc"),
+            "page": payload.get("page"),
+            "text": payload["text"],
+        })
+    return pack_context(sources, token_budget or settings.RAG_TOKEN_BUDGET)
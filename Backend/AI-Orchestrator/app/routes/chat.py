@@ -1,9 +1,11 @@
 from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
-from typing import List, Dict, Any
+from typing import List, Dict, Any, AsyncIterator, Tuple
 from app.routes.tools import get_caller
 from app.tools import get_default_registry, ToolError
-import re
+from app.retrieval import retrieve
+from app.semantic_cache import answer_namespace, get_semantic_cache, lookup_answer, store_answer
+from app.intents import detect_intent, is_off_topic
 import logging
 
 logger = logging.getLogger(__name__)
@@ -73,179 +75,7 @@ async def get_client_data_for_user(user_id: str | int) -> dict | None:
 # =====================================================
 # Este sistema detecta la intención del usuario sin depender
 # del modelo de IA para generar JSON correctamente.
-
-def detect_intent(query: str) -> dict | None:
-    """
-    Detecta la intención del usuario basándose en palabras clave.
-    Retorna un dict con 'tool' y 'params' o None si no detecta intención.
-    """
-    query_lower = query.lower().strip()
-    
-    # ========== CREAR RESERVA ==========
-    crear_reserva_patterns = [
-        r'(crear|hacer|agendar|reservar|quiero|necesito|me gustar[ií]a)\s+(una\s+)?(reserva|cita)',
-        r'reserv(ar|a)\s+(el|un|una|para)',
-        r'agendar\s+(el|un|una|para)',
-        r'quiero\s+(el\s+)?servicio',
-        r'me\s+gustar[ií]a\s+(agendar|reservar)',
-    ]
-    
-    for pattern in crear_reserva_patterns:
-        if re.search(pattern, query_lower):
-            # Extraer información de la reserva
-            params = extract_reservation_params(query_lower, query)
-            if params.get('servicio_nombre') or params.get('servicio_id'):
-                return {'tool': 'crear_reserva', 'params': params, 'intent': 'crear_reserva'}
-            else:
-                # Necesita más información
-                return {'tool': None, 'intent': 'crear_reserva_incomplete', 'missing': ['servicio']}
-    
-    # ========== VER/CONSULTAR RESERVA ==========
-    ver_reserva_patterns = [
-        r'(ver|consultar|mostrar|cual|donde|estado)\s+(mi|la|una)?\s*reserva',
-        r'reserva\s+(número|numero|#|id)\s*(\d+)',
-        r'mis\s+reservas',
-    ]
-    
-    for pattern in ver_reserva_patterns:
-        match = re.search(pattern, query_lower)
-        if match:
-            # Buscar número de reserva
-            id_match = re.search(r'(\d+)', query_lower)
-            if id_match:
-                return {'tool': 'ver_reserva', 'params': {'reserva_id': int(id_match.group(1))}, 'intent': 'ver_reserva'}
-            return {'tool': None, 'intent': 'ver_reserva_incomplete', 'missing': ['reserva_id']}
-    
-    # ========== PROCESAR PAGO ==========
-    pago_patterns = [
-        r'(pagar|hacer\s+pago|procesar\s+pago|registrar\s+pago)',
-        r'(quiero|necesito)\s+pagar',
-        r'pago\s+(de|para)\s+(la\s+)?reserva',
-    ]
-    
-    for pattern in pago_patterns:
-        if re.search(pattern, query_lower):
-            params = extract_payment_params(query_lower, query)
-            if params.get('reserva_id') and params.get('monto'):
-                return {'tool': 'procesar_pago', 'params': params, 'intent': 'procesar_pago'}
-            else:
-                return {'tool': None, 'intent': 'procesar_pago_incomplete', 'missing': ['reserva_id', 'monto']}
-    
-    # ========== RESUMEN DE VENTAS ========== (ANTES de buscar_productos para evitar conflicto)
-    ventas_patterns = [
-        r'resumen\s+(de\s+)?ventas',
-        r'reporte\s+(de\s+)?ventas',
-        r'informe\s+(de\s+)?ventas',
-        r'cu[aá]nto\s+(vend[ií]|se\s+ha\s+vendido)',
-        r'ventas\s+(del|de)\s+(d[ií]a|mes|semana)',
-    ]
-    
-    for pattern in ventas_patterns:
-        if re.search(pattern, query_lower):
-            # Por defecto, último mes
-            from datetime import datetime, timedelta
-            end_date = datetime.now().strftime('%Y-%m-%d')
-            start_date = (datetime.now() - timedelta(days=30)).strftime('%Y-%m-%d')
-            return {'tool': 'resumen_ventas', 'params': {'start_date': start_date, 'end_date': end_date}, 'intent': 'resumen_ventas'}
-    
-    # ========== BUSCAR SERVICIOS (detección mejorada) ==========
-    # Detectar si es una búsqueda de servicios
-    is_search = bool(re.search(r'(busca|buscar|encuentra|lista|listar|muestra|mostrar|dame|dime|cu[aá]les|hay).*(servicio|producto)', query_lower)) or \
-                bool(re.search(r'servicio[s]?\s+(disponible|de\s+|con\s+|que)', query_lower)) or \
-                bool(re.search(r'qu[eé]\s+servicios', query_lower))
-    
-    if is_search:
-        params = {}
-        
-        # Extraer precio mínimo
-        precio_min_match = re.search(r'(?:precio\s+)?(?:mayor|m[aá]s|superior)\s*(?:a|de|que)?\s*\$?\s*(\d+)', query_lower)
-        if precio_min_match:
-            params['precio_min'] = int(precio_min_match.group(1))
-        
-        # Extraer precio máximo
-        precio_max_match = re.search(r'(?:precio\s+)?(?:menor|menos|inferior)\s*(?:a|de|que)?\s*\$?\s*(\d+)', query_lower)
-        if precio_max_match:
-            params['precio_max'] = int(precio_max_match.group(1))
-        
-        # Detectar categoría
-        if re.search(r'belleza|peluquer|cabello|corte', query_lower):
-            params['categoria'] = 'Servicios de belleza'
-        elif re.search(r'reparacion|hogar|plomer|electric', query_lower):
-            params['categoria'] = 'Reparaciones del hogar'
-        elif re.search(r'clases|educaci|particular|enseñ', query_lower):
-            params['categoria'] = 'Clases particulares'
-        elif re.search(r'm[eé]dic|salud|cita', query_lower):
-            params['categoria'] = 'Salud'
-        
-        # Extraer texto de búsqueda específico
-        # Buscar "servicios de X" donde X es el término de búsqueda
-        busqueda_match = re.search(r'servicios?\s+(?:de\s+|llamado\s+)?["\']?([a-záéíóúñ\s]+)["\']?(?:\s+para|\s+con|\s*$)', query_lower)
-        if busqueda_match:
-            q = busqueda_match.group(1).strip()
-            # Limpiar palabras comunes y muy cortas
-            q = re.sub(r'\b(con|de|del|la|el|los|las|un|una|que|tiene|tienen|precio|mayor|menor|disponibles?)\b', '', q).strip()
-            if q and len(q) >= 2:
-                params['q'] = q
-        
-        logger.info(f"Búsqueda detectada con params: {params}")
-        return {'tool': 'buscar_productos', 'params': params, 'intent': 'buscar_servicios'}
-    
-    # ========== NO SE DETECTÓ INTENCIÓN CLARA ==========
-    return None
-
-
-def is_off_topic(query: str) -> bool:
-    """
-    Detecta si la pregunta está fuera del tema del sistema FindYourWork.
-    Retorna True si es off-topic.
-    """
-    query_lower = query.lower().strip()
-    
-    # Palabras clave que indican que ES sobre el sistema (no off-topic)
-    on_topic_keywords = [
-        'servicio', 'reserva', 'reservar', 'cita', 'agendar', 'pago', 'pagar',
-        'precio', 'costo', 'disponible', 'horario', 'cliente', 'buscar',
-        'corte', 'cabello', 'peluquer', 'masaje', 'spa', 'belleza', 'manicure',
-        'pedicure', 'facial', 'tratamiento', 'venta', 'resumen', 'reporte',
-        'findyourwork', 'plataforma', 'ayuda', 'hola', 'gracias', 'adios',
-        'salud', 'medic', 'cita', 'consulta'
-    ]
-    
-    # Si contiene palabras del sistema, no es off-topic
-    for keyword in on_topic_keywords:
-        if keyword in query_lower:
-            return False
-    
-    # Patrones que indican preguntas off-topic
-    off_topic_patterns = [
-        r'qu[eé]\s+es\s+(el|la|un|una)\s+\w+',  # "qué es la democracia"
-        r'c[oó]mo\s+(funciona|se\s+hace)\s+\w+(?!\s*(reserva|pago|servicio))',  # "cómo funciona X" (no relacionado)
-        r'cu[aá]l\s+es\s+(el|la)\s+(capital|presidente|rey)',  # preguntas de geografía/política
-        r'qui[eé]n\s+(es|fue|era)\s+\w+',  # "quién es X"
-        r'(cu[eé]ntame|dime|explica)\s+(sobre|acerca|de)\s+(?!(servicio|reserva|pago))',  # "cuéntame sobre X"
-        r'(historia|matem[aá]tica|f[ií]sica|qu[ií]mica|biolog[ií]a|geograf[ií]a)',
-        r'(pol[ií]tica|econom[ií]a|filosof[ií]a|religi[oó]n)',
-        r'(chiste|broma|adivinanza|trabalenguas)',
-        r'(clima|tiempo|temperatura)\s+(en|de)',
-        r'(receta|cocina|ingrediente)',
-        r'(pel[ií]cula|serie|libro|m[uú]sica|canci[oó]n)',
-        r'(deporte|f[uú]tbol|basket|tenis)',
-        r'(c[oó]digo|programar|python|javascript|html)',
-        r'(juego|videojuego|minecraft|fortnite)',
-    ]
-    
-    for pattern in off_topic_patterns:
-        if re.search(pattern, query_lower):
-            return True
-    
-    # Si el mensaje es muy corto y no contiene keywords del sistema
-    if len(query_lower.split()) <= 3 and not any(kw in query_lower for kw in on_topic_keywords):
-        # Podría ser un saludo o algo neutral, dejamos pasar
-        if re.search(r'^(hola|hey|buenos?\s+d[ií]as?|buenas?\s+(tardes?|noches?)|gracias|adi[oó]s|chao)$', query_lower):
-            return False
-    
-    return False
-
+# Las reglas se compilan una sola vez en app/intents.py.
 
 OFF_TOPIC_RESPONSE = """🤖 ¡Hola! Soy el asistente virtual de **FindYourWork**.
 
@@ -260,141 +90,6 @@ Mi función es ayudarte exclusivamente con nuestra plataforma de reservas de ser
 ¿En qué puedo ayudarte hoy? 😊"""
 
 
-def extract_payment_params(query_lower: str, query_original: str) -> dict:
-    """Extrae parámetros de pago del mensaje del usuario."""
-    params = {}
-    
-    # PRIMERO: Buscar ID de reserva (patrones específicos para evitar confusión con monto)
-    # Patrones como "reserva #3", "reserva 3", "a la reserva 3"
-    reserva_patterns = [
-        r'(?:a\s+la\s+)?reserva\s*(?:#|n[úu]mero|num|id)?\s*(\d+)',
-        r'(?:#|n[úu]mero|num|id)\s*(\d+)\s*(?:de\s+)?(?:la\s+)?reserva',
-        r'para\s+(?:la\s+)?reserva\s*(?:#)?\s*(\d+)',
-    ]
-    
-    reserva_id = None
-    for pattern in reserva_patterns:
-        reserva_match = re.search(pattern, query_lower)
-        if reserva_match:
-            reserva_id = int(reserva_match.group(1))
-            params['reserva_id'] = reserva_id
-            break
-    
-    # SEGUNDO: Buscar monto (patrones con $, excluyendo el número de reserva ya encontrado)
-    # Patrones: "$100", "$100 dolares", "100 dolares", "monto de $100"
-    monto_patterns = [
-        r'\$\s*(\d+(?:\.\d{1,2})?)',  # $100 o $100.00
-        r'(\d+(?:\.\d{1,2})?)\s*d[oó]lares?',  # 100 dolares
-        r'monto\s+(?:de\s+)?\$?\s*(\d+(?:\.\d{1,2})?)',  # monto de $100
-        r'pagar\s+\$?\s*(\d+(?:\.\d{1,2})?)',  # pagar $100
-    ]
-    
-    for pattern in monto_patterns:
-        monto_match = re.search(pattern, query_lower)
-        if monto_match:
-            monto_valor = monto_match.group(1)
-            # Asegurarse de que no sea el mismo número que la reserva
-            if reserva_id is None or int(float(monto_valor)) != reserva_id:
-                params['monto'] = monto_valor
-                break
-    
-    # Buscar método de pago
-    if 'tarjeta' in query_lower:
-        params['metodo_pago'] = 'tarjeta'
-    elif 'efectivo' in query_lower:
-        params['metodo_pago'] = 'efectivo'
-    elif 'transferencia' in query_lower:
-        params['metodo_pago'] = 'transferencia'
-    else:
-        params['metodo_pago'] = 'tarjeta'  # Default
-    
-    logger.info(f"Payment params extracted: {params}")
-    return params
-
-
-def extract_reservation_params(query_lower: str, query_original: str) -> dict:
-    """Extrae parámetros de reserva del mensaje del usuario."""
-    params = {}
-    
-    # Buscar nombre de servicio entre comillas
-    quoted_match = re.search(r'["\']([^"\']+)["\']', query_original)
-    if quoted_match:
-        params['servicio_nombre'] = quoted_match.group(1)
-    
-    # Buscar "servicio X" o "el servicio X"
-    servicio_match = re.search(r'(?:el\s+)?servicio\s+(?:que\s+se\s+llama\s+)?["\']?([^"\',.]+)["\']?', query_lower)
-    if servicio_match and not params.get('servicio_nombre'):
-        params['servicio_nombre'] = servicio_match.group(1).strip()
-    
-    # Buscar fecha
-    # Patrones: "19 de enero", "lunes 19", "2026-01-19", "19/01/2026"
-    fecha_patterns = [
-        r'(\d{4})-(\d{2})-(\d{2})',  # YYYY-MM-DD
-        r'(\d{1,2})[/\-](\d{1,2})[/\-](\d{4})',  # DD/MM/YYYY
-        r'(\d{1,2})\s+de\s+(enero|febrero|marzo|abril|mayo|junio|julio|agosto|septiembre|octubre|noviembre|diciembre)',
-        r'(lunes|martes|mi[eé]rcoles|jueves|viernes|s[aá]bado|domingo)\s+(\d{1,2})',
-    ]
-    
-    meses = {
-        'enero': '01', 'febrero': '02', 'marzo': '03', 'abril': '04',
-        'mayo': '05', 'junio': '06', 'julio': '07', 'agosto': '08',
-        'septiembre': '09', 'octubre': '10', 'noviembre': '11', 'diciembre': '12'
-    }
-    
-    for pattern in fecha_patterns:
-        match = re.search(pattern, query_lower)
-        if match:
-            groups = match.groups()
-            if len(groups) == 3 and groups[0].isdigit():
-                # YYYY-MM-DD o DD/MM/YYYY
-                if len(groups[0]) == 4:
-                    params['fecha'] = f"{groups[0]}-{groups[1]}-{groups[2]}"
-                else:
-                    params['fecha'] = f"{groups[2]}-{groups[1].zfill(2)}-{groups[0].zfill(2)}"
-            elif len(groups) == 2:
-                # "19 de enero" o "lunes 19"
-                dia = None
-                mes = None
-                for g in groups:
-                    if g.isdigit():
-                        dia = g.zfill(2)
-                    elif g in meses:
-                        mes = meses[g]
-                if dia:
-                    # Asumir año actual o 2026
-                    year = '2026'
-                    if mes:
-                        params['fecha'] = f"{year}-{mes}-{dia}"
-                    else:
-                        # Asumir mes actual (enero 2026)
-                        params['fecha'] = f"2026-01-{dia}"
-            break
-    
-    # Buscar hora
-    hora_patterns = [
-        r'(\d{1,2}):(\d{2})',  # 12:00
-        r'(\d{1,2})\s*(am|pm|hrs?|horas?)',  # 12pm, 12 hrs
-        r'a\s+las?\s+(\d{1,2})(?::(\d{2}))?',  # "a las 12" o "a las 12:00"
-    ]
-    
-    for pattern in hora_patterns:
-        match = re.search(pattern, query_lower)
-        if match:
-            groups = match.groups()
-            hora = groups[0]
-            minutos = '00'
-            
-            if len(groups) > 1 and groups[1] and groups[1].isdigit():
-                minutos = groups[1]
-            elif len(groups) > 1 and groups[1] in ['pm', 'p.m.']:
-                hora = str(int(hora) + 12) if int(hora) < 12 else hora
-            
-            params['hora'] = f"{hora.zfill(2)}:{minutos}"
-            break
-    
-    return params
-
-
 # System prompt con contexto de FindYourWork y herramientas MCP
 SYSTEM_PROMPT = """Eres el asistente virtual de FindYourWork, una plataforma de reservas de servicios profesionales (peluquería, spa, masajes, etc.).
 
@@ -456,9 +151,26 @@ Tienes acceso a las siguientes herramientas para ayudar a los usuarios:
 """
 
 
-def build_prompt(user_query: str) -> str:
-    """Construye el prompt completo con contexto del sistema."""
-    return f"{SYSTEM_PROMPT}\n\n## Mensaje del usuario:\n{user_query}\n\n## Tu respuesta:"
+def format_sources(sources: List[dict]) -> str:
+    """Formatea los fragmentos recuperados como contexto numerado para el prompt."""
+    lines = []
+    for i, src in enumerate(sources, 1):
+        origin = src.get('doc') or 'documento'
+        if src.get('page'):
+            origin += f", pág. {src['page']}"
+        lines.append(f"[{i}] ({origin}) {src['text'].strip()}")
+    return "\n\n".join(lines)
+
+
+def build_prompt(user_query: str, sources: List[dict] | None = None) -> str:
+    """Construye el prompt completo con contexto del sistema y, si hay, documentos recuperados."""
+    context = ""
+    if sources:
+        context = (
+            "\n\n## Información de documentos (úsala solo si es relevante y cita la fuente como [n]):\n"
+            f"{format_sources(sources)}"
+        )
+    return f"{SYSTEM_PROMPT}{context}\n\n## Mensaje del usuario:\n{user_query}\n\n## Tu respuesta:"
 
 
 def extract_json_from_response(response: str) -> dict | None:
@@ -497,6 +209,87 @@ def extract_json_from_response(response: str) -> dict | None:
         return None
 
 
+class ToolCallFilter:
+    """Elimina bloques `TOOL_CALL: {...}` de un texto que llega por fragmentos.
+
+    Retiene el final del buffer que podría ser el inicio del marcador, así nunca se
+    emite un TOOL_CALL parcial al cliente.
+    """
+
+    MARKER = "TOOL_CALL:"
+
+    def __init__(self):
+        self._pending = ""
+        self._suppress = False
+
+    def feed(self, text: str) -> str:
+        self._pending += text
+        out = ""
+        while True:
+            if self._suppress:
+                end = self._pending.find('}')
+                if end == -1:
+                    self._pending = ""
+                    return out
+                self._pending = self._pending[end + 1:]
+                self._suppress = False
+                continue
+            idx = self._pending.find(self.MARKER)
+            if idx != -1:
+                out += self._pending[:idx]
+                self._pending = self._pending[idx + len(self.MARKER):]
+                self._suppress = True
+                continue
+            keep = 0
+            for n in range(min(len(self._pending), len(self.MARKER) - 1), 0, -1):
+                if self.MARKER.startswith(self._pending[-n:]):
+                    keep = n
+                    break
+            out += self._pending[:len(self._pending) - keep]
+            self._pending = self._pending[len(self._pending) - keep:]
+            return out
+
+    def flush(self) -> str:
+        out = "" if self._suppress else self._pending
+        self._pending = ""
+        self._suppress = False
+        return out
+
+
+def sse_message(text: str) -> str:
+    """Formatea un mensaje SSE; cada salto de línea va en su propia línea `data:`."""
+    return "".join(f"data: {line}\n" for line in text.split("\n")) + "\n"
+
+
+async def stream_llm_events(chunks: AsyncIterator[str]) -> AsyncIterator[Tuple[str, str]]:
+    """Reenvía los tokens del LLM como mensajes SSE a medida que llegan.
+
+    Los mensajes se cortan en límites de palabra (el frontend une mensajes con un espacio)
+    y se omiten los TOOL_CALL que genere el modelo. Produce tuplas (evento_sse, texto);
+    `join_stream_texts` reconstruye la respuesta a partir de los textos.
+    """
+    tool_filter = ToolCallFilter()
+    buffer = ""
+    async for chunk in chunks:
+        buffer += tool_filter.feed(chunk)
+        cut = max(buffer.rfind(" "), buffer.rfind("\n"))
+        if cut <= 0:
+            continue
+        # un salto de línea como límite se conserva; un espacio lo agrega el frontend
+        newline = "\n" if buffer[cut] == "\n" else ""
+        text, buffer = buffer[:cut].strip(" ") + newline, buffer[cut + 1:]
+        if text.strip():
+            yield sse_message(text), text
+    buffer = (buffer + tool_filter.flush()).strip()
+    if buffer:
+        yield sse_message(buffer), buffer
+
+
+def join_stream_texts(pieces: List[str]) -> str:
+    """Reconstruye el texto completo a partir de los fragmentos de `stream_llm_events`."""
+    return "".join(p if p.endswith("\n") else p + " " for p in pieces).strip()
+
+
 async def execute_tool_if_needed(response: str, caller: dict | None = None) -> tuple[str, dict | None]:
     """Detecta y ejecuta llamadas a herramientas en la respuesta del LLM."""
     import json
@@ -542,7 +335,7 @@ async def execute_tool_if_needed(response: str, caller: dict | None = None) -> t
         
         # Para operaciones que crean datos, confirmar automáticamente
         confirm = True if tool_name in ['crear_reserva', 'registrar_cliente', 'procesar_pago'] else None
-        result = await registry.execute(tool_name, params, confirm=confirm)
+        result = await registry.execute(tool_name, params, confirm=confirm, caller=caller)
         
         # Formatear resultado de forma legible
         if isinstance(result, list):
@@ -572,6 +365,8 @@ class ChatRequest(BaseModel):
     query: str
     session_id: str | None = None
     top_k: int = 5
+    # Filtro opcional sobre el payload de los documentos, p.ej. {"doc_id": "precios.pdf"}
+    filters: Dict[str, Any] | None = None
 
 
 class ToolCall(BaseModel):
@@ -588,15 +383,35 @@ async def query_chat(payload: ChatRequest, caller=Depends(get_caller)):
     from app.llm_adapter import get_default_adapter
 
     adapter = get_default_adapter()
+    namespace = answer_namespace(adapter, payload.filters)
+    
+    # Respuesta ya generada para una pregunta equivalente (caché semántica)
+    vector, cached = await lookup_answer(payload.query, namespace)
+    if cached is not None:
+        return {"answer": cached.answer, "sources": cached.sources, "tool_result": None}
+    
+    # Recuperar fragmentos relevantes de los documentos ingeridos (RAG)
+    sources = await retrieve(payload.query, top_k=payload.top_k, filters=payload.filters)
     
-    # Construir prompt con contexto del sistema
-    full_prompt = build_prompt(payload.query)
+    # Construir prompt con contexto del sistema y documentos
+    full_prompt = build_prompt(payload.query, sources)
     answer = await adapter.generate(full_prompt)
     
     # Detectar y ejecutar herramientas si es necesario (pasar caller para autenticación)
     final_answer, tool_result = await execute_tool_if_needed(answer, caller)
+    
+    # Solo se cachean respuestas sin TOOL_CALL: las herramientas dependen del usuario
+    if tool_result is None and extract_json_from_response(answer) is None:
+        store_answer(namespace, vector, answer, sources)
+
+    return {"answer": final_answer, "sources": sources, "tool_result": tool_result}
 
-    return {"answer": final_answer, "sources": [], "tool_result": tool_result}
+
+@router.get("/semantic-cache/stats")
+async def semantic_cache_stats(caller=Depends(get_caller)):
+    """Métricas de la caché semántica de respuestas (aciertos, fallos, entradas)."""
+    cache = get_semantic_cache()
+    return cache.stats() if cache is not None else {"enabled": False}
 
 
 @router.post("/stream")
@@ -626,6 +441,17 @@ async def stream_chat(payload: ChatRequest, caller=Depends(get_caller)):
     logger.info(f"Usuario autenticado - ID: {user_id}, Rol: {user_role}")
     
     async def event_stream():
+        # La recuperación de documentos arranca en paralelo con la detección de intención;
+        # solo se espera si la consulta llega al LLM (PASO 3).
+        retrieval_task = asyncio.create_task(retrieve(payload.query, top_k=payload.top_k, filters=payload.filters))
+        try:
+            async for event in answer_events(retrieval_task):
+                yield event
+        finally:
+            if not retrieval_task.done():
+                retrieval_task.cancel()
+
+    async def answer_events(retrieval_task):
         # =====================================================
         # PASO 1: Detectar intención con reglas (sin depender del LLM)
         # =====================================================
@@ -705,7 +531,7 @@ async def stream_chat(payload: ChatRequest, caller=Depends(get_caller)):
                             if params.get('servicio_nombre') and not params.get('servicio_id'):
                                 yield f"data: 🔍 Buscando el servicio \"{params['servicio_nombre']}\"...\n\n"
                                 registry = get_default_registry()
-                                servicios = await registry.execute('buscar_productos', {'q': params['servicio_nombre']})
+                                servicios = await registry.execute('buscar_productos', {'q': params['servicio_nombre']}, caller=caller)
                                 
                                 if servicios and len(servicios) > 0:
                                     # Buscar coincidencia exacta o la primera
@@ -757,11 +583,10 @@ async def stream_chat(payload: ChatRequest, caller=Depends(get_caller)):
                     
                     # Ejecutar la herramienta
                     yield f"data: 🔍 Procesando tu solicitud...\n\n"
-                    await asyncio.sleep(0.1)
                     
                     registry = get_default_registry()
                     confirm = True if tool_name in ['crear_reserva', 'registrar_cliente', 'procesar_pago'] else None
-                    result = await registry.execute(tool_name, params, confirm=confirm)
+                    result = await registry.execute(tool_name, params, confirm=confirm, caller=caller)
                     
                     # Formatear resultado según la herramienta
                     result_text = await format_tool_result(tool_name, result, params)
@@ -797,7 +622,6 @@ async def stream_chat(payload: ChatRequest, caller=Depends(get_caller)):
                         yield f"data: ❌ La fecha de pago no puede ser en el futuro.\n\n"
                     elif "non_field_errors" in error_msg:
                         # Extraer el mensaje de error del JSON
-                        import json
                         try:
                             error_data = json.loads(error_msg.split(": ", 1)[1] if ": " in error_msg else error_msg)
                             if isinstance(error_data, dict) and 'non_field_errors' in error_data:
@@ -827,7 +651,6 @@ async def stream_chat(payload: ChatRequest, caller=Depends(get_caller)):
         if is_off_topic(payload.query):
             for line in OFF_TOPIC_RESPONSE.split('\n'):
                 yield f"data: {line}\n"
-                await asyncio.sleep(0.02)
             yield "\n"
             yield "event: done\n\n"
             return
@@ -836,25 +659,42 @@ async def stream_chat(payload: ChatRequest, caller=Depends(get_caller)):
         # PASO 3: Si no detectamos intención, usar el LLM para respuesta conversacional
         # =====================================================
         adapter = __import__('app.llm_adapter', fromlist=['get_default_adapter']).get_default_adapter()
-        full_prompt = build_prompt(payload.query)
+        namespace = answer_namespace(adapter, payload.filters)
         
-        full_response = ""
-        if hasattr(adapter, 'stream_generate'):
-            async for chunk in adapter.stream_generate(full_prompt):
-                full_response += chunk
+        # Si una pregunta equivalente ya fue respondida, se reenvía esa respuesta sin llamar al LLM
+        vector, cached = await lookup_answer(payload.query, namespace)
+        if cached is not None:
+            sources = cached.sources
+            
+            async def cached_chunks():
+                yield cached.answer
+            chunks = cached_chunks()
         else:
-            full_response = await adapter.generate(full_prompt)
+            sources = await retrieval_task
+            full_prompt = build_prompt(payload.query, sources)
+            
+            if hasattr(adapter, 'stream_generate'):
+                chunks = adapter.stream_generate(full_prompt)
+            else:
+                async def single_chunk():
+                    yield await adapter.generate(full_prompt)
+                chunks = single_chunk()
         
-        # Limpiar cualquier TOOL_CALL que el modelo haya generado (ya lo manejamos con reglas)
-        clean_response = re.sub(r'TOOL_CALL:\s*\{[^}]*\}', '', full_response).strip()
+        # Reenviar la respuesta del LLM token a token (sin TOOL_CALL: ya lo manejamos con reglas)
+        pieces = []
+        async for event, text in stream_llm_events(chunks):
+            pieces.append(text)
+            yield event
         
-        if clean_response:
-            # Enviar respuesta del LLM
-            parts = re.split(r'(?<=[.!?])\s+', clean_response)
-            for part in parts:
-                if part.strip():
-                    yield f"data: {part} \n\n"
-                    await asyncio.sleep(0.03)
+        if pieces:
+            if cached is None:
+                store_answer(namespace, vector, join_stream_texts(pieces), sources)
+            if sources:
+                citas = ", ".join(
+                    f"[{i}] {src.get('doc') or 'documento'}" + (f" (pág. {src['page']})" if src.get('page') else "")
+                    for i, src in enumerate(sources, 1)
+                )
+                yield f"data: 📚 Fuentes: {citas}\n\n"
         else:
             yield "data: 👋 ¡Hola! Soy el asistente de FindYourWork. Puedo ayudarte a:\n"
             yield "data: - **Buscar servicios**: \"muéstrame los servicios disponibles\"\n"
@@ -997,7 +837,7 @@ async def call_tool(req: ToolCall, caller=Depends(get_caller)):
 
     registry = get_default_registry()
     try:
-        res = await registry.execute(req.tool, req.params or {})
+        res = await registry.execute(req.tool, req.params or {}, caller=caller)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
     return res
@@ -45,7 +45,7 @@ async def ingest_file(file: UploadFile = File(...), background_tasks: Background
     try:
         # Procesar según el tipo de archivo
         if ext in ALLOWED_PDF_EXTENSIONS:
-            result = await ingest_document(tmp_path)
+            result = await ingest_document(tmp_path, doc_id=file.filename)
             return {
                 "status": "success",
                 "type": "pdf",
@@ -63,7 +63,7 @@ async def ingest_file(file: UploadFile = File(...), background_tasks: Background
             }
         else:
             # Texto plano
-            result = await ingest_document(tmp_path)
+            result = await ingest_document(tmp_path, doc_id=file.filename)
             return {
                 "status": "success",
                 "type": "text",
@@ -144,7 +144,7 @@ async def ingest_pdf(file: UploadFile = File(...)):
         raw_text = extract_text_from_pdf(tmp_path)
         
         # Ingestión completa con embeddings
-        result = await ingest_document(tmp_path)
+        result = await ingest_document(tmp_path, doc_id=file.filename)
         
         return {
             "status": "success",
@@ -10,6 +10,7 @@ router = APIRouter()
 class IngestJobRequest(BaseModel):
     file_path: str
     collection_name: str | None = "documents"
+    doc_id: str | None = None
 
 
 class ToolJobRequest(BaseModel):
@@ -21,7 +22,7 @@ class ToolJobRequest(BaseModel):
 @router.post("/ingest")
 async def enqueue_ingest(req: IngestJobRequest):
     # Enqueue ingest task
-    task = celery.send_task('app.tasks.ingest_task', args=[req.file_path, req.collection_name])
+    task = celery.send_task('app.tasks.ingest_task', args=[req.file_path, req.collection_name, req.doc_id])
     return {"task_id": task.id}
 
 
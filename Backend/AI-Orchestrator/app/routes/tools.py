@@ -2,6 +2,7 @@ from fastapi import APIRouter, HTTPException, Depends, Request
 from pydantic import BaseModel
 from typing import Dict
 from app.tools import get_default_registry, ToolError
+from app.tool_cache import get_tool_cache
 from app.tool_proposals import get_default_store, ProposalNotFound
 from app.config import settings
 from app.jwks import verify_jwt_token
@@ -27,7 +28,7 @@ async def get_caller(request: Request):
     if auth.startswith('Bearer '):
         token = auth.split(' ', 1)[1].strip()
         try:
-            payload = verify_jwt_token(token)
+            payload = await verify_jwt_token(token)
         except HTTPException:
             raise
         except Exception as e:
@@ -47,6 +48,14 @@ class ConfirmRequest(BaseModel):
     proposal_id: str
 
 
+class InvalidateRequest(BaseModel):
+    """Either a tool (optionally narrowed to `params`) or a business event `{event_type, data}`."""
+    tool: str | None = None
+    params: Dict | None = None
+    event_type: str | None = None
+    data: Dict | None = None
+
+
 @router.post("/propose")
 async def propose(req: ProposeRequest, caller=Depends(get_caller)):
     registry = get_default_registry()
@@ -91,3 +100,19 @@ async def get_proposal(proposal_id: str, caller=Depends(get_caller)):
     except ProposalNotFound:
         raise HTTPException(status_code=404, detail="Proposal not found or expired")
     return proposal
+
+
+@router.post("/cache/invalidate")
+async def invalidate_cache(req: InvalidateRequest, caller=Depends(get_caller)):
+    """Drop cached tool results. Called by the event bus when Django data changes."""
+    if 'api_key' not in caller:
+        raise HTTPException(status_code=403, detail="Service credentials required")
+    cache = get_tool_cache()
+    if cache is None:
+        return {"invalidated": []}
+    if req.event_type:
+        return {"invalidated": await cache.invalidate_event(req.event_type, req.data)}
+    if req.tool:
+        await cache.invalidate(req.tool, req.params)
+        return {"invalidated": [req.tool]}
+    raise HTTPException(status_code=400, detail="tool or event_type is required")
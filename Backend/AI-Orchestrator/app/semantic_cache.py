@@ -0,0 +1,176 @@
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+import itertools
+import json
+import logging
+import time
+
+import numpy as np
+
+from app.adapters.hf_adapter import HFAdapter
+from app.config import settings
+from app.retrieval import embed_query
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CachedAnswer:
+    answer: str
+    sources: List[dict] = field(default_factory=list)
+    score: float = 1.0
+
+
+class _Namespace:
+    """Entries of one namespace plus a lazily rebuilt matrix of their unit vectors."""
+
+    def __init__(self):
+        self.entries: "OrderedDict[int, Tuple[float, np.ndarray, str, List[dict]]]" = OrderedDict()
+        self._ids: List[int] = []
+        self._matrix: np.ndarray | None = None
+
+    def invalidate_matrix(self) -> None:
+        self._matrix = None
+
+    def matrix(self) -> Tuple[List[int], np.ndarray]:
+        if self._matrix is None:
+            self._ids = list(self.entries)
+            self._matrix = np.vstack([self.entries[i][1] for i in self._ids])
+        return self._ids, self._matrix
+
+
+class SemanticCache:
+    """Cache of LLM answers looked up by query meaning rather than exact text.
+
+    Answers are stored with the unit-normalized embedding of the query. A lookup hits when the
+    best cosine similarity within the namespace reaches `threshold` and the entry is younger than
+    `ttl_seconds`. Namespaces keep answers of different models (or retrieval filters) apart.
+    Each namespace holds at most `max_entries` answers; the least recently used are evicted.
+    """
+
+    def __init__(self, threshold: float = 0.95, ttl_seconds: int = 3600, max_entries: int = 1000):
+        self.threshold = threshold
+        self._ttl = ttl_seconds
+        self._max_entries = max_entries
+        self._namespaces: Dict[str, _Namespace] = {}
+        self._ids = itertools.count()
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+
+    @staticmethod
+    def _unit(vector: List[float]) -> np.ndarray | None:
+        vec = np.asarray(vector, dtype=np.float32)
+        norm = float(np.linalg.norm(vec))
+        if norm == 0.0:
+            return None
+        return vec / norm
+
+    def lookup(self, namespace: str, vector: List[float]) -> Optional[CachedAnswer]:
+        space = self._namespaces.get(namespace)
+        unit = self._unit(vector)
+        if space is None or not space.entries or unit is None:
+            self.misses += 1
+            return None
+        self._expire(space)
+        if not space.entries:
+            self.misses += 1
+            return None
+
+        ids, matrix = space.matrix()
+        if matrix.shape[1] != unit.shape[0]:
+            self.misses += 1
+            return None
+        scores = matrix @ unit
+        best = int(np.argmax(scores))
+        score = float(scores[best])
+        if score < self.threshold:
+            self.misses += 1
+            return None
+
+        entry_id = ids[best]
+        space.entries.move_to_end(entry_id)
+        _, _, answer, sources = space.entries[entry_id]
+        self.hits += 1
+        return CachedAnswer(answer=answer, sources=list(sources), score=score)
+
+    def store(self, namespace: str, vector: List[float], answer: str, sources: List[dict] | None = None) -> None:
+        unit = self._unit(vector)
+        if unit is None or not answer:
+            return
+        space = self._namespaces.setdefault(namespace, _Namespace())
+        space.entries[next(self._ids)] = (time.monotonic(), unit, answer, list(sources or []))
+        while len(space.entries) > self._max_entries:
+            space.entries.popitem(last=False)
+        space.invalidate_matrix()
+        self.stores += 1
+
+    def _expire(self, space: _Namespace) -> None:
+        cutoff = time.monotonic() - self._ttl
+        stale = [i for i, entry in space.entries.items() if entry[0] < cutoff]
+        for i in stale:
+            del space.entries[i]
+        if stale:
+            space.invalidate_matrix()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "stores": self.stores,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "entries": sum(len(s.entries) for s in self._namespaces.values()),
+            "namespaces": len(self._namespaces),
+        }
+
+    def clear(self) -> None:
+        self._namespaces.clear()
+
+
+_default_cache: Optional[SemanticCache] = None
+
+
+def get_semantic_cache() -> Optional[SemanticCache]:
+    """Return the process-wide semantic answer cache, or None when SEMANTIC_CACHE_ENABLED is off."""
+    global _default_cache
+    if _default_cache is None and settings.SEMANTIC_CACHE_ENABLED:
+        _default_cache = SemanticCache(
+            threshold=settings.SEMANTIC_CACHE_THRESHOLD,
+            ttl_seconds=settings.SEMANTIC_CACHE_TTL_SECONDS,
+            max_entries=settings.SEMANTIC_CACHE_MAX_ENTRIES,
+        )
+    return _default_cache
+
+
+def answer_namespace(adapter: Any, filters: Dict[str, Any] | None = None) -> str:
+    """Namespace for answers of `adapter`'s model over documents matching `filters`.
+
+    The embedding model is part of the namespace too, since it defines the vector space.
+    """
+    model_name = getattr(adapter, "model_name", None)
+    model = model_name() if callable(model_name) else type(adapter).__name__
+    return json.dumps([model, HFAdapter().embedding_model_name(), filters or {}], sort_keys=True, default=str)
+
+
+async def lookup_answer(query: str, namespace: str) -> Tuple[List[float] | None, Optional[CachedAnswer]]:
+    """Embed `query` and look it up; returns (vector, hit). Best-effort: (None, None) on errors."""
+    cache = get_semantic_cache()
+    if cache is None:
+        return None, None
+    try:
+        vector = await embed_query(query)
+    except Exception as e:
+        logger.warning("Semantic cache skipped: %s", e)
+        return None, None
+    hit = cache.lookup(namespace, vector)
+    if hit is not None:
+        logger.info("Semantic cache hit (score %.3f)", hit.score)
+    return vector, hit
+
+
+def store_answer(namespace: str, vector: List[float] | None, answer: str, sources: List[dict] | None = None) -> None:
+    cache = get_semantic_cache()
+    if cache is not None and vector is not None:
+        cache.store(namespace, vector, answer, sources)
@@ -0,0 +1,127 @@
+from functools import partial
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Hashable, List, Optional, TypeVar
+import asyncio
+import copy
+import weakref
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """Coalesce concurrent identical calls into one.
+
+    The first caller for a key starts `fn()` as a task; callers arriving with the same key
+    while it is in flight await that task instead of starting their own. The task is shielded,
+    so a caller that is cancelled (e.g. a client disconnecting from /chat/stream) does not cancel
+    the call for the others. Once the task finishes the key is forgotten: results are not cached.
+
+    With `copy_results`, coalesced callers receive a deep copy so they can mutate their result.
+    """
+
+    def __init__(self, copy_results: bool = False):
+        self._copy_results = copy_results
+        self._calls: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[Hashable, asyncio.Task]]" = weakref.WeakKeyDictionary()
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        loop = asyncio.get_running_loop()
+        calls = self._calls.setdefault(loop, {})
+        task = calls.get(key)
+        leader = task is None
+        if leader:
+            task = loop.create_task(fn())
+            calls[key] = task
+            task.add_done_callback(partial(self._forget, calls, key))
+        else:
+            self.coalesced += 1
+        result = await asyncio.shield(task)
+        if self._copy_results and not leader:
+            return copy.deepcopy(result)
+        return result
+
+    @staticmethod
+    def _forget(calls: Dict[Hashable, asyncio.Task], key: Hashable, task: asyncio.Task) -> Any:
+        if calls.get(key) is task:
+            del calls[key]
+        # mark the exception as retrieved even if every caller was cancelled
+        if not task.cancelled():
+            task.exception()
+
+
+class _SharedStream:
+    """One upstream stream read by a background task into a replay buffer."""
+
+    def __init__(self, source: AsyncIterator[T]):
+        self.chunks: List[T] = []
+        self.done = False
+        self.error: Optional[Exception] = None
+        self.subscribers = 0
+        self._changed = asyncio.Event()
+        self.task = asyncio.get_running_loop().create_task(self._pump(source))
+
+    def _notify(self) -> None:
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def _pump(self, source: AsyncIterator[T]) -> None:
+        try:
+            async for chunk in source:
+                self.chunks.append(chunk)
+                self._notify()
+        except Exception as exc:
+            self.error = exc
+        finally:
+            self.done = True
+            self._notify()
+
+    async def replay(self) -> AsyncIterator[T]:
+        index = 0
+        while True:
+            while index < len(self.chunks):
+                yield self.chunks[index]
+                index += 1
+            if self.done:
+                if self.error is not None:
+                    raise self.error
+                return
+            await self._changed.wait()
+
+
+class StreamFlight:
+    """Fan one upstream stream out to concurrent identical callers.
+
+    The first caller for a key starts reading `fn()` in a background task; callers arriving with
+    the same key while it is in flight subscribe to it instead of opening their own stream. Every
+    subscriber replays the chunks received so far and then follows the live stream, so late joiners
+    get the full text. A subscriber that goes away (client disconnect) does not stop the stream for
+    the others; when the last one leaves the upstream stream is cancelled. Once the stream finishes
+    the key is forgotten: results are not cached.
+    """
+
+    def __init__(self):
+        self._streams: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[Hashable, _SharedStream]]" = weakref.WeakKeyDictionary()
+        self.coalesced = 0
+
+    async def stream(self, key: Hashable, fn: Callable[[], AsyncIterator[T]]) -> AsyncIterator[T]:
+        streams = self._streams.setdefault(asyncio.get_running_loop(), {})
+        shared = streams.get(key)
+        if shared is None:
+            shared = _SharedStream(fn())
+            streams[key] = shared
+            shared.task.add_done_callback(lambda task: self._forget(streams, key, shared))
+        else:
+            self.coalesced += 1
+        shared.subscribers += 1
+        try:
+            async for chunk in shared.replay():
+                yield chunk
+        finally:
+            shared.subscribers -= 1
+            if not shared.subscribers and not shared.done:
+                self._forget(streams, key, shared)
+                shared.task.cancel()
+
+    @staticmethod
+    def _forget(streams: Dict[Hashable, _SharedStream], key: Hashable, shared: _SharedStream) -> None:
+        if streams.get(key) is shared:
+            del streams[key]
@@ -1,25 +1,46 @@
 from celery import shared_task
+from celery.signals import worker_process_shutdown
 from typing import Any, Dict
 from pathlib import Path
+import asyncio
 import traceback
 
+from app import http_pool
 from app.ingest import ingest_document
 from app.tools import get_default_registry
 
+# One event loop per worker process, kept across tasks so the pooled httpx clients bound to
+# it (app.http_pool) keep their connections alive between tasks.
+_worker_loop: asyncio.AbstractEventLoop | None = None
+
+
+def run_async(coro):
+    """Run `coro` to completion on this worker process's event loop."""
+    global _worker_loop
+    if _worker_loop is None or _worker_loop.is_closed():
+        _worker_loop = asyncio.new_event_loop()
+    return _worker_loop.run_until_complete(coro)
+
+
+@worker_process_shutdown.connect
+def close_worker_loop(**kwargs):
+    if _worker_loop is not None and not _worker_loop.is_closed():
+        _worker_loop.run_until_complete(http_pool.aclose_all())
+        _worker_loop.close()
+
 
 @shared_task(bind=True)
-def ingest_task(self, file_path: str, collection_name: str = "documents") -> Dict[str, Any]:
+def ingest_task(self, file_path: str, collection_name: str = "documents", doc_id: str | None = None) -> Dict[str, Any]:
     """Background ingest task. `file_path` must be accessible to worker (shared volume or URL).
 
     Returns: {"status": "ok", "chunks": n} on success.
     """
     try:
         path = Path(file_path)
-        res = ingest_document(path, collection_name=collection_name)
+        res = ingest_document(path, collection_name=collection_name, doc_id=doc_id)
         # ingest_document is async; call if coroutine
-        import asyncio
         if hasattr(res, '__await__'):
-            res = asyncio.get_event_loop().run_until_complete(res)
+            res = run_async(res)
         return {"status": "ok", "result": res}
     except Exception as e:
         # Capture exception to let Celery record failure
@@ -32,8 +53,7 @@ def tool_execute_task(self, tool_name: str, params: Dict[str, Any], confirm: boo
     try:
         registry = get_default_registry()
         # registry.execute is async
-        import asyncio
-        res = asyncio.get_event_loop().run_until_complete(registry.execute(tool_name, params or {}, confirm=confirm))
+        res = run_async(registry.execute(tool_name, params or {}, confirm=confirm))
         return {"status": "ok", "result": res}
     except Exception as e:
         tb = traceback.format_exc()
@@ -0,0 +1,230 @@
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+import copy
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Returned by ToolResultCache.get on a miss (None is a valid cached result)
+MISS = object()
+
+# Business events (same envelope the Django event bus sends to n8n) and the cached tool
+# results they make stale: (tool, data field holding the param value, param name) or
+# (tool, None, None) to drop every cached result of the tool.
+EVENT_INVALIDATIONS: Dict[str, List[Tuple[str, str | None, str | None]]] = {
+    "servicio.created": [("buscar_productos", None, None)],
+    "servicio.updated": [("buscar_productos", None, None)],
+    "reserva.updated": [("ver_reserva", "id", "reserva_id")],
+    "reserva.cancelled": [("ver_reserva", "id", "reserva_id")],
+    "payment.confirmed": [("ver_reserva", "reserva_id", "reserva_id")],
+    "payment.refunded": [("ver_reserva", "reserva_id", "reserva_id")],
+    "user.registered": [("obtener_cliente", None, None)],
+}
+
+
+def canonical_params(params: Dict[str, Any] | None) -> str:
+    """Stable text form of tool params: sorted keys, scalars as strings (5 == "5" in a query)."""
+    normalized = {
+        k: v if isinstance(v, (dict, list)) else str(v)
+        for k, v in (params or {}).items()
+        if v is not None
+    }
+    return json.dumps(normalized, sort_keys=True, separators=(",", ":"), default=str)
+
+
+def params_hash(params: Dict[str, Any] | None) -> str:
+    return hashlib.sha256(canonical_params(params).encode("utf-8")).hexdigest()
+
+
+def caller_key(caller: dict | None) -> str:
+    """Identity a cached result belongs to: the JWT subject, the service key, or anonymous."""
+    if not caller:
+        return "anonymous"
+    if "jwt_payload" in caller:
+        return f"user:{caller['jwt_payload'].get('sub')}"
+    return "service"
+
+
+class ToolCacheGenerations:
+    """Invalidation counters shared by every process that opens the same SQLite file.
+
+    Each invalidation bumps the counter of the tool, or of one (tool, params hash) pair, and
+    cached results remember the counters they were stored under: a result whose tool was
+    invalidated by another process (API, Celery worker) is a miss even in this process' LRU.
+    A lookup is one primary-key read of a local file.
+    """
+
+    def __init__(self, path: str | Path, timeout: float = 30.0):
+        self._path = Path(path)
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self._path), timeout=timeout, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # phash '' is the counter of the whole tool
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS tool_generations ("
+            " tool TEXT NOT NULL, phash TEXT NOT NULL, generation INTEGER NOT NULL,"
+            " PRIMARY KEY (tool, phash))"
+        )
+        self._conn.commit()
+
+    def get(self, tool: str, phash: str) -> int:
+        """Generation of a result: the tool counter plus the counter of its params."""
+        with self._lock:
+            (generation,) = self._conn.execute(
+                "SELECT COALESCE(SUM(generation), 0) FROM tool_generations WHERE tool = ? AND phash IN ('', ?)",
+                (tool, phash),
+            ).fetchone()
+        return generation
+
+    def bump(self, tool: str, phash: str | None = None) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO tool_generations (tool, phash, generation) VALUES (?, ?, 1)"
+                " ON CONFLICT (tool, phash) DO UPDATE SET generation = generation + 1",
+                (tool, phash or ""),
+            )
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class ToolResultCache:
+    """Read-through cache of GET tool results keyed by (tool, canonical params, caller).
+
+    Entries live in an in-process LRU bounded to `max_entries`, each with the TTL given when it
+    was stored. An optional Redis tier is shared between API and worker processes and is checked
+    after the local tier; Redis errors are logged and treated as misses.
+
+    Without `generations` an invalidation only reaches this process' LRU (and Redis): other
+    processes keep serving their copy until its TTL runs out.
+    """
+
+    def __init__(self, max_entries: int = 2048, redis_url: str | None = None,
+                 generations: ToolCacheGenerations | None = None):
+        self._max_entries = max_entries
+        self._items: "OrderedDict[Tuple[str, str, str], Tuple[float, int, Any]]" = OrderedDict()
+        self._generations = generations
+        self._redis = None
+        if redis_url:
+            try:
+                import redis.asyncio as aioredis
+            except Exception as e:
+                raise RuntimeError("redis.asyncio is required for the Redis tool cache tier") from e
+            self._redis = aioredis.from_url(redis_url)
+
+    def _redis_key(self, tool: str, phash: str = "*", caller: str = "*") -> str:
+        return f"toolcache:{tool}:{phash}:{caller}"
+
+    def _generation(self, tool: str, phash: str) -> int:
+        return self._generations.get(tool, phash) if self._generations is not None else 0
+
+    async def get(self, tool: str, params: Dict[str, Any] | None, caller: dict | None) -> Any:
+        """Return the cached result, or `MISS`."""
+        key = (tool, params_hash(params), caller_key(caller))
+        generation = self._generation(tool, key[1])
+        item = self._items.get(key)
+        if item is not None:
+            expires_at, stored_generation, value = item
+            if time.monotonic() < expires_at and stored_generation == generation:
+                self._items.move_to_end(key)
+                # callers may mutate results; never hand out the cached object itself
+                return copy.deepcopy(value)
+            del self._items[key]
+
+        if self._redis is not None:
+            try:
+                raw = await self._redis.get(self._redis_key(*key))
+                if raw is not None:
+                    entry = json.loads(raw)
+                    ttl = entry["expires_at"] - time.time()
+                    if ttl > 0 and entry.get("generation", 0) == generation:
+                        self._store_local(key, generation, copy.deepcopy(entry["value"]), ttl)
+                        return entry["value"]
+            except Exception:
+                logger.warning("Redis tool cache lookup failed", exc_info=True)
+        return MISS
+
+    async def set(self, tool: str, params: Dict[str, Any] | None, caller: dict | None, value: Any, ttl: float) -> None:
+        key = (tool, params_hash(params), caller_key(caller))
+        generation = self._generation(tool, key[1])
+        self._store_local(key, generation, copy.deepcopy(value), ttl)
+        if self._redis is not None:
+            try:
+                entry = {"value": value, "expires_at": time.time() + ttl, "generation": generation}
+                await self._redis.set(self._redis_key(*key), json.dumps(entry, default=str), ex=max(1, int(ttl)))
+            except Exception:
+                logger.warning("Redis tool cache write failed", exc_info=True)
+
+    def _store_local(self, key: Tuple[str, str, str], generation: int, value: Any, ttl: float) -> None:
+        self._items[key] = (time.monotonic() + ttl, generation, value)
+        self._items.move_to_end(key)
+        while len(self._items) > self._max_entries:
+            self._items.popitem(last=False)
+
+    async def invalidate(self, tool: str, params: Dict[str, Any] | None = None) -> int:
+        """Drop cached results of `tool` for every caller (only those for `params` when given).
+
+        Returns the number of local entries removed; other processes see the bumped generation.
+        """
+        phash = params_hash(params) if params is not None else None
+        if self._generations is not None:
+            self._generations.bump(tool, phash)
+        stale = [k for k in self._items if k[0] == tool and (phash is None or k[1] == phash)]
+        for k in stale:
+            del self._items[k]
+        if self._redis is not None:
+            try:
+                keys = [k async for k in self._redis.scan_iter(match=self._redis_key(tool, phash or "*"))]
+                if keys:
+                    await self._redis.delete(*keys)
+            except Exception:
+                logger.warning("Redis tool cache invalidation failed", exc_info=True)
+        return len(stale)
+
+    async def invalidate_event(self, event_type: str, data: Dict[str, Any] | None = None) -> List[str]:
+        """Apply EVENT_INVALIDATIONS for a business event; returns the tools invalidated."""
+        data = data or {}
+        invalidated = []
+        for tool, field, param in EVENT_INVALIDATIONS.get(event_type, []):
+            if field is None:
+                await self.invalidate(tool)
+                invalidated.append(tool)
+            elif data.get(field) is not None:
+                await self.invalidate(tool, {param: data[field]})
+                invalidated.append(tool)
+        return invalidated
+
+    def clear(self) -> None:
+        self._items.clear()
+
+    def close(self) -> None:
+        if self._generations is not None:
+            self._generations.close()
+
+
+_default_cache: Optional[ToolResultCache] = None
+
+
+def get_tool_cache() -> Optional[ToolResultCache]:
+    """Return the process-wide tool result cache, or None when TOOL_CACHE_ENABLED is off."""
+    global _default_cache
+    if _default_cache is None and settings.TOOL_CACHE_ENABLED:
+        generations = None
+        if settings.TOOL_CACHE_GENERATIONS_PATH:
+            generations = ToolCacheGenerations(settings.TOOL_CACHE_GENERATIONS_PATH)
+        _default_cache = ToolResultCache(
+            max_entries=settings.TOOL_CACHE_MAX_ENTRIES,
+            redis_url=settings.TOOL_CACHE_REDIS_URL,
+            generations=generations,
+        )
+    return _default_cache
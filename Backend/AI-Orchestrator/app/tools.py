@@ -2,7 +2,10 @@ from typing import Any, Dict
 import httpx
 import logging
 
+from app import http_pool
 from app.config import settings
+from app.singleflight import SingleFlight
+from app.tool_cache import MISS, ToolResultCache, caller_key, get_tool_cache, params_hash
 
 logger = logging.getLogger(__name__)
 
@@ -15,14 +18,33 @@ class ToolError(Exception):
 
 
 class ToolClient:
-    """Simple HTTP client to call the Django tools endpoints."""
+    """HTTP client to call the Django tools endpoints.
 
-    def __init__(self, base_url: str = ORCHESTRATOR_TOOLS_DJANGO_URL, api_key: str = ORCHESTRATOR_TOOLS_API_KEY):
+    Requests go through the shared "tools" pool of app.http_pool (one httpx client per event
+    loop), so API requests and each Celery worker loop reuse keep-alive connections.
+    """
+
+    def __init__(self, base_url: str = ORCHESTRATOR_TOOLS_DJANGO_URL, api_key: str = ORCHESTRATOR_TOOLS_API_KEY, pool_name: str = "tools"):
         self.base_url = base_url.rstrip("/")
         self.api_key = api_key
-        self._client = httpx.AsyncClient(timeout=30.0)
-
-    async def call(self, path: str, method: str = "GET", json: Dict | None = None, extra_headers: Dict[str, str] | None = None) -> Dict[str, Any]:
+        self.pool_name = pool_name
+
+    @property
+    def _client(self) -> httpx.AsyncClient:
+        return http_pool.get_async_client(
+            self.pool_name,
+            timeout=settings.TOOLS_HTTP_TIMEOUT,
+            max_connections=settings.TOOLS_HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.TOOLS_HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=settings.TOOLS_HTTP_KEEPALIVE_EXPIRY,
+            http2=settings.TOOLS_HTTP2,
+        )
+
+    async def start(self) -> None:
+        """Open the pooled client for the running loop ahead of the first call."""
+        self._client
+
+    async def call(self, path: str, method: str = "GET", json: Dict | None = None, extra_headers: Dict[str, str] | None = None, timeout: float | None = None) -> Dict[str, Any]:
         # Handle query parameters separately to ensure proper trailing slash
         path_clean = path.lstrip('/')
         if '?' in path_clean:
@@ -33,13 +55,16 @@ class ToolClient:
         headers = {"Authorization": f"ApiKey {self.api_key}"}
         if extra_headers:
             headers.update(extra_headers)
+        request_kwargs: Dict[str, Any] = {"headers": headers}
+        if timeout is not None:
+            request_kwargs["timeout"] = timeout
         try:
             # Para GET requests, enviar parámetros como query params
             # Para POST/PUT/PATCH, enviar como JSON body
             if method.upper() == "GET":
-                resp = await self._client.request(method, url, params=json or {}, headers=headers)
+                resp = await self._client.request(method, url, params=json or {}, **request_kwargs)
             else:
-                resp = await self._client.request(method, url, json=json or {}, headers=headers)
+                resp = await self._client.request(method, url, json=json or {}, **request_kwargs)
         except Exception as e:
             logger.exception("HTTP call to tools failed")
             raise ToolError(f"Tool call network error: {e}")
@@ -53,33 +78,45 @@ class ToolClient:
         except Exception:
             # If response is not JSON, return text payload
             return {"raw": resp.text}
+
     async def close(self) -> None:
         try:
-            await self._client.aclose()
+            await http_pool.aclose(self.pool_name)
         except Exception:
             logger.warning("Error closing ToolClient httpx client", exc_info=True)
 
 
 class ToolRegistry:
-    """Registry of available tools with minimal metadata."""
+    """Registry of available tools with minimal metadata.
 
-    def __init__(self, client: ToolClient):
+    A tool may declare a "timeout" (seconds); TOOLS_TIMEOUTS overrides it per tool.
+    GET tools with a "cache_ttl" (seconds) are served through the read-through `cache`, and
+    a successful call to a tool drops the cached results of the tools it "invalidates".
+    Concurrent identical direct GET calls share one in-flight request.
+    """
+
+    def __init__(self, client: ToolClient, cache: ToolResultCache | None = None):
         self.client = client
+        self.cache = cache
+        self._flights = SingleFlight(copy_results=True)
         self.tools = {
             "buscar_productos": {
                 "path": "buscar-productos",
                 "method": "GET",
                 "description": "Buscar servicios disponibles. Parámetros opcionales: q (texto de búsqueda), categoria, precio_min, precio_max",
+                "cache_ttl": 60,
             },
             "ver_reserva": {
                 "path": "ver-reserva/{reserva_id}",
                 "method": "GET",
                 "description": "Obtener detalle de una reserva",
+                "cache_ttl": 30,
             },
             "obtener_cliente": {
                 "path": "obtener-cliente",
                 "method": "GET",
                 "description": "Obtener cliente por user_id",
+                "cache_ttl": 300,
             },
             "crear_reserva": {
                 "path": "crear-reserva",
@@ -90,25 +127,30 @@ class ToolRegistry:
                 "path": "registrar-cliente",
                 "method": "POST",
                 "description": "Registrar cliente nuevo",
+                "invalidates": ["obtener_cliente"],
             },
             "procesar_pago": {
                 "path": "procesar-pago",
                 "method": "POST",
                 "description": "Registrar un pago para una reserva",
+                "invalidates": ["ver_reserva"],
             },
             "resumen_ventas": {
                 "path": "resumen-ventas",
                 "method": "GET",
                 "description": "Obtener resumen de ventas con totales de pagos e ingresos del período. Parámetros: start_date (YYYY-MM-DD), end_date (YYYY-MM-DD)",
+                "timeout": 60.0,
             },
         }
 
-    async def execute(self, tool_name: str, params: Dict[str, Any], confirm: bool | None = None) -> Dict[str, Any]:
+    async def execute(self, tool_name: str, params: Dict[str, Any], confirm: bool | None = None, caller: dict | None = None) -> Dict[str, Any]:
         """Execute a registered tool.
 
         - If `confirm` is None, the call is direct and no confirm query param is attached.
         - If `confirm` is False, the tools that support proposal semantics should return a proposal object.
         - If `confirm` is True, a mutative action will be performed.
+
+        Direct GET calls of cacheable tools are looked up in the cache under (tool, params, caller).
         """
         if tool_name not in self.tools:
             raise ToolError("Unknown tool")
@@ -131,8 +173,30 @@ class ToolRegistry:
         if confirm is True and idempotency_key:
             extra_headers = {'Idempotency-Key': idempotency_key}
 
-        # For GET calls, send params in json to let the tools endpoint handle them from the body/query
-        return await self.client.call(path=path, method=method, json=params, extra_headers=extra_headers)
+        timeout = settings.TOOLS_TIMEOUTS.get(tool_name, meta.get("timeout"))
+
+        is_read = confirm is None and method == "GET"
+        cache_ttl = meta.get("cache_ttl") if is_read else None
+        if self.cache is not None and cache_ttl:
+            cached = await self.cache.get(tool_name, params, caller)
+            if cached is not MISS:
+                return cached
+
+        async def fetch():
+            # For GET calls, send params in json to let the tools endpoint handle them from the body/query
+            result = await self.client.call(path=path, method=method, json=params, extra_headers=extra_headers, timeout=timeout)
+            if self.cache is not None and cache_ttl:
+                await self.cache.set(tool_name, params, caller, result, cache_ttl)
+            return result
+
+        if is_read:
+            return await self._flights.do((tool_name, params_hash(params), caller_key(caller)), fetch)
+
+        result = await fetch()
+        if self.cache is not None and confirm is not False:
+            for stale_tool in meta.get("invalidates", []):
+                await self.cache.invalidate(stale_tool)
+        return result
 
 
 _default_registry: ToolRegistry | None = None
@@ -141,5 +205,5 @@ _default_registry: ToolRegistry | None = None
 def get_default_registry() -> ToolRegistry:
     global _default_registry
     if _default_registry is None:
-        _default_registry = ToolRegistry(ToolClient())
+        _default_registry = ToolRegistry(ToolClient(), cache=get_tool_cache())
     return _default_registry
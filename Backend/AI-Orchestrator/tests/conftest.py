@@ -0,0 +1,34 @@
+import pytest
+
+from app.config import settings
+
+
+@pytest.fixture(autouse=True)
+def isolated_local_stores(tmp_path, monkeypatch):
+    """Point the embedding cache and ingest manifests at per-test files so tests never touch real data.
+
+    The semantic answer cache and the tool result cache are process-wide too, so each test
+    starts with empty ones.
+    """
+    import app.embedding_cache as embedding_cache
+    import app.ingest_manifest as ingest_manifest
+    import app.semantic_cache as semantic_cache
+    import app.tool_cache as tool_cache
+    import app.tools as tools
+
+    monkeypatch.setattr(settings, "EMBEDDING_CACHE_PATH", str(tmp_path / "embedding_cache.sqlite3"))
+    monkeypatch.setattr(settings, "EMBEDDING_CACHE_REDIS_URL", None)
+    monkeypatch.setattr(settings, "INGEST_MANIFEST_PATH", str(tmp_path / "ingest_manifests.sqlite3"))
+    monkeypatch.setattr(embedding_cache, "_default_cache", None)
+    monkeypatch.setattr(ingest_manifest, "_default_store", None)
+    monkeypatch.setattr(settings, "TOOL_CACHE_GENERATIONS_PATH", str(tmp_path / "tool_cache_generations.sqlite3"))
+    monkeypatch.setattr(semantic_cache, "_default_cache", None)
+    monkeypatch.setattr(tool_cache, "_default_cache", None)
+    monkeypatch.setattr(tools, "_default_registry", None)
+    yield
+    if embedding_cache._default_cache is not None:
+        embedding_cache._default_cache.close()
+    if ingest_manifest._default_store is not None:
+        ingest_manifest._default_store.close()
+    if tool_cache._default_cache is not None:
+        tool_cache._default_cache.close()
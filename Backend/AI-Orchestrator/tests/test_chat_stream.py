@@ -0,0 +1,74 @@
+import asyncio
+from unittest.mock import AsyncMock
+
+import pytest
+from httpx import AsyncClient
+
+from app.adapters.hf_adapter import HFAdapter
+from app.llm_adapter import HuggingFaceAdapter
+from app.main import app
+from app.routes.chat import ToolCallFilter, stream_llm_events
+from app.routes.tools import get_caller
+
+
+async def agen(chunks):
+    for c in chunks:
+        yield c
+
+
+def test_tool_call_filter_strips_calls_split_across_chunks():
+    f = ToolCallFilter()
+    out = ""
+    for piece in ["Claro. TOOL", "_CALL: {\"tool\": ", "\"buscar_productos\", \"params\": {}", "} Listo."]:
+        out += f.feed(piece)
+    out += f.flush()
+    # like the previous regex, the call ends at the first closing brace
+    assert "TOOL_CALL" not in out
+    assert out.startswith("Claro. ")
+    assert out.endswith("Listo.")
+
+
+def test_tool_call_filter_releases_lookalike_prefix():
+    f = ToolCallFilter()
+    assert f.feed("Hola TOOL") == "Hola "
+    assert f.feed("S y más") == "TOOLS y más"
+
+
+@pytest.mark.asyncio
+async def test_stream_llm_events_emits_words_as_they_arrive():
+    seen = []
+    async for event, text in stream_llm_events(agen(["Hol", "a, ¿en qué ", "te ayudo?\nSaludos"])):
+        seen.append((event, text))
+
+    assert [t for _, t in seen] == ["Hola, ¿en qué", "te ayudo?\n", "Saludos"]
+    assert seen[1][0] == "data: te ayudo?\ndata: \n\n"
+
+
+@pytest.mark.asyncio
+async def test_concurrent_identical_questions_share_one_llm_stream(monkeypatch):
+    upstream = []
+
+    async def fake_stream(self, prompt, model=None):
+        upstream.append(prompt)
+        for word in ["Atendemos ", "de lunes ", "a sábado."]:
+            await asyncio.sleep(0.02)
+            yield word
+
+    monkeypatch.setattr(HFAdapter, "stream_generate", fake_stream)
+    monkeypatch.setattr("app.retrieval.HFAdapter.embed", AsyncMock(return_value=[[0.3, 0.9]]))
+    monkeypatch.setattr("app.routes.chat.retrieve", AsyncMock(return_value=[]))
+    adapter = HuggingFaceAdapter(api_key="test-key", model="test-model")
+    monkeypatch.setattr("app.llm_adapter.get_default_adapter", lambda: adapter)
+    app.dependency_overrides[get_caller] = lambda: {"jwt_payload": {"sub": "7", "role": "cliente"}}
+    try:
+        async with AsyncClient(app=app, base_url="http://test") as ac:
+            responses = await asyncio.gather(*(
+                ac.post("/chat/stream", json={"query": "¿qué días atienden en FindYourWork?"}) for _ in range(3)
+            ))
+    finally:
+        app.dependency_overrides.clear()
+
+    assert len(upstream) == 1
+    bodies = [resp.text for resp in responses]
+    assert "data: sábado." in bodies[0]
+    assert bodies[0] == bodies[1] == bodies[2]
@@ -0,0 +1,42 @@
+import pytest
+from unittest.mock import AsyncMock
+
+from app.embedding_cache import EmbeddingCache, text_hash
+from app.ingest import create_embeddings_for_chunks
+
+
+def test_embedding_cache_roundtrip_and_model_namespacing(tmp_path):
+    cache = EmbeddingCache(tmp_path / "c.sqlite3")
+    h = text_hash("precio corte 10")
+    cache.put_many("model-a", {h: [0.25, -1.5, 3.0]})
+
+    assert cache.get_many("model-a", [h]) == {h: [0.25, -1.5, 3.0]}
+    assert cache.get_many("model-b", [h]) == {}
+    cache.close()
+
+
+def test_embedding_cache_evicts_least_recently_used(tmp_path):
+    cache = EmbeddingCache(tmp_path / "c.sqlite3", max_entries=2)
+    cache.put_many("m", {"a": [1.0]})
+    cache.put_many("m", {"b": [2.0]})
+    cache.get_many("m", ["a"])  # a becomes most recently used
+    cache.put_many("m", {"c": [3.0]})
+
+    assert set(cache.get_many("m", ["a", "b", "c"])) == {"a", "c"}
+    cache.close()
+
+
+@pytest.mark.asyncio
+async def test_create_embeddings_only_embeds_cache_misses(monkeypatch):
+    async def fake_embed(texts):
+        return [[float(len(t))] for t in texts]
+
+    embed = AsyncMock(side_effect=fake_embed)
+    monkeypatch.setattr("app.ingest.HFAdapter.embed", embed)
+
+    first = await create_embeddings_for_chunks([{"text": "uno"}, {"text": "dos"}, {"text": "uno"}])
+    second = await create_embeddings_for_chunks([{"text": "dos"}, {"text": "tres!"}])
+
+    assert first == [[3.0], [3.0], [3.0]]
+    assert second == [[3.0], [5.0]]
+    assert [c.args[0] for c in embed.await_args_list] == [["uno", "dos"], ["tres!"]]
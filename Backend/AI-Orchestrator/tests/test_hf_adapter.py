@@ -5,6 +5,8 @@ from app.adapters.hf_adapter import HFAdapter
 
 
 class DummyResponse:
+    status_code = 200
+
     def __init__(self, json_data):
         self._json = json_data
 
@@ -34,15 +36,22 @@ async def test_hf_generate_remote(monkeypatch):
     expected = [{"generated_text": "HF says hello"}]
     dummy_resp = DummyResponse(expected)
 
+    created = []
+
     def dummy_client(*args, **kwargs):
+        created.append(kwargs)
         return DummyClient(dummy_resp)
 
     monkeypatch.setattr("httpx.AsyncClient", dummy_client)
 
     adapter = HFAdapter(api_key="test-key", default_model="test-model")
     res = await adapter.generate("Hello")
+    res_again = await adapter.generate("Hello again")
 
     assert "HF says hello" in res
+    assert res_again == res
+    # both calls go through the pooled keep-alive client
+    assert len(created) == 1
 
 
 @pytest.mark.asyncio
@@ -61,3 +70,63 @@ async def test_hf_embed_remote(monkeypatch):
     assert isinstance(res, list)
     assert len(res) == 1
     assert len(res[0]) >= 1
+
+
+class RecordingClient:
+    """Pooled client stub: echoes one vector per input, encoding the input text."""
+
+    instances = 0
+
+    def __init__(self, *args, **kwargs):
+        RecordingClient.instances += 1
+        self.batches = []
+
+    async def post(self, url, json=None, headers=None):
+        inputs = json["inputs"]
+        self.batches.append(list(inputs))
+        # reply slower for the first batch so completion order differs from input order
+        if len(self.batches) == 1:
+            await asyncio.sleep(0.01)
+        return DummyResponse([[float(t[1:])] for t in inputs])
+
+
+@pytest.mark.asyncio
+async def test_hf_embed_batches_share_client_and_keep_order(monkeypatch):
+    RecordingClient.instances = 0
+    monkeypatch.setattr("httpx.AsyncClient", RecordingClient)
+
+    adapter = HFAdapter(api_key="test-key", embedding_model="test-embed")
+    texts = [f"t{i}" for i in range(7)]
+    res = await adapter.embed(texts, batch_size=3)
+    res_again = await adapter.embed(texts[:2], batch_size=3)
+
+    assert res == [[float(i)] for i in range(7)]
+    assert res_again == [[0.0], [1.0]]
+    assert RecordingClient.instances == 1
+
+
+class SlowClient:
+    in_flight = 0
+    max_in_flight = 0
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    async def post(self, url, json=None, headers=None):
+        SlowClient.in_flight += 1
+        SlowClient.max_in_flight = max(SlowClient.max_in_flight, SlowClient.in_flight)
+        await asyncio.sleep(0.01)
+        SlowClient.in_flight -= 1
+        return DummyResponse([[0.5] for _ in json["inputs"]])
+
+
+@pytest.mark.asyncio
+async def test_hf_embed_concurrency_limit_is_shared_by_calls(monkeypatch):
+    SlowClient.max_in_flight = 0
+    monkeypatch.setattr("httpx.AsyncClient", SlowClient)
+    monkeypatch.setattr("app.adapters.hf_adapter.settings.HF_EMBED_MAX_CONCURRENCY", 2)
+
+    adapter = HFAdapter(api_key="test-key", embedding_model="test-embed")
+    await asyncio.gather(*(adapter.embed([f"q{i}"], batch_size=1) for i in range(6)))
+
+    assert SlowClient.max_in_flight == 2
@@ -1,5 +1,5 @@
 import pytest
-from app.ingest import chunk_text
+from app.ingest import chunk_hash, chunk_text, iter_content_chunks, iter_page_chunks
 
 
 def test_chunk_text_basic():
@@ -10,3 +10,57 @@ def test_chunk_text_basic():
     assert isinstance(chunks[0], dict)
     assert len(chunks[0]["text"]) == 1000
     assert len(chunks[1]["text"]) <= 1000
+
+
+def test_chunk_text_token_offsets_are_running():
+    text = "y" * 2600
+    chunks = chunk_text(text, chunk_size=1000, overlap=200)
+    starts = [0, 800, 1600]
+    for chunk, start in zip(chunks, starts):
+        assert chunk["start_token_est"] == max(1, len(text[:start]) // 4)
+        assert chunk["end_token_est"] == chunk["start_token_est"] + max(1, len(chunk["text"]) // 4)
+
+
+def test_iter_page_chunks_is_lazy_and_keeps_pages():
+    consumed = []
+
+    def pages():
+        for n in (1, 2, 3):
+            consumed.append(n)
+            yield n, "p" * 1500
+
+    gen = iter_page_chunks(pages(), chunk_size=1000, overlap=200)
+    first = next(gen)
+    assert first["page"] == 1
+    assert consumed == [1]
+    rest = list(gen)
+    assert {c["page"] for c in rest} == {1, 2, 3}
+    assert set(first) == {"text", "page", "start_token_est", "end_token_est"}
+
+
+def _sentences(n):
+    sizes = ["corto", "algo más largo que el anterior", "bastante más largo, con detalles del servicio y sus precios"]
+    return [f"Línea {i}: servicio de limpieza {sizes[i % 3]}." for i in range(n)]
+
+
+@pytest.mark.parametrize("separator", ["\n", " "])
+def test_content_chunks_survive_insertions_without_blank_lines(separator):
+    """A PDF page (single line breaks) or a run of sentences is cut at lines or sentence ends."""
+    lines = _sentences(120)
+    before = list(iter_content_chunks(separator.join(lines), page=3))
+    lines.insert(5, "Nuevo: jardinería los sábados.")
+    after = list(iter_content_chunks(separator.join(lines), page=3))
+
+    assert len(before) > 5
+    assert all(len(c["text"]) <= 1000 for c in before + after)
+    changed = {chunk_hash(c) for c in after} - {chunk_hash(c) for c in before}
+    assert 1 <= len(changed) <= 2
+    assert any("jardinería" in c["text"] for c in after if chunk_hash(c) in changed)
+
+
+def test_iter_page_chunks_keeps_fixed_windows_unless_content_defined():
+    pages = [(1, "\n".join(_sentences(60)))]
+    fixed = list(iter_page_chunks(pages, chunk_size=1000, overlap=200))
+    assert [c["start_token_est"] for c in fixed[:3]] == [1, 200, 400]
+    content = list(iter_page_chunks(pages, chunk_size=1000, overlap=200, content_defined=True))
+    assert all(c["text"].startswith("Línea") for c in content)
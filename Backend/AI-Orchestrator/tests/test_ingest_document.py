@@ -29,7 +29,7 @@ async def test_ingest_document_calls_embed_and_upsert(tmp_path, monkeypatch):
 
     # Patch the embed method used by ingest and the upsert function referenced by ingest
     monkeypatch.setattr("app.ingest.HFAdapter.embed", AsyncMock(side_effect=fake_embed))
-    monkeypatch.setattr("app.ingest.upsert_embeddings", fake_upsert)
+    monkeypatch.setattr("app.ingest.aupsert_embeddings", AsyncMock(side_effect=fake_upsert))
 
     res = await ingest_document(p, collection_name="documents")
     assert res["status"] == "ok"
@@ -59,8 +59,150 @@ async def test_ingest_pdf_page_provenance(tmp_path, monkeypatch):
         return None
 
     monkeypatch.setattr("app.ingest.HFAdapter.embed", AsyncMock(side_effect=fake_embed))
-    monkeypatch.setattr("app.ingest.upsert_embeddings", fake_upsert)
+    monkeypatch.setattr("app.ingest.aupsert_embeddings", AsyncMock(side_effect=fake_upsert))
 
     res = await ingest_document(p, collection_name="documents")
     assert res["status"] == "ok"
     assert res["chunks"] > 0
+
+
+@pytest.mark.asyncio
+async def test_ingest_document_upserts_in_batches(tmp_path, monkeypatch):
+    p = tmp_path / "big.txt"
+    p.write_text("z" * 8000)
+
+    async def fake_embed(texts):
+        return [[0.1] * 3 for _ in texts]
+
+    calls = []
+
+    def fake_upsert(collection_name, ids, vectors, payloads):
+        calls.append(list(ids))
+
+    monkeypatch.setattr("app.ingest.HFAdapter.embed", AsyncMock(side_effect=fake_embed))
+    monkeypatch.setattr("app.ingest.aupsert_embeddings", AsyncMock(side_effect=fake_upsert))
+
+    res = await ingest_document(p, collection_name="documents", batch_size=3, incremental=False)
+    assert res == {"status": "ok", "chunks": 11}
+    assert [len(c) for c in calls] == [3, 3, 3, 2]
+    # point ids keep a global running index across batches
+    assert calls[1][0] == "big.txt-p0-3"
+
+
+@pytest.mark.asyncio
+async def test_incremental_reingest_only_touches_changed_chunks(tmp_path, monkeypatch):
+    async def fake_embed(texts):
+        return [[0.1] * 3 for _ in texts]
+
+    upserts = []
+    deletes = []
+    monkeypatch.setattr("app.ingest.HFAdapter.embed", AsyncMock(side_effect=fake_embed))
+    monkeypatch.setattr("app.ingest.aupsert_embeddings", AsyncMock(side_effect=lambda collection_name, ids, vectors, payloads: upserts.append(list(ids))))
+    monkeypatch.setattr("app.ingest.adelete_points", AsyncMock(side_effect=lambda collection_name, ids: deletes.append(list(ids))))
+
+    # three 800-char blocks; chunks of 1000 with 200 overlap align on the block boundaries
+    blocks = ["a" * 800, "b" * 800, "c" * 800]
+    p = tmp_path / "upload.txt"
+    p.write_text("".join(blocks))
+    first = await ingest_document(p, doc_id="precios.txt")
+    first_ids = [pid for call in upserts for pid in call]
+
+    blocks[2] = "C" * 800
+    p.write_text("".join(blocks))
+    upserts.clear()
+    second = await ingest_document(p, doc_id="precios.txt")
+
+    assert first["upserted"] == first["chunks"] and first["deleted"] == 0
+    assert second["chunks"] == first["chunks"]
+    assert 0 < second["upserted"] < second["chunks"]
+    assert second["deleted"] == second["upserted"]
+    assert sum(len(d) for d in deletes) == second["deleted"]
+    assert set(deletes[0]).issubset(first_ids)
+
+    upserts.clear()
+    deletes.clear()
+    third = await ingest_document(p, doc_id="precios.txt")
+    assert third["upserted"] == 0 and third["deleted"] == 0
+    assert upserts == [] and deletes == []
+
+
+@pytest.mark.asyncio
+async def test_inserting_text_only_touches_the_chunks_around_it(tmp_path, monkeypatch):
+    async def fake_embed(texts):
+        return [[0.1] * 3 for _ in texts]
+
+    upserts = []
+    monkeypatch.setattr("app.ingest.HFAdapter.embed", AsyncMock(side_effect=fake_embed))
+    monkeypatch.setattr("app.ingest.aupsert_embeddings", AsyncMock(side_effect=lambda collection_name, ids, vectors, payloads: upserts.append(payloads)))
+    monkeypatch.setattr("app.ingest.adelete_points", AsyncMock(side_effect=lambda collection_name, ids: None))
+
+    paragraphs = [f"Servicio {i}: " + "limpieza y mantenimiento del hogar. " * (3 + i % 7) for i in range(40)]
+    p = tmp_path / "catalogo.txt"
+    p.write_text("\n\n".join(paragraphs))
+    first = await ingest_document(p, doc_id="catalogo.txt")
+
+    paragraphs.insert(3, "Nuevo: servicio de jardinería los sábados.")
+    p.write_text("\n\n".join(paragraphs))
+    upserts.clear()
+    second = await ingest_document(p, doc_id="catalogo.txt")
+
+    assert first["chunks"] > 10
+    # only the chunk that received the paragraph (and its neighbour at most) changes
+    assert 1 <= second["upserted"] <= 2
+    assert second["deleted"] <= 2
+    assert second["unchanged"] >= first["chunks"] - 2
+    assert any("jardinería" in payload["text"] for call in upserts for payload in call)
+
+
+@pytest.mark.asyncio
+async def test_api_and_worker_share_the_manifest_file(tmp_path, monkeypatch):
+    import app.ingest_manifest as ingest_manifest
+    from app.ingest_manifest import IngestManifestStore
+
+    async def fake_embed(texts):
+        return [[0.1] * 3 for _ in texts]
+
+    monkeypatch.setattr("app.ingest.HFAdapter.embed", AsyncMock(side_effect=fake_embed))
+    monkeypatch.setattr("app.ingest.aupsert_embeddings", AsyncMock(side_effect=lambda collection_name, ids, vectors, payloads: None))
+    monkeypatch.setattr("app.ingest.adelete_points", AsyncMock(side_effect=lambda collection_name, ids: None))
+
+    p = tmp_path / "faq.txt"
+    p.write_text("Horario: de 9 a 18.\n\nPagos con tarjeta o transferencia.")
+    first = await ingest_document(p, doc_id="faq.txt")  # API process
+
+    # the worker opens its own store on the same (shared) file
+    worker_store = IngestManifestStore(ingest_manifest.get_manifest_store()._path)
+    monkeypatch.setattr("app.ingest.get_manifest_store", lambda: worker_store)
+    try:
+        second = await ingest_document(p, doc_id="faq.txt")
+    finally:
+        worker_store.close()
+
+    assert first["upserted"] == first["chunks"] > 0
+    assert second["upserted"] == 0 and second["unchanged"] == first["chunks"]
+
+
+@pytest.mark.asyncio
+async def test_concurrent_reingests_of_one_document_are_serialized(tmp_path, monkeypatch):
+    active = []
+    overlaps = []
+
+    async def slow_embed(texts):
+        active.append(1)
+        overlaps.append(len(active))
+        await asyncio.sleep(0.01)
+        active.pop()
+        return [[0.1] * 3 for _ in texts]
+
+    monkeypatch.setattr("app.ingest.HFAdapter.embed", AsyncMock(side_effect=slow_embed))
+    monkeypatch.setattr("app.ingest.aupsert_embeddings", AsyncMock(side_effect=lambda collection_name, ids, vectors, payloads: None))
+    monkeypatch.setattr("app.ingest.adelete_points", AsyncMock(side_effect=lambda collection_name, ids: None))
+
+    p = tmp_path / "faq.txt"
+    p.write_text("Horario: de 9 a 18.\n\nPagos con tarjeta o transferencia.")
+    first, second = await asyncio.gather(ingest_document(p, doc_id="faq.txt"), ingest_document(p, doc_id="faq.txt"))
+
+    assert max(overlaps) == 1
+    # the second run sees the manifest written by the first one
+    assert first["upserted"] == first["chunks"]
+    assert second["upserted"] == 0
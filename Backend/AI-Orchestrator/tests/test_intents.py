@@ -0,0 +1,71 @@
+import timeit
+
+from app.intents import _INTENTS, Intent, IntentMatcher, detect_intent, is_off_topic, match
+
+
+def test_matcher_reports_every_rule_and_keeps_declaration_priority():
+    matcher = IntentMatcher([("a", [r"zz"]), ("b", [r"x+", r"y"]), ("c", [r"^q$"])])
+    assert matcher.matches("y ... zz") == {"a": "zz", "b": "y"}
+    # priority follows declaration order, not position in the text
+    assert matcher.first("y ... zz") == "a"
+    assert matcher.first("q") == "c"
+    assert matcher.first("nothing here") is None
+
+
+def test_keywords_skip_rules_without_changing_the_result():
+    matcher = IntentMatcher([("a", [r"r+e+serva"], ["reserva"]), ("b", [r"pag(o|ar)"], ["pag"])])
+    assert matcher.matches("quiero pagar la reserva") == {"a": "reserva", "b": "pagar"}
+    assert matcher.first("quiero pagar") == "b"
+    assert matcher.first("nada que ver") is None
+
+
+def test_keyword_prefilter_beats_one_search_per_rule():
+    """Most messages lack every keyword: no intent regex runs at all."""
+    message = ("Buenas tardes, tengo una consulta general sobre la plataforma y quisiera entender "
+               "mejor los tiempos de respuesta y la forma de contacto con el equipo de soporte. ") * 2
+    per_rule = [regex for _, regex, _ in _INTENTS._rules]
+
+    def search_every_rule():
+        for regex in per_rule:
+            if regex.search(message):
+                return
+
+    assert _INTENTS.first(message) is None
+    baseline = min(timeit.repeat(search_every_rule, number=2000, repeat=3))
+    prefiltered = min(timeit.repeat(lambda: _INTENTS.first(message), number=2000, repeat=3))
+    assert prefiltered * 3 < baseline
+
+
+def test_match_returns_intent_with_params():
+    intent = match("Quiero reservar el servicio 'corte de cabello' para el 20 de enero a las 14:00")
+    assert intent == Intent(
+        "crear_reserva", "crear_reserva",
+        {"servicio_nombre": "corte de cabello", "fecha": "2026-01-20", "hora": "14:00"},
+    )
+    assert not match("hola")
+    assert match("hola").as_dict() is None
+
+
+def test_detect_intent_priority_and_legacy_shapes():
+    assert detect_intent("ver mi reserva 5") == {"tool": "ver_reserva", "params": {"reserva_id": 5}, "intent": "ver_reserva"}
+    assert detect_intent("consultar mi reserva") == {"tool": None, "intent": "ver_reserva_incomplete", "missing": ["reserva_id"]}
+    assert detect_intent("necesito pagar monto de $20.50 reserva 9 transferencia") == {
+        "tool": "procesar_pago",
+        "params": {"reserva_id": 9, "monto": "20.50", "metodo_pago": "transferencia"},
+        "intent": "procesar_pago",
+    }
+    assert detect_intent("pagar")["missing"] == ["reserva_id", "monto"]
+    # ventas is checked before the generic service search
+    assert detect_intent("dame el resumen de ventas de servicios")["intent"] == "resumen_ventas"
+
+    result = detect_intent("busca servicios de belleza con precio menor a 50")
+    assert result["tool"] == "buscar_productos"
+    assert result["params"] == {"precio_max": 50, "categoria": "Servicios de belleza", "q": "belleza"}
+
+
+def test_is_off_topic():
+    assert is_off_topic("qué es la democracia")
+    assert is_off_topic("dime un chiste")
+    assert not is_off_topic("receta para el spa")  # on-topic keyword wins
+    assert not is_off_topic("hola")
+    assert not is_off_topic("")
@@ -0,0 +1,134 @@
+import asyncio
+import json
+import time
+
+import jwt
+import pytest
+from cryptography.hazmat.primitives.asymmetric import rsa
+from fastapi import HTTPException
+from jwt.algorithms import RSAAlgorithm
+
+from app import jwks
+from app.jwks import JWKSVerifier
+
+
+def make_key(kid):
+    private = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    public = json.loads(RSAAlgorithm.to_jwk(private.public_key()))
+    public.update({"kid": kid, "use": "sig", "alg": "RS256"})
+    return private, public
+
+
+def make_token(private, kid, sub="42", ttl=300):
+    return jwt.encode({"sub": sub, "exp": int(time.time()) + ttl}, private, algorithm="RS256", headers={"kid": kid})
+
+
+class FakeResponse:
+    def __init__(self, data):
+        self._data = data
+
+    def raise_for_status(self):
+        return None
+
+    def json(self):
+        return self._data
+
+
+class FakeJWKSClient:
+    def __init__(self, *keys):
+        self.keys = list(keys)
+        self.fetches = 0
+        self.gate = None
+
+    async def get(self, url):
+        self.fetches += 1
+        if self.gate is not None:
+            await self.gate.wait()
+        return FakeResponse({"keys": list(self.keys)})
+
+
+@pytest.fixture
+def server(monkeypatch):
+    private, public = make_key("k1")
+    client = FakeJWKSClient(public)
+    client.private = private
+    monkeypatch.setattr(jwks.http_pool, "get_async_client", lambda *args, **kwargs: client)
+    return client
+
+
+@pytest.fixture
+def decodes(monkeypatch):
+    calls = []
+    real_decode = jwks.decode
+
+    def counting_decode(token, *args, **kwargs):
+        calls.append(token)
+        return real_decode(token, *args, **kwargs)
+
+    monkeypatch.setattr(jwks, "decode", counting_decode)
+    return calls
+
+
+@pytest.mark.asyncio
+async def test_keys_are_prefetched_and_verified_tokens_are_cached_until_exp(server, decodes, monkeypatch):
+    verifier = JWKSVerifier("http://auth/jwks.json")
+    await verifier.prefetch()
+    token = make_token(server.private, "k1")
+
+    assert (await verifier.verify(token))["sub"] == "42"
+    payload = await verifier.verify(token)
+    payload["sub"] = "mutated"
+    assert (await verifier.verify(token))["sub"] == "42"
+    assert server.fetches == 1
+    assert len(decodes) == 1
+
+    # past the token's exp the cached entry is dropped and the token goes through decode again
+    later = time.time() + 301
+    monkeypatch.setattr(jwks.time, "time", lambda: later)
+    await verifier.verify(token)
+    assert len(decodes) == 2
+
+    forged = make_token(make_key("k1")[0], "k1")
+    with pytest.raises(HTTPException) as exc:
+        await verifier.verify(forged)
+    assert exc.value.status_code == 401
+
+
+@pytest.mark.asyncio
+async def test_stale_keys_are_served_while_refreshing_in_background(server, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(jwks.time, "monotonic", lambda: now[0])
+    verifier = JWKSVerifier("http://auth/jwks.json", refresh_seconds=300)
+    await verifier.prefetch()
+
+    now[0] += 301
+    server.gate = asyncio.Event()
+    results = await asyncio.gather(*(verifier.verify(make_token(server.private, "k1", sub=str(i))) for i in range(3)))
+    assert [r["sub"] for r in results] == ["0", "1", "2"]
+    # one refresh for the three stale lookups, and nobody waited for it
+    assert server.fetches == 2
+    assert verifier._fetched_at == 1000.0
+
+    server.gate.set()
+    await verifier.refresh()
+    assert verifier._fetched_at == 1301.0
+    assert server.fetches == 2
+
+
+@pytest.mark.asyncio
+async def test_unknown_kid_forces_a_rate_limited_refresh(server, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(jwks.time, "monotonic", lambda: now[0])
+    verifier = JWKSVerifier("http://auth/jwks.json", min_refresh_seconds=30)
+    await verifier.prefetch()
+
+    rotated, rotated_public = make_key("k2")
+    server.keys.append(rotated_public)
+    now[0] += 31
+    assert (await verifier.verify(make_token(rotated, "k2")))["sub"] == "42"
+    assert server.fetches == 2
+
+    with pytest.raises(HTTPException) as exc:
+        await verifier.verify(make_token(make_key("k3")[0], "k3"))
+    assert exc.value.status_code == 401
+    assert server.fetches == 2
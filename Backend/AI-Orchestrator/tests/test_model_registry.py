@@ -0,0 +1,57 @@
+import pytest
+import threading
+import time
+
+from app.model_registry import ModelRegistry
+
+
+def make_loader(calls):
+    def loader(model_id):
+        calls.append(model_id)
+        time.sleep(0.05)
+        return {"id": model_id}
+
+    return loader
+
+
+def test_registry_loads_each_model_once_across_threads():
+    calls = []
+    registry = ModelRegistry(max_models=2, loaders={"embedding": make_loader(calls)})
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(registry.get("embedding", "m1"))) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert calls == ["m1"]
+    assert all(r is results[0] for r in results)
+
+
+def test_registry_evicts_least_recently_used():
+    calls = []
+    registry = ModelRegistry(max_models=2, loaders={"embedding": make_loader(calls)})
+
+    registry.get("embedding", "a")
+    registry.get("embedding", "b")
+    registry.get("embedding", "a")  # touch a, so b is now LRU
+    registry.get("embedding", "c")
+
+    assert registry.loaded() == [("embedding", "a"), ("embedding", "c")]
+    registry.get("embedding", "b")
+    assert calls == ["a", "b", "c", "b"]
+
+
+@pytest.mark.asyncio
+async def test_registry_runs_inference_off_loop_and_warms_up():
+    calls = []
+    registry = ModelRegistry(loaders={"embedding": make_loader(calls)})
+    loop_thread = threading.get_ident()
+
+    await registry.warm_up({"embedding": "warm"})
+    thread_id = await registry.run("embedding", "warm", lambda m: threading.get_ident())
+
+    assert calls == ["warm"]
+    assert thread_id != loop_thread
+    registry.shutdown()
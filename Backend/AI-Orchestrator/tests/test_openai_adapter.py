@@ -43,3 +43,51 @@ async def test_openai_adapter_returns_text(monkeypatch):
     res = await adapter.generate("Say hi")
 
     assert "Hello from LLM" in res
+
+
+class StreamingResponse:
+    status_code = 200
+
+    def __init__(self, lines):
+        self._lines = lines
+
+    def raise_for_status(self):
+        return None
+
+    async def aiter_lines(self):
+        for line in self._lines:
+            yield line
+
+
+class StreamingClient:
+    def __init__(self, *args, **kwargs):
+        self.requests = []
+
+    def stream(self, method, url, json=None, headers=None):
+        self.requests.append(json)
+        lines = [
+            'data: {"choices": [{"delta": {"role": "assistant"}}]}',
+            "",
+            'data: {"choices": [{"delta": {"content": "Hola"}}]}',
+            'data: {"choices": [{"delta": {"content": " mundo"}}]}',
+            "data: [DONE]",
+        ]
+
+        class _Ctx:
+            async def __aenter__(self_inner):
+                return StreamingResponse(lines)
+
+            async def __aexit__(self_inner, *exc):
+                return False
+
+        return _Ctx()
+
+
+@pytest.mark.asyncio
+async def test_openai_adapter_streams_deltas(monkeypatch):
+    monkeypatch.setattr("httpx.AsyncClient", StreamingClient)
+
+    adapter = OpenAIAdapter(api_key="test-key", model="test-model")
+    chunks = [c async for c in adapter.stream_generate("Say hi")]
+
+    assert chunks == ["Hola", " mundo"]
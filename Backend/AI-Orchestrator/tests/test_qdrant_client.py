@@ -0,0 +1,99 @@
+import asyncio
+import threading
+
+import pytest
+
+import app.qdrant_client as qc
+
+
+class FakeQdrant:
+    instances = 0
+
+    def __init__(self, **kwargs):
+        FakeQdrant.instances += 1
+        self.kwargs = kwargs
+        self.exists_calls = 0
+        self.collections = {}
+        self.upserts = []
+        self._lock = threading.Lock()
+
+    def collection_exists(self, name):
+        self.exists_calls += 1
+        return name in self.collections
+
+    def create_collection(self, collection_name, vectors_config):
+        self.collections[collection_name] = vectors_config.size
+
+    def upsert(self, collection_name, points, wait=True):
+        with self._lock:
+            self.upserts.append(([p.id for p in points], wait))
+
+
+class FakeAsyncQdrant:
+    def __init__(self, **kwargs):
+        self.upserts = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def upsert(self, collection_name, points, wait=True):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.01)
+        self.in_flight -= 1
+        self.upserts.append(([p.id for p in points], wait))
+
+
+@pytest.fixture
+def fake_qdrant(monkeypatch):
+    FakeQdrant.instances = 0
+    monkeypatch.setattr(qc, "QdrantClient", FakeQdrant)
+    monkeypatch.setattr(qc, "AsyncQdrantClient", FakeAsyncQdrant)
+    monkeypatch.setattr(qc, "_client", None)
+    monkeypatch.setattr(qc, "_async_clients", qc.weakref.WeakKeyDictionary())
+    monkeypatch.setattr(qc, "_upsert_limits", qc.weakref.WeakKeyDictionary())
+    qc.forget_collection()
+    yield
+    qc.forget_collection()
+
+
+def test_client_and_collection_metadata_are_shared(fake_qdrant):
+    for _ in range(3):
+        qc.upsert_embeddings("docs", [1, 2], [[0.1, 0.2], [0.3, 0.4]], [{}, {}])
+
+    client = qc.get_qdrant_client()
+    assert FakeQdrant.instances == 1
+    assert client.exists_calls == 1
+    assert client.collections == {"docs": 2}
+
+
+def test_upsert_is_split_into_parallel_batches_without_wait(fake_qdrant, monkeypatch):
+    monkeypatch.setattr(qc.settings, "QDRANT_UPSERT_BATCH_SIZE", 4)
+    monkeypatch.setattr(qc.settings, "QDRANT_UPSERT_WAIT", False)
+    ids = list(range(10))
+    qc.upsert_embeddings("docs", ids, [[0.5]] * 10, [{}] * 10)
+
+    upserts = qc.get_qdrant_client().upserts
+    assert sorted(len(batch) for batch, _ in upserts) == [2, 4, 4]
+    assert sorted(i for batch, _ in upserts for i in batch) == ids
+    assert all(wait is False for _, wait in upserts)
+
+
+@pytest.mark.asyncio
+async def test_async_upsert_sends_bounded_concurrent_batches_and_waits(fake_qdrant, monkeypatch):
+    monkeypatch.setattr(qc.settings, "QDRANT_UPSERT_BATCH_SIZE", 2)
+    monkeypatch.setattr(qc.settings, "QDRANT_UPSERT_PARALLEL", 3)
+    ids = list(range(10))
+    await qc.aupsert_embeddings("docs", ids, [[0.5]] * 10, [{}] * 10)
+
+    client = qc.get_async_qdrant_client()
+    assert sorted(i for batch, _ in client.upserts for i in batch) == ids
+    assert client.max_in_flight == 3
+    # default: points are searchable when ingest returns
+    assert all(wait is True for _, wait in client.upserts)
+    assert qc.get_qdrant_client().collections == {"docs": 1}
+
+
+def test_vector_size_mismatch_is_reported(fake_qdrant):
+    qc.upsert_embeddings("docs", [1], [[0.1, 0.2]], [{}])
+    with pytest.raises(ValueError):
+        qc.upsert_embeddings("docs", [2], [[0.1, 0.2, 0.3]], [{}])
@@ -0,0 +1,74 @@
+import pytest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+from httpx import AsyncClient
+
+import app.retrieval as retrieval
+from app.main import app
+from app.routes.tools import get_caller
+
+
+def point(pid, score, text, doc="precios.pdf", page=1):
+    return SimpleNamespace(id=pid, score=score, payload={"text": text, "doc_id": doc, "page": page})
+
+
+@pytest.fixture(autouse=True)
+def fresh_query_cache():
+    retrieval._query_cache.clear()
+    yield
+    retrieval._query_cache.clear()
+
+
+def test_pack_context_respects_token_budget():
+    sources = [{"text": "a" * 400}, {"text": "b" * 800}, {"text": "c" * 200}]
+    packed = retrieval.pack_context(sources, token_budget=160)
+    # 100 + 200 tokens would overflow, so the second source is skipped
+    assert [s["text"][0] for s in packed] == ["a", "c"]
+
+
+@pytest.mark.asyncio
+async def test_retrieve_caches_query_embeddings_and_filters(monkeypatch):
+    embed = AsyncMock(return_value=[[0.1, 0.2]])
+    search = AsyncMock(return_value=[point("p1", 0.9, "Corte de cabello $10")])
+    monkeypatch.setattr("app.retrieval.HFAdapter.embed", embed)
+    monkeypatch.setattr("app.retrieval.asearch", search)
+
+    first = await retrieval.retrieve("  Precio del CORTE ", top_k=3, filters={"doc_id": "precios.pdf"})
+    await retrieval.retrieve("precio del corte", top_k=3)
+
+    assert first == [{"id": "p1", "score": 0.9, "doc": "precios.pdf", "page": 1, "text": "Corte de cabello $10"}]
+    assert embed.await_count == 1
+    assert embed.await_args.args[0] == ["precio del corte"]
+    query_filter = search.await_args_list[0].kwargs["query_filter"]
+    assert query_filter.must[0].key == "doc_id"
+    assert search.await_args_list[1].kwargs["query_filter"] is None
+
+
+@pytest.mark.asyncio
+async def test_retrieve_is_best_effort(monkeypatch):
+    monkeypatch.setattr("app.retrieval.HFAdapter.embed", AsyncMock(side_effect=RuntimeError("no key")))
+    assert await retrieval.retrieve("hola") == []
+
+
+@pytest.mark.asyncio
+async def test_query_chat_uses_retrieved_sources(monkeypatch):
+    sources = [{"id": "p1", "score": 0.8, "doc": "faq.txt", "page": None, "text": "Abrimos de 9 a 18."}]
+    monkeypatch.setattr("app.routes.chat.retrieve", AsyncMock(return_value=sources))
+    prompts = []
+
+    class FakeAdapter:
+        async def generate(self, prompt, stream=False):
+            prompts.append(prompt)
+            return "Abrimos de 9 a 18 [1]."
+
+    monkeypatch.setattr("app.llm_adapter.get_default_adapter", lambda: FakeAdapter())
+    app.dependency_overrides[get_caller] = lambda: {"api_key": "test"}
+    try:
+        async with AsyncClient(app=app, base_url="http://test") as ac:
+            resp = await ac.post("/chat/query", json={"query": "¿Horario?"})
+    finally:
+        app.dependency_overrides.clear()
+
+    assert resp.status_code == 200
+    assert resp.json()["sources"] == sources
+    assert "[1] (faq.txt) Abrimos de 9 a 18." in prompts[0]
@@ -0,0 +1,127 @@
+import pytest
+from unittest.mock import AsyncMock
+from httpx import AsyncClient
+
+import app.retrieval as retrieval
+from app import semantic_cache
+from app.main import app
+from app.routes.chat import join_stream_texts
+from app.routes.tools import get_caller
+from app.semantic_cache import SemanticCache
+
+
+@pytest.fixture(autouse=True)
+def fresh_query_cache():
+    retrieval._query_cache.clear()
+    yield
+    retrieval._query_cache.clear()
+
+
+def test_lookup_by_cosine_similarity_with_namespaces_ttl_and_metrics(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(semantic_cache.time, "monotonic", lambda: now[0])
+    cache = SemanticCache(threshold=0.9, ttl_seconds=60, max_entries=2)
+
+    cache.store("qwen", [1.0, 0.0], "Abrimos de 9 a 18.", [{"doc": "faq.txt"}])
+    hit = cache.lookup("qwen", [0.99, 0.05])
+    assert hit.answer == "Abrimos de 9 a 18."
+    assert hit.sources == [{"doc": "faq.txt"}]
+    assert hit.score > 0.99
+    assert cache.lookup("qwen", [0.0, 1.0]) is None  # different question
+    assert cache.lookup("gpt", [1.0, 0.0]) is None  # another model
+
+    # the least recently used answer is evicted
+    cache.store("qwen", [0.0, 1.0], "b")
+    cache.lookup("qwen", [1.0, 0.0])
+    cache.store("qwen", [0.7, -0.7], "c")
+    assert cache.lookup("qwen", [0.0, 1.0]) is None
+    assert cache.lookup("qwen", [1.0, 0.0]) is not None
+
+    now[0] += 61
+    assert cache.lookup("qwen", [1.0, 0.0]) is None
+    assert cache.stats() == {"hits": 3, "misses": 4, "stores": 3, "hit_rate": 0.4286, "entries": 0, "namespaces": 1}
+
+
+def test_join_stream_texts_restores_spacing():
+    assert join_stream_texts(["Hola, ¿en qué", "te ayudo?\n", "Saludos"]) == "Hola, ¿en qué te ayudo?\nSaludos"
+
+
+class FakeAdapter:
+    def __init__(self, answer):
+        self.answer = answer
+        self.prompts = []
+
+    def model_name(self):
+        return "fake"
+
+    async def generate(self, prompt, stream=False):
+        self.prompts.append(prompt)
+        return self.answer
+
+    async def stream_generate(self, prompt):
+        self.prompts.append(prompt)
+        for word in self.answer.split(" "):
+            yield word + " "
+
+
+@pytest.fixture
+def chat_env(monkeypatch):
+    embed = AsyncMock(return_value=[[0.6, 0.8]])
+    monkeypatch.setattr("app.retrieval.HFAdapter.embed", embed)
+    monkeypatch.setattr("app.routes.chat.retrieve", AsyncMock(return_value=[]))
+
+    def use(adapter, caller=None):
+        monkeypatch.setattr("app.llm_adapter.get_default_adapter", lambda: adapter)
+        app.dependency_overrides[get_caller] = lambda: caller or {"api_key": "test"}
+
+    yield use
+    app.dependency_overrides.clear()
+
+
+@pytest.mark.asyncio
+async def test_query_chat_serves_equivalent_questions_from_cache(chat_env):
+    adapter = FakeAdapter("Abrimos de 9 a 18.")
+    chat_env(adapter)
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        first = await ac.post("/chat/query", json={"query": "¿Horario?"})
+        second = await ac.post("/chat/query", json={"query": "  ¿HORARIO? "})
+        stats = await ac.get("/chat/semantic-cache/stats")
+
+    assert first.json()["answer"] == second.json()["answer"] == "Abrimos de 9 a 18."
+    assert len(adapter.prompts) == 1
+    assert stats.json()["hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_answers_with_tool_calls_are_not_cached(chat_env):
+    adapter = FakeAdapter('TOOL_CALL: {"tool": "no_existe", "params": {}}')
+    chat_env(adapter)
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        await ac.post("/chat/query", json={"query": "¿Horario?"})
+        await ac.post("/chat/query", json={"query": "¿Horario?"})
+
+    assert len(adapter.prompts) == 2
+
+
+def rendered(body):
+    """Text as the frontend shows it: data lines joined by newlines, messages by spaces."""
+    messages = []
+    for message in body.split("\n\n"):
+        lines = [line[len("data: "):] for line in message.split("\n") if line.startswith("data: ")]
+        if lines:
+            messages.append("\n".join(lines))
+    return " ".join(messages)
+
+
+@pytest.mark.asyncio
+async def test_stream_fallback_reuses_cached_answer(chat_env):
+    adapter = FakeAdapter("Abrimos de lunes a viernes.")
+    chat_env(adapter, caller={"jwt_payload": {"sub": "7", "role": "cliente"}})
+    bodies = []
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        for _ in range(2):
+            resp = await ac.post("/chat/stream", json={"query": "cuéntame de la empresa FindYourWork"})
+            bodies.append(resp.text)
+
+    assert len(adapter.prompts) == 1
+    assert rendered(bodies[0]) == rendered(bodies[1]) == "Abrimos de lunes a viernes."
@@ -0,0 +1,188 @@
+import asyncio
+
+import pytest
+
+from app.adapters.hf_adapter import HFAdapter
+from app.llm_adapter import HuggingFaceAdapter
+from app.singleflight import SingleFlight, StreamFlight
+from app.tools import ToolRegistry
+
+
+@pytest.mark.asyncio
+async def test_concurrent_identical_calls_share_one_execution():
+    flights = SingleFlight()
+    calls = []
+
+    async def work(key):
+        calls.append(key)
+        await asyncio.sleep(0.01)
+        return {"key": key}
+
+    results = await asyncio.gather(*(flights.do(k, lambda k=k: work(k)) for k in ["a", "a", "a", "b"]))
+
+    assert calls == ["a", "b"]
+    assert results == [{"key": "a"}] * 3 + [{"key": "b"}]
+    assert flights.coalesced == 2
+    # finished calls are forgotten: the next call runs again
+    await flights.do("a", lambda: work("a"))
+    assert calls == ["a", "b", "a"]
+
+
+@pytest.mark.asyncio
+async def test_errors_reach_every_caller_and_cancelled_callers_do_not_cancel_the_call():
+    flights = SingleFlight()
+
+    async def boom():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("down")
+
+    results = await asyncio.gather(flights.do("k", boom), flights.do("k", boom), return_exceptions=True)
+    assert [str(r) for r in results] == ["down", "down"]
+
+    async def slow():
+        await asyncio.sleep(0.02)
+        return 42
+
+    first = asyncio.ensure_future(flights.do("slow", slow))
+    second = asyncio.ensure_future(flights.do("slow", slow))
+    await asyncio.sleep(0)
+    first.cancel()
+    assert await second == 42
+
+
+async def collect(stream):
+    return [chunk async for chunk in stream]
+
+
+@pytest.mark.asyncio
+async def test_concurrent_identical_streams_share_one_upstream_and_late_joiners_replay():
+    flights = StreamFlight()
+    opened = []
+
+    async def upstream(key):
+        opened.append(key)
+        for word in ["Hola", ", ", "mundo"]:
+            await asyncio.sleep(0.01)
+            yield word
+
+    first = asyncio.ensure_future(collect(flights.stream("a", lambda: upstream("a"))))
+    await asyncio.sleep(0.025)  # the first chunks were already sent
+    late = asyncio.ensure_future(collect(flights.stream("a", lambda: upstream("a"))))
+    other = asyncio.ensure_future(collect(flights.stream("b", lambda: upstream("b"))))
+
+    assert await first == await late == ["Hola", ", ", "mundo"]
+    assert await other == ["Hola", ", ", "mundo"]
+    assert opened == ["a", "b"]
+    assert flights.coalesced == 1
+    # finished streams are forgotten: the next call opens a new one
+    await collect(flights.stream("a", lambda: upstream("a")))
+    assert opened == ["a", "b", "a"]
+
+
+@pytest.mark.asyncio
+async def test_stream_errors_reach_every_subscriber_and_leaving_subscribers_do_not_stop_others():
+    flights = StreamFlight()
+
+    async def broken():
+        yield "parcial"
+        await asyncio.sleep(0.01)
+        raise RuntimeError("down")
+
+    results = await asyncio.gather(
+        collect(flights.stream("k", broken)), collect(flights.stream("k", broken)), return_exceptions=True
+    )
+    assert [str(r) for r in results] == ["down", "down"]
+
+    closed = []
+
+    async def slow():
+        try:
+            for word in ["uno", "dos"]:
+                await asyncio.sleep(0.01)
+                yield word
+        finally:
+            closed.append(True)
+
+    leaving = flights.stream("slow", slow)
+    assert await leaving.__anext__() == "uno"
+    staying = asyncio.ensure_future(collect(flights.stream("slow", slow)))
+    await leaving.aclose()
+    assert await staying == ["uno", "dos"]
+
+    # when the last subscriber leaves, the upstream stream is cancelled
+    alone = flights.stream("slow", slow)
+    assert await alone.__anext__() == "uno"
+    closed.clear()
+    await alone.aclose()
+    await asyncio.sleep(0)
+    assert closed == [True]
+
+
+class SlowClient:
+    def __init__(self):
+        self.calls = 0
+
+    async def call(self, path, method="GET", json=None, extra_headers=None, timeout=None):
+        self.calls += 1
+        await asyncio.sleep(0.01)
+        return [{"id": 1, "path": path}]
+
+
+@pytest.mark.asyncio
+async def test_registry_coalesces_get_tools_only():
+    client = SlowClient()
+    registry = ToolRegistry(client)
+
+    results = await asyncio.gather(*(registry.execute("buscar_productos", {}) for _ in range(5)))
+    assert client.calls == 1
+    results[0][0]["id"] = "mutated"
+    assert results[1] == [{"id": 1, "path": "buscar-productos"}]
+
+    await asyncio.gather(*(registry.execute("crear_reserva", {"servicio_id": 1}, confirm=True) for _ in range(2)))
+    assert client.calls == 3
+
+
+class EmbedClient:
+    posts = 0
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    async def post(self, url, json=None, headers=None):
+        EmbedClient.posts += 1
+        await asyncio.sleep(0.01)
+        return EmbedResponse([[1.0, 0.0] for _ in json["inputs"]])
+
+
+class EmbedResponse:
+    def __init__(self, data):
+        self._data = data
+
+    def raise_for_status(self):
+        return None
+
+    def json(self):
+        return self._data
+
+
+@pytest.mark.asyncio
+async def test_embed_and_generate_coalesce_identical_requests(monkeypatch):
+    EmbedClient.posts = 0
+    monkeypatch.setattr("httpx.AsyncClient", EmbedClient)
+    hf = HFAdapter(api_key="test-key", embedding_model="test-embed")
+
+    await asyncio.gather(hf.embed(["hola"]), hf.embed(["hola"]), hf.embed(["adios"]))
+    assert EmbedClient.posts == 2
+
+    generated = []
+
+    async def fake_generate(self, prompt, model=None, stream=False):
+        generated.append(prompt)
+        await asyncio.sleep(0.01)
+        return f"answer to {prompt}"
+
+    monkeypatch.setattr(HFAdapter, "generate", fake_generate)
+    adapter = HuggingFaceAdapter(api_key="test-key", model="test-model")
+    answers = await asyncio.gather(*(adapter.generate("muéstrame los servicios") for _ in range(3)))
+    assert answers == ["answer to muéstrame los servicios"] * 3
+    assert generated == ["muéstrame los servicios"]
@@ -0,0 +1,131 @@
+import pytest
+from httpx import AsyncClient
+
+from app import tool_cache
+from app.main import app
+from app.tool_cache import MISS, ToolCacheGenerations, ToolResultCache
+from app.tools import ToolRegistry
+
+USER_1 = {"jwt_payload": {"sub": "1"}}
+USER_2 = {"jwt_payload": {"sub": "2"}}
+
+
+class CountingClient:
+    def __init__(self):
+        self.calls = []
+
+    async def call(self, path, method="GET", json=None, extra_headers=None, timeout=None):
+        self.calls.append((method, path, dict(json or {})))
+        return {"path": path, "n": len(self.calls)}
+
+
+@pytest.mark.asyncio
+async def test_get_tools_are_read_through_cached_per_params_and_caller():
+    client = CountingClient()
+    registry = ToolRegistry(client, cache=ToolResultCache())
+
+    first = await registry.execute("ver_reserva", {"reserva_id": 5}, caller=USER_1)
+    first["n"] = "mutated by caller"
+    assert await registry.execute("ver_reserva", {"reserva_id": "5"}, caller=USER_1) == {"path": "ver-reserva/5", "n": 1}
+    await registry.execute("ver_reserva", {"reserva_id": 5}, caller=USER_2)
+    await registry.execute("ver_reserva", {"reserva_id": 6}, caller=USER_1)
+    # not cacheable: resumen_ventas has no cache_ttl, proposals are never cached
+    await registry.execute("resumen_ventas", {}, caller=USER_1)
+    await registry.execute("resumen_ventas", {}, caller=USER_1)
+    await registry.execute("ver_reserva", {"reserva_id": 5}, confirm=False, caller=USER_1)
+
+    assert len(client.calls) == 6
+
+
+@pytest.mark.asyncio
+async def test_mutations_invalidate_dependent_tools():
+    client = CountingClient()
+    registry = ToolRegistry(client, cache=ToolResultCache())
+
+    await registry.execute("ver_reserva", {"reserva_id": 5})
+    await registry.execute("procesar_pago", {"reserva_id": 5, "monto": "10"}, confirm=False)
+    await registry.execute("ver_reserva", {"reserva_id": 5})
+    assert len(client.calls) == 2
+
+    await registry.execute("procesar_pago", {"reserva_id": 5, "monto": "10"}, confirm=True)
+    await registry.execute("ver_reserva", {"reserva_id": 5})
+    assert len(client.calls) == 4
+
+
+@pytest.mark.asyncio
+async def test_entries_expire_and_events_invalidate(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(tool_cache.time, "monotonic", lambda: now[0])
+    cache = ToolResultCache(max_entries=10)
+
+    await cache.set("buscar_productos", {"q": "spa"}, None, [1], ttl=60)
+    now[0] += 61
+    assert await cache.get("buscar_productos", {"q": "spa"}, None) is MISS
+
+    await cache.set("ver_reserva", {"reserva_id": 5}, USER_1, {"id": 5}, ttl=60)
+    await cache.set("ver_reserva", {"reserva_id": 6}, USER_1, {"id": 6}, ttl=60)
+    assert await cache.invalidate_event("reserva.updated", {"id": 5}) == ["ver_reserva"]
+    assert await cache.get("ver_reserva", {"reserva_id": 5}, USER_1) is MISS
+    assert await cache.get("ver_reserva", {"reserva_id": 6}, USER_1) == {"id": 6}
+    assert await cache.invalidate_event("reserva.updated", {}) == []
+
+
+@pytest.mark.asyncio
+async def test_invalidations_reach_the_local_entries_of_other_processes(tmp_path):
+    path = tmp_path / "generations.sqlite3"
+    # API and worker: separate LRUs, separate connections to the same counters file
+    api = ToolResultCache(generations=ToolCacheGenerations(path))
+    worker = ToolResultCache(generations=ToolCacheGenerations(path))
+
+    await api.set("ver_reserva", {"reserva_id": 5}, USER_1, {"id": 5}, ttl=60)
+    await api.set("ver_reserva", {"reserva_id": 6}, USER_1, {"id": 6}, ttl=60)
+    await api.set("obtener_cliente", {}, USER_1, {"id": 1}, ttl=60)
+
+    assert await worker.invalidate_event("reserva.updated", {"id": 5}) == ["ver_reserva"]
+    assert await api.get("ver_reserva", {"reserva_id": 5}, USER_1) is MISS
+    assert await api.get("ver_reserva", {"reserva_id": 6}, USER_1) == {"id": 6}
+
+    await worker.invalidate("obtener_cliente")
+    assert await api.get("obtener_cliente", {}, USER_1) is MISS
+    # results stored after the invalidation are served again
+    await api.set("obtener_cliente", {}, USER_1, {"id": 2}, ttl=60)
+    assert await api.get("obtener_cliente", {}, USER_1) == {"id": 2}
+    api.close()
+    worker.close()
+
+
+@pytest.mark.asyncio
+async def test_redis_tier_is_shared_between_caches():
+    try:
+        import fakeredis.aioredis as faker
+    except Exception:
+        pytest.skip('fakeredis not installed')
+
+    redis = faker.FakeRedis()
+    writer, reader = ToolResultCache(), ToolResultCache()
+    writer._redis = reader._redis = redis
+
+    await writer.set("obtener_cliente", {"user_id": "1"}, None, {"id": 3}, ttl=60)
+    assert await reader.get("obtener_cliente", {"user_id": "1"}, None) == {"id": 3}
+
+    await writer.invalidate("obtener_cliente")
+    reader.clear()
+    assert await reader.get("obtener_cliente", {"user_id": "1"}, None) is MISS
+
+
+@pytest.mark.asyncio
+async def test_invalidate_endpoint_accepts_business_events(monkeypatch):
+    cache = ToolResultCache()
+    monkeypatch.setattr(tool_cache, "_default_cache", cache)
+    await cache.set("buscar_productos", {}, None, [1], ttl=60)
+
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        resp = await ac.post(
+            "/api/tools/cache/invalidate",
+            json={"event_type": "servicio.updated", "data": {"id": 1}},
+            headers={"Authorization": "ApiKey dev-secret"},
+        )
+
+    assert resp.status_code == 200
+    assert resp.json() == {"invalidated": ["buscar_productos"]}
+    assert await cache.get("buscar_productos", {}, None) is MISS
@@ -0,0 +1,92 @@
+import asyncio
+
+import pytest
+
+from app import http_pool, tasks
+from app.config import settings
+from app.tools import ToolClient, ToolRegistry
+
+
+class DummyResponse:
+    status_code = 200
+    text = "{}"
+
+    def __init__(self, json_data):
+        self._json = json_data
+
+    def json(self):
+        return self._json
+
+
+class RecordingClient:
+    """Pooled client stub recording the client options and every request."""
+
+    instances = []
+
+    def __init__(self, *args, **kwargs):
+        self.kwargs = kwargs
+        self.requests = []
+        self.closed = False
+        RecordingClient.instances.append(self)
+
+    async def request(self, method, url, **kwargs):
+        self.requests.append((method, url, kwargs))
+        return DummyResponse({"ok": True})
+
+    async def aclose(self):
+        self.closed = True
+
+
+@pytest.fixture
+def recording_client(monkeypatch):
+    RecordingClient.instances = []
+    monkeypatch.setattr("httpx.AsyncClient", RecordingClient)
+    return RecordingClient
+
+
+@pytest.mark.asyncio
+async def test_tool_clients_share_one_pooled_client_per_loop(recording_client, monkeypatch):
+    monkeypatch.setattr(settings, "TOOLS_HTTP_MAX_CONNECTIONS", 7)
+
+    await ToolClient(base_url="http://tools").call("buscar-productos", json={"q": "spa"})
+    await ToolClient(base_url="http://tools").call("crear-reserva", method="POST", json={"servicio_id": 1})
+
+    assert len(recording_client.instances) == 1
+    client = recording_client.instances[0]
+    assert client.kwargs["limits"].max_connections == 7
+    assert [(m, u) for m, u, _ in client.requests] == [
+        ("GET", "http://tools/buscar-productos/"),
+        ("POST", "http://tools/crear-reserva/"),
+    ]
+
+    await http_pool.aclose_all()
+    assert client.closed
+
+
+@pytest.mark.asyncio
+async def test_registry_applies_per_tool_timeouts(recording_client, monkeypatch):
+    monkeypatch.setattr(settings, "TOOLS_TIMEOUTS", {"ver_reserva": 5.0})
+    registry = ToolRegistry(ToolClient(base_url="http://tools"))
+
+    await registry.execute("resumen_ventas", {"start_date": "2026-01-01", "end_date": "2026-01-31"})
+    await registry.execute("ver_reserva", {"reserva_id": 3})
+    await registry.execute("buscar_productos", {})
+
+    timeouts = [kwargs.get("timeout") for _, _, kwargs in recording_client.instances[0].requests]
+    assert timeouts == [60.0, 5.0, None]
+
+
+def test_celery_tasks_reuse_the_worker_loop(recording_client, monkeypatch):
+    monkeypatch.setattr(tasks, "_worker_loop", None)
+
+    async def current_loop():
+        return asyncio.get_running_loop()
+
+    assert tasks.run_async(current_loop()) is tasks.run_async(current_loop())
+    tasks.run_async(ToolClient(base_url="http://tools").call("buscar-productos"))
+    tasks.run_async(ToolClient(base_url="http://tools").call("buscar-productos"))
+    assert len(recording_client.instances) == 1
+
+    tasks.close_worker_loop()
+    assert recording_client.instances[0].closed
+    assert tasks._worker_loop.is_closed()
@@ -5,6 +5,7 @@ from .models import (
 )
 from .models.partner import Partner, WebhookSubscription, WebhookDelivery, WebhookEventLog
 from .models.payment_transaction import PaymentTransaction
+from .models.outbox import OutboxEvent
 
 
 # ============================================================================
@@ -114,7 +115,7 @@ class WebhookDeliveryAdmin(admin.ModelAdmin):
     list_display = ['id', 'partner', 'event_type', 'status', 'response_code', 'attempts', 'created_at']
     search_fields = ['partner__name', 'event_type']
     list_filter = ['status', 'event_type', 'created_at']
-    readonly_fields = ['payload', 'response_body', 'created_at', 'delivered_at']
+    readonly_fields = ['payload', 'body', 'signature', 'response_body', 'created_at', 'delivered_at']
 
 
 @admin.register(WebhookEventLog)
@@ -131,3 +132,11 @@ class PaymentTransactionAdmin(admin.ModelAdmin):
     search_fields = ['reference_id', 'reserva__id']
     list_filter = ['provider', 'status', 'created_at']
     readonly_fields = ['reference_id', 'created_at', 'updated_at', 'completed_at']
+
+
+@admin.register(OutboxEvent)
+class OutboxEventAdmin(admin.ModelAdmin):
+    list_display = ['id', 'destination', 'event_type', 'status', 'attempts', 'available_at', 'created_at']
+    search_fields = ['event_type']
+    list_filter = ['destination', 'status', 'created_at']
+    readonly_fields = ['payload', 'last_error', 'created_at', 'sent_at']
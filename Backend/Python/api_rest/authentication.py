@@ -1,11 +1,81 @@
 import os
 import jwt
+import time
+import hashlib
 import logging
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from cryptography.hazmat.primitives.serialization import load_pem_public_key
+from django.conf import settings
 from rest_framework.authentication import BaseAuthentication
 from rest_framework.exceptions import AuthenticationFailed
 
 logger = logging.getLogger(__name__)
 
+
+@lru_cache(maxsize=4)
+def _load_public_key(raw_key):
+    """Parsea una sola vez el PEM de JWT_PUBLIC_KEY (con \\n literales) a un objeto de clave."""
+    return load_pem_public_key(raw_key.replace('\\n', '\n').encode())
+
+
+class VerifiedTokenCache:
+    """LRU acotado de tokens ya verificados -> payload.
+
+    Las claves son el SHA-256 del token (no se guarda el token en memoria) y cada entrada caduca
+    en el `exp` del token; los tokens sin `exp` no se cachean. Si cambia la clave pública la caché
+    se vacía, para no aceptar tokens verificados con la clave anterior.
+    """
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._key = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _digest(token):
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, public_key, token):
+        digest = self._digest(token)
+        with self._lock:
+            if public_key is not self._key:
+                self._entries.clear()
+                self._key = public_key
+                return None
+            entry = self._entries.get(digest)
+            if entry is None:
+                return None
+            exp, payload = entry
+            if exp <= time.time():
+                del self._entries[digest]
+                return None
+            self._entries.move_to_end(digest)
+            return dict(payload)
+
+    def set(self, public_key, token, payload):
+        exp = payload.get('exp')
+        if self.max_entries <= 0 or not isinstance(exp, (int, float)):
+            return
+        digest = self._digest(token)
+        with self._lock:
+            if public_key is not self._key:
+                self._entries.clear()
+                self._key = public_key
+            self._entries[digest] = (float(exp), dict(payload))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+verified_tokens = VerifiedTokenCache(getattr(settings, 'JWT_VERIFIED_TOKEN_CACHE_SIZE', 1024))
+
+
 class JWTAuthentication(BaseAuthentication):
     """
     Autenticación JWT local (RS256)
@@ -23,31 +93,35 @@ class JWTAuthentication(BaseAuthentication):
 
         token = auth_header.split(' ')[1]
 
-        public_key = os.environ.get('JWT_PUBLIC_KEY')
-        if not public_key:
+        raw_key = os.environ.get('JWT_PUBLIC_KEY')
+        if not raw_key:
             raise AuthenticationFailed('JWT_PUBLIC_KEY no configurada')
-        
-        # Reemplazar \n literal por saltos de línea reales (necesario para PEM)
-        public_key = public_key.replace('\\n', '\n')
-        
-        logger.info(f"Public key starts with: {public_key[:50]}...")
-        logger.info(f"Token (first 50 chars): {token[:50]}...")
 
         try:
-            payload = jwt.decode(
-                token,
-                public_key,
-                algorithms=['RS256'],
-                options={
-                    'require': ['sub']  # Solo requerir 'sub', exp/iat son opcionales
-                }
-            )
-            logger.info(f"Token decoded successfully. Payload keys: {list(payload.keys())}")
-        except jwt.ExpiredSignatureError:
-            raise AuthenticationFailed('Token expirado')
-        except jwt.InvalidTokenError as e:
-            logger.error(f"JWT decode error: {type(e).__name__}: {e}")
-            raise AuthenticationFailed(f'Token inválido: {type(e).__name__}')
+            public_key = _load_public_key(raw_key)
+        except ValueError as e:
+            logger.error('JWT_PUBLIC_KEY inválida: %s', e)
+            raise AuthenticationFailed('JWT_PUBLIC_KEY inválida')
+
+        # Camino rápido: token ya verificado y aún no expirado
+        payload = verified_tokens.get(public_key, token)
+        if payload is None:
+            try:
+                payload = jwt.decode(
+                    token,
+                    public_key,
+                    algorithms=['RS256'],
+                    options={
+                        'require': ['sub']  # Solo requerir 'sub', exp/iat son opcionales
+                    }
+                )
+            except jwt.ExpiredSignatureError:
+                raise AuthenticationFailed('Token expirado')
+            except jwt.InvalidTokenError as e:
+                logger.error('JWT decode error: %s: %s', type(e).__name__, e)
+                raise AuthenticationFailed(f'Token inválido: {type(e).__name__}')
+            verified_tokens.set(public_key, token, payload)
+            logger.debug('Token decoded successfully. Payload keys: %s', list(payload))
 
         # Guardamos el payload para usarlo en permisos / vistas
         request.jwt_payload = payload
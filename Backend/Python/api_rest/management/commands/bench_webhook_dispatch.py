@@ -0,0 +1,109 @@
+"""
+Comando bench_webhook_dispatch - Latencia de dispatch_event según el número de partners
+========================================================================================
+Pilar 2: Webhooks e Interoperabilidad B2B
+
+Crea partners de prueba suscritos a un evento, mide el tiempo y las queries de
+`webhook_dispatcher.dispatch_event` por evento y deshace todo al terminar
+(la base de datos queda igual). `--legacy` mide también el fan-out anterior,
+con dos INSERT por partner, para comparar.
+
+    python manage.py bench_webhook_dispatch --partners 1 10 50 200 --events 20 --legacy
+"""
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from api_rest.models import Partner, WebhookDelivery, WebhookEventLog, WebhookSubscription
+from api_rest.services.webhook_routes import subscription_routes
+from api_rest.services.webhooks import webhook_dispatcher
+
+EVENT_TYPE = 'booking.created'
+
+
+class Rollback(Exception):
+    pass
+
+
+def legacy_dispatch(event_type, data):
+    """Fan-out anterior: una entrega y un log por partner, fila a fila."""
+    subscriptions = WebhookSubscription.objects.filter(
+        event_type=event_type, is_active=True, partner__status='active'
+    ).select_related('partner')
+    if not subscriptions.exists():
+        return []
+    for subscription in subscriptions:
+        partner = subscription.partner
+        payload = webhook_dispatcher._build_payload(event_type, data, partner.code)
+        delivery = WebhookDelivery.objects.create(
+            partner=partner, event_type=event_type, payload=payload, status='pending'
+        )
+        WebhookEventLog.objects.create(
+            partner=partner, direction='outgoing', event_type=event_type, payload=payload,
+            headers={'X-Event-Type': event_type, 'X-Delivery-ID': str(delivery.id)},
+        )
+
+
+class Command(BaseCommand):
+    help = 'Mide la latencia por evento de dispatch_event a medida que crece el número de partners'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--partners', type=int, nargs='+', default=[1, 10, 50, 200],
+                            help='Números de partners suscritos a medir')
+        parser.add_argument('--events', type=int, default=20, help='Eventos despachados por medición')
+        parser.add_argument('--legacy', action='store_true', help='Medir también el fan-out fila a fila')
+
+    def handle(self, *args, **options):
+        variants = [('bulk', lambda data: webhook_dispatcher.dispatch_event(EVENT_TYPE, data))]
+        if options['legacy']:
+            variants.append(('legacy', lambda data: legacy_dispatch(EVENT_TYPE, data)))
+
+        self.stdout.write(f"{'partners':>8} {'variante':>8} {'media ms':>9} {'p95 ms':>8} {'queries':>8}")
+        for count in options['partners']:
+            for name, dispatch in variants:
+                timings, queries = self.measure(count, options['events'], dispatch)
+                p95 = sorted(timings)[max(0, int(len(timings) * 0.95) - 1)]
+                self.stdout.write(
+                    f"{count:>8} {name:>8} {statistics.mean(timings):>9.2f} {p95:>8.2f} {queries:>8}"
+                )
+
+    def measure(self, partner_count, events, dispatch):
+        """Devuelve los ms de cada evento y las queries por evento."""
+        timings = []
+        queries = [0]
+
+        def count_queries(execute, sql, params, many, context):
+            queries[0] += 1
+            return execute(sql, params, many, context)
+
+        try:
+            with transaction.atomic():
+                Partner.objects.bulk_create([
+                    Partner(name=f'bench-{i}', code=f'bench-{i}', webhook_url='https://bench.invalid/hook',
+                            webhook_secret=f'{i:064d}', api_key=f'bench-{i:058d}')
+                    for i in range(partner_count)
+                ])
+                WebhookSubscription.objects.bulk_create([
+                    WebhookSubscription(partner=partner, event_type=EVENT_TYPE)
+                    for partner in Partner.objects.filter(code__startswith='bench-')
+                ])
+                # Sólo los partners de la prueba están suscritos durante la medición
+                WebhookSubscription.objects.filter(event_type=EVENT_TYPE).exclude(
+                    partner__code__startswith='bench-'
+                ).update(is_active=False)
+                # Los cambios en bloque no disparan signals
+                subscription_routes.invalidate()
+
+                with connection.execute_wrapper(count_queries):
+                    for i in range(events):
+                        start = time.perf_counter()
+                        dispatch({'reserva_id': i, 'estado': 'pendiente'})
+                        timings.append((time.perf_counter() - start) * 1000)
+                raise Rollback()
+        except Rollback:
+            pass
+        finally:
+            subscription_routes.invalidate()
+        return timings, queries[0] // events
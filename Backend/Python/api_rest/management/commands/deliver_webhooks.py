@@ -0,0 +1,49 @@
+"""
+Comando deliver_webhooks - Envía las entregas de webhooks B2B pendientes
+=========================================================================
+Pilar 2: Webhooks e Interoperabilidad B2B
+
+    python manage.py deliver_webhooks
+    python manage.py deliver_webhooks --once --batch-size 200 --concurrency 16 --per-partner-concurrency 4
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api_rest.services.webhook_worker import WebhookDeliveryWorker
+
+
+class Command(BaseCommand):
+    help = 'Envía en lotes concurrentes las entregas de webhooks B2B pendientes y reintentos vencidos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=settings.WEBHOOK_WORKER_BATCH_SIZE,
+                            help='Entregas reclamadas por lote')
+        parser.add_argument('--concurrency', type=int, default=settings.WEBHOOK_WORKER_CONCURRENCY,
+                            help='Envíos en paralelo dentro de un lote')
+        parser.add_argument('--per-partner-concurrency', type=int,
+                            default=settings.WEBHOOK_WORKER_PER_PARTNER_CONCURRENCY,
+                            help='Envíos simultáneos como mucho a un mismo partner')
+        parser.add_argument('--lease-seconds', type=int, default=settings.WEBHOOK_WORKER_LEASE_SECONDS,
+                            help='Tiempo que un lote reclamado queda reservado para este worker')
+        parser.add_argument('--poll-interval', type=float, default=1.0,
+                            help='Espera (segundos) cuando la cola está vacía')
+        parser.add_argument('--once', action='store_true',
+                            help='Drenar las entregas disponibles y terminar')
+
+    def handle(self, *args, **options):
+        worker = WebhookDeliveryWorker(
+            batch_size=options['batch_size'],
+            concurrency=options['concurrency'],
+            per_partner_concurrency=options['per_partner_concurrency'],
+            lease_seconds=options['lease_seconds'],
+        )
+        if not options['once']:
+            self.stdout.write('📤 Worker de webhooks iniciado (Ctrl+C para detener)')
+        try:
+            totals = worker.run(poll_interval=options['poll_interval'], once=options['once'])
+        except KeyboardInterrupt:
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Webhooks: {totals['delivered']} entregados, {totals['retrying']} reintentando, "
+            f"{totals['failed']} fallidos"
+        ))
@@ -0,0 +1,45 @@
+"""
+Comando dispatch_outbox - Envía los eventos pendientes de la outbox
+====================================================================
+Pilar 4: n8n - Event Bus
+
+    python manage.py dispatch_outbox
+    python manage.py dispatch_outbox --once --batch-size 500 --concurrency 16
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api_rest.services.outbox import OutboxDispatcher
+
+
+class Command(BaseCommand):
+    help = 'Envía en lotes los eventos de la outbox (WebSocket, Event Bus n8n y webhooks B2B)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=settings.OUTBOX_BATCH_SIZE,
+                            help='Eventos reclamados por lote')
+        parser.add_argument('--concurrency', type=int, default=settings.OUTBOX_CONCURRENCY,
+                            help='Envíos en paralelo dentro de un lote')
+        parser.add_argument('--lease-seconds', type=int, default=settings.OUTBOX_LEASE_SECONDS,
+                            help='Tiempo que un lote reclamado queda reservado para este proceso')
+        parser.add_argument('--poll-interval', type=float, default=1.0,
+                            help='Espera (segundos) cuando la cola está vacía')
+        parser.add_argument('--once', action='store_true',
+                            help='Drenar los eventos disponibles y terminar')
+
+    def handle(self, *args, **options):
+        dispatcher = OutboxDispatcher(
+            batch_size=options['batch_size'],
+            concurrency=options['concurrency'],
+            lease_seconds=options['lease_seconds'],
+        )
+        if not options['once']:
+            self.stdout.write('📤 Dispatcher de outbox iniciado (Ctrl+C para detener)')
+        try:
+            totals = dispatcher.run(poll_interval=options['poll_interval'], once=options['once'])
+        except KeyboardInterrupt:
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Outbox: {totals['sent']} enviados, {totals['retrying']} reintentando, "
+            f"{totals['failed']} fallidos"
+        ))
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.6 on 2026-10-17 02:10
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api_rest', '0008_alter_webhooksubscription_event_type'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutboxEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('destination', models.CharField(choices=[('websocket', 'WebSocket (NestJS)'), ('event_bus', 'Event Bus (n8n)'), ('b2b', 'Webhooks B2B')], max_length=20, verbose_name='Destino')),
+                ('event_type', models.CharField(max_length=50, verbose_name='Tipo de evento')),
+                ('payload', models.JSONField(verbose_name='Payload')),
+                ('status', models.CharField(choices=[('pending', 'Pendiente'), ('sent', 'Enviado'), ('failed', 'Fallido')], default='pending', max_length=20)),
+                ('attempts', models.IntegerField(default=0, verbose_name='Intentos realizados')),
+                ('max_attempts', models.IntegerField(default=5, verbose_name='Máximo de intentos')),
+                ('available_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Disponible desde')),
+                ('last_error', models.TextField(blank=True, null=True, verbose_name='Último error')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('sent_at', models.DateTimeField(blank=True, null=True, verbose_name='Fecha de envío')),
+            ],
+            options={
+                'verbose_name': 'Evento de Outbox',
+                'verbose_name_plural': 'Eventos de Outbox',
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['status', 'available_at'], name='api_rest_ou_status_4ecc0c_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.6 on 2026-10-17 02:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api_rest', '0009_outboxevent'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='webhookdelivery',
+            name='locked_until',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Reservada hasta'),
+        ),
+        migrations.AddIndex(
+            model_name='webhookdelivery',
+            index=models.Index(fields=['status', 'next_retry_at'], name='api_rest_we_status_cbe232_idx'),
+        ),
+    ]
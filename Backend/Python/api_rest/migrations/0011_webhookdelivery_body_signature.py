@@ -0,0 +1,23 @@
+# Generated by Django 5.2.6 on 2026-10-17 03:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api_rest', '0010_webhookdelivery_locked_until'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='webhookdelivery',
+            name='body',
+            field=models.TextField(blank=True, null=True, verbose_name='Body firmado'),
+        ),
+        migrations.AddField(
+            model_name='webhookdelivery',
+            name='signature',
+            field=models.CharField(blank=True, max_length=128, null=True, verbose_name='Firma HMAC'),
+        ),
+    ]
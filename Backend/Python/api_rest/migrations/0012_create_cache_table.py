@@ -0,0 +1,19 @@
+# Tabla de la caché 'shared' cuando usa la base de datos (settings.CACHES, DatabaseCache)
+
+from django.core.management import call_command
+from django.db import migrations
+
+
+def create_cache_table(apps, schema_editor):
+    call_command('createcachetable', database=schema_editor.connection.alias, verbosity=0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api_rest', '0011_webhookdelivery_body_signature'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_cache_table, migrations.RunPython.noop),
+    ]
@@ -17,3 +17,6 @@ from .tool_audit import ToolActionLog
 # Pilar 2: Webhooks B2B
 from .partner import Partner, WebhookSubscription, WebhookDelivery, WebhookEventLog
 from .payment_transaction import PaymentTransaction
+
+# Pilar 4: Transactional outbox para eventos salientes
+from .outbox import OutboxEvent
@@ -0,0 +1,76 @@
+"""
+Modelo OutboxEvent - Transactional Outbox
+==========================================
+Pilar 4: n8n - Event Bus
+
+Los signals ya no llaman por HTTP al servidor WebSocket, a n8n ni a los partners
+B2B dentro de la request: escriben un OutboxEvent en la misma transacción que el
+cambio que lo origina. El comando `python manage.py dispatch_outbox` drena la
+tabla en lotes, con concurrencia, reintentos y backoff exponencial.
+"""
+from django.db import models
+from django.utils import timezone
+
+
+class OutboxEvent(models.Model):
+    """
+    Evento pendiente de envío a un destino externo.
+    `available_at` indica cuándo puede reclamarse: el dispatcher lo adelanta
+    mientras lo procesa (lease) y lo retrasa tras un fallo (backoff).
+    """
+    DESTINOS = [
+        ('websocket', 'WebSocket (NestJS)'),
+        ('event_bus', 'Event Bus (n8n)'),
+        ('b2b', 'Webhooks B2B'),
+    ]
+
+    ESTADOS = [
+        ('pending', 'Pendiente'),
+        ('sent', 'Enviado'),
+        ('failed', 'Fallido'),
+    ]
+
+    # Backoff exponencial: 5s, 10s, 20s... con tope de 15 minutos
+    BACKOFF_BASE_SECONDS = 5
+    BACKOFF_MAX_SECONDS = 900
+
+    destination = models.CharField(max_length=20, choices=DESTINOS, verbose_name="Destino")
+    event_type = models.CharField(max_length=50, verbose_name="Tipo de evento")
+    payload = models.JSONField(verbose_name="Payload")
+
+    status = models.CharField(max_length=20, choices=ESTADOS, default='pending')
+    attempts = models.IntegerField(default=0, verbose_name="Intentos realizados")
+    max_attempts = models.IntegerField(default=5, verbose_name="Máximo de intentos")
+    available_at = models.DateTimeField(default=timezone.now, verbose_name="Disponible desde")
+    last_error = models.TextField(blank=True, null=True, verbose_name="Último error")
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(blank=True, null=True, verbose_name="Fecha de envío")
+
+    class Meta:
+        verbose_name = "Evento de Outbox"
+        verbose_name_plural = "Eventos de Outbox"
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['status', 'available_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.destination}/{self.event_type} - {self.status}"
+
+    def mark_as_sent(self):
+        """Marca el evento como enviado (no se guarda: el dispatcher escribe en lote)"""
+        self.status = 'sent'
+        self.attempts += 1
+        self.sent_at = timezone.now()
+        self.last_error = None
+
+    def mark_as_failed(self, error_message: str):
+        """Registra el fallo y programa el reintento con backoff, o lo da por fallido"""
+        self.attempts += 1
+        self.last_error = error_message[:1000]
+        if self.attempts >= self.max_attempts:
+            self.status = 'failed'
+        else:
+            delay = min(self.BACKOFF_BASE_SECONDS * 2 ** (self.attempts - 1), self.BACKOFF_MAX_SECONDS)
+            self.available_at = timezone.now() + timezone.timedelta(seconds=delay)
@@ -9,6 +9,7 @@ Este módulo implementa:
 - WebhookDelivery: Historial de entregas de webhooks
 - WebhookEventLog: Logs de eventos recibidos/enviados
 """
+import random
 import secrets
 import hashlib
 import hmac
@@ -160,6 +161,10 @@ class WebhookDelivery(models.Model):
         ('retrying', 'Reintentando'),
     ]
     
+    # Reintento exponencial: 1min, 5min, 15min (±20% para no reintentar en ráfaga)
+    RETRY_DELAYS = [60, 300, 900]
+    RETRY_JITTER = 0.2
+    
     partner = models.ForeignKey(
         Partner, 
         on_delete=models.CASCADE, 
@@ -167,6 +172,9 @@ class WebhookDelivery(models.Model):
     )
     event_type = models.CharField(max_length=50, verbose_name="Tipo de evento")
     payload = models.JSONField(verbose_name="Payload enviado")
+    # Bytes exactos que se envían y se firman (JSON canónico), reutilizados en los reintentos
+    body = models.TextField(blank=True, null=True, verbose_name="Body firmado")
+    signature = models.CharField(max_length=128, blank=True, null=True, verbose_name="Firma HMAC")
     
     # Estado de entrega
     status = models.CharField(max_length=20, choices=ESTADOS, default='pending')
@@ -178,6 +186,8 @@ class WebhookDelivery(models.Model):
     attempts = models.IntegerField(default=0, verbose_name="Intentos realizados")
     max_attempts = models.IntegerField(default=3, verbose_name="Máximo de intentos")
     next_retry_at = models.DateTimeField(blank=True, null=True, verbose_name="Próximo reintento")
+    # Mientras un worker la envía (status 'sent'), nadie más la reclama hasta esta fecha
+    locked_until = models.DateTimeField(blank=True, null=True, verbose_name="Reservada hasta")
     
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True)
@@ -187,20 +197,35 @@ class WebhookDelivery(models.Model):
         verbose_name = "Entrega de Webhook"
         verbose_name_plural = "Entregas de Webhooks"
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'next_retry_at']),
+        ]
     
     def __str__(self):
         return f"{self.partner.code}/{self.event_type} - {self.status}"
     
-    def mark_as_delivered(self, response_code: int, response_body: str = None):
+    def mark_as_delivered(self, response_code: int, response_body: str = None, save: bool = True):
         """Marca la entrega como exitosa"""
         self.status = 'delivered'
         self.response_code = response_code
         self.response_body = response_body
         self.delivered_at = timezone.now()
-        self.save()
+        self.locked_until = None
+        if save:
+            self.save()
+    
+    def mark_as_deferred(self, retry_at, reason: str, save: bool = True):
+        """Pospone la entrega sin contar un intento (no se llegó a enviar)"""
+        self.locked_until = None
+        self.status = 'retrying'
+        self.error_message = reason
+        self.next_retry_at = retry_at
+        if save:
+            self.save()
     
-    def mark_as_failed(self, error_message: str, response_code: int = None):
+    def mark_as_failed(self, error_message: str, response_code: int = None, save: bool = True):
         """Marca la entrega como fallida y programa reintento si aplica"""
+        self.locked_until = None
         self.attempts += 1
         self.error_message = error_message
         self.response_code = response_code
@@ -209,12 +234,12 @@ class WebhookDelivery(models.Model):
             self.status = 'failed'
         else:
             self.status = 'retrying'
-            # Reintento exponencial: 1min, 5min, 15min
-            delays = [60, 300, 900]
-            delay = delays[min(self.attempts - 1, len(delays) - 1)]
+            delay = self.RETRY_DELAYS[min(self.attempts - 1, len(self.RETRY_DELAYS) - 1)]
+            delay *= random.uniform(1 - self.RETRY_JITTER, 1 + self.RETRY_JITTER)
             self.next_retry_at = timezone.now() + timezone.timedelta(seconds=delay)
         
-        self.save()
+        if save:
+            self.save()
 
 
 class WebhookEventLog(models.Model):
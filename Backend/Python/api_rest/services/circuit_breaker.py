@@ -0,0 +1,189 @@
+"""
+Circuit Breaker por partner - Protección de los envíos de webhooks B2B
+========================================================================
+Pilar 2: Webhooks e Interoperabilidad B2B
+
+Un circuito por `Partner.code`:
+- closed: se envía normalmente; `failure_threshold` fallos consecutivos lo abren
+- open: no se hace ninguna petición al partner; las entregas pasan directamente
+  a 'retrying' hasta que termina la espera (`reset_seconds`)
+- half_open: pasada la espera se dejan pasar `half_open_probes` peticiones de
+  prueba; si una tiene éxito el circuito se cierra y si falla se vuelve a abrir
+
+Además de los fallos consecutivos se mide la latencia media (EWMA) de cada
+partner. El estado vive en la caché 'shared' (settings.CACHES: Redis o base de
+datos), compartida por `deliver_webhooks`, `dispatch_outbox` y el proceso web que
+sirve `GET /webhooks/b2b/deliveries`:
+- `<code>`: instante de apertura; si no existe el circuito está cerrado y
+  half_open se deduce de la hora (pasados `reset_seconds`)
+- `<code>:failures`: contador de fallos consecutivos (`cache.incr`)
+- `<code>:probe:<apertura>:<ventana>:<n>`: plazas de sonda, reservadas con
+  `cache.add` (atómico), así sólo un proceso envía cada sonda
+- `<code>:latency`: la EWMA se calcula en memoria de cada proceso y se publica
+  como mucho cada `latency_publish_seconds`
+
+Sólo se escribe cuando cambia el estado o el número de fallos: un envío correcto
+con el circuito cerrado es una lectura. `incr` es atómico con Redis; con la caché
+en base de datos dos procesos que fallan a la vez pueden contar un fallo de menos.
+"""
+import logging
+import threading
+import time
+from datetime import datetime, timezone as dt_timezone
+from typing import Any, Callable, Dict, Iterable, Optional
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.connection import ConnectionProxy
+
+logger = logging.getLogger(__name__)
+
+shared_cache = ConnectionProxy(caches, 'shared')
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class PartnerCircuitBreaker:
+    """
+    Circuit breaker de los webhooks salientes, por partner.
+
+    Uso:
+        if not circuit_breaker.allow(partner.code):
+            ...  # no enviar; reintentar en circuit_breaker.retry_at(partner.code)
+        circuit_breaker.record_success(partner.code, latency_ms)
+        circuit_breaker.record_failure(partner.code, latency_ms)
+    """
+
+    KEY_PREFIX = 'webhook_circuit:'
+    LATENCY_ALPHA = 0.2
+
+    def __init__(self, failure_threshold: int = 5, reset_seconds: int = 60, half_open_probes: int = 1,
+                 latency_publish_seconds: float = 30, clock: Callable[[], float] = time.time):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.half_open_probes = half_open_probes
+        self.latency_publish_seconds = latency_publish_seconds
+        self.clock = clock
+        # Latencia de este proceso: {code: (ewma, publicada_en)}
+        self._latency: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, code: str, *parts: Any) -> str:
+        return ':'.join([f"{self.KEY_PREFIX}{code}", *map(str, parts)])
+
+    def _is_waiting(self, opened_at: float, now: float) -> bool:
+        return now < opened_at + self.reset_seconds
+
+    def allow(self, code: str) -> bool:
+        """True si se puede enviar al partner ahora (circuito cerrado o sonda disponible)."""
+        opened_at = shared_cache.get(self._key(code))
+        if opened_at is None:
+            return True
+        now = self.clock()
+        if self._is_waiting(opened_at, now):
+            return False
+        # Cada `reset_seconds` hay plazas nuevas: sustituyen a sondas que nunca respondieron
+        window = int((now - opened_at) // self.reset_seconds)
+        return any(
+            shared_cache.add(self._key(code, 'probe', opened_at, window, n), now, timeout=2 * self.reset_seconds)
+            for n in range(self.half_open_probes)
+        )
+
+    def _update_latency(self, code: str, latency_ms: Optional[float]) -> None:
+        if latency_ms is None:
+            return
+        now = self.clock()
+        with self._lock:
+            value, published_at = self._latency.get(code, (None, None))
+            value = latency_ms if value is None else value + self.LATENCY_ALPHA * (latency_ms - value)
+            if published_at is None or now - published_at >= self.latency_publish_seconds:
+                published_at = now
+                shared_cache.set(self._key(code, 'latency'), value, timeout=None)
+            self._latency[code] = (value, published_at)
+
+    def record_success(self, code: str, latency_ms: Optional[float] = None) -> None:
+        """El partner respondió: se cierra el circuito y se reinician los fallos."""
+        self._update_latency(code, latency_ms)
+        keys = [self._key(code), self._key(code, 'failures')]
+        stored = shared_cache.get_many(keys)
+        if not any(stored.values()):
+            return
+        if stored.get(keys[0]) is not None:
+            logger.info("🟢 Circuito de %s cerrado", code)
+        shared_cache.delete_many(keys)
+
+    def _count_failure(self, code: str) -> int:
+        key = self._key(code, 'failures')
+        shared_cache.add(key, 0, timeout=None)
+        try:
+            return shared_cache.incr(key)
+        except ValueError:
+            # Un record_success lo borró entre add e incr
+            shared_cache.add(key, 1, timeout=None)
+            return 1
+
+    def record_failure(self, code: str, latency_ms: Optional[float] = None) -> None:
+        """Fallo de red o 5xx: suma un fallo y abre el circuito si corresponde."""
+        self._update_latency(code, latency_ms)
+        now = self.clock()
+        opened_at = shared_cache.get(self._key(code))
+        if opened_at is None:
+            failures = self._count_failure(code)
+            if failures >= self.failure_threshold and shared_cache.add(self._key(code), now, timeout=None):
+                logger.warning("🔴 Circuito de %s abierto tras %s fallos consecutivos", code, failures)
+        elif not self._is_waiting(opened_at, now):
+            # Falló la sonda: se vuelve a abrir
+            self._count_failure(code)
+            shared_cache.set(self._key(code), now, timeout=None)
+            logger.warning("🔴 Circuito de %s abierto de nuevo: falló la sonda", code)
+        # Abierto y en espera: respuestas tardías de envíos anteriores, no cambian nada
+
+    def retry_at(self, code: str) -> datetime:
+        """Cuándo tiene sentido volver a intentar una entrega rechazada por el circuito."""
+        opened_at = shared_cache.get(self._key(code))
+        now = self.clock()
+        until = now + self.reset_seconds
+        if opened_at is not None:
+            until = max(opened_at + self.reset_seconds, now)
+        return datetime.fromtimestamp(until, tz=dt_timezone.utc)
+
+    def states(self, codes: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """Estado de varios partners (una sola lectura de la caché)."""
+        codes = list(dict.fromkeys(codes))
+        stored = shared_cache.get_many(
+            [self._key(code, *part) for code in codes for part in ((), ('failures',), ('latency',))]
+        )
+        now = self.clock()
+        result = {}
+        for code in codes:
+            opened_at = stored.get(self._key(code))
+            latency = self._latency.get(code, (None, None))[0]
+            if latency is None:
+                latency = stored.get(self._key(code, 'latency'))
+            if opened_at is None:
+                state = CLOSED
+            else:
+                state = OPEN if self._is_waiting(opened_at, now) else HALF_OPEN
+            result[code] = {
+                'state': state,
+                'consecutive_failures': stored.get(self._key(code, 'failures'), 0),
+                'latency_ms': round(latency, 1) if latency is not None else None,
+                'retry_at': (
+                    datetime.fromtimestamp(opened_at + self.reset_seconds, tz=dt_timezone.utc)
+                    if opened_at is not None else None
+                ),
+            }
+        return result
+
+    def reset(self, code: str) -> None:
+        shared_cache.delete_many([self._key(code), self._key(code, 'failures'), self._key(code, 'latency')])
+        with self._lock:
+            self._latency.pop(code, None)
+
+
+circuit_breaker = PartnerCircuitBreaker(
+    failure_threshold=getattr(settings, 'WEBHOOK_CIRCUIT_FAILURE_THRESHOLD', 5),
+    reset_seconds=getattr(settings, 'WEBHOOK_CIRCUIT_RESET_SECONDS', 60),
+    half_open_probes=getattr(settings, 'WEBHOOK_CIRCUIT_HALF_OPEN_PROBES', 1),
+)
@@ -9,19 +9,203 @@ Este servicio proporciona una interfaz unificada para:
 2. Partner Handler: Webhooks del grupo partner
 3. MCP Input Handler: Mensajes de Telegram/Email/WhatsApp
 4. Scheduled Tasks: Tareas programadas
+
+Los eventos en modo async (`business-events`) no bloquean a quien los emite: se
+encolan en memoria (`EventBatcher`) y un hilo los envía a n8n en lotes.
+`dispatch_outbox` los envía con `submit`, que devuelve un Future resuelto cuando
+n8n acepta el lote, para marcar cada evento de la outbox sólo tras la confirmación.
 """
+import atexit
+import os
+import queue
+import threading
+import time
 import requests
 import json
 import hashlib
 import hmac
 import logging
-from typing import Dict, Any, Optional, List
+from concurrent.futures import Future
+from typing import Dict, Any, Optional, List, Tuple
 from datetime import datetime
 from django.conf import settings
 
+from .http_clients import http_clients
+
 logger = logging.getLogger(__name__)
 
 
+class EventBusError(Exception):
+    """n8n no aceptó el evento o su lote (o la cola estaba llena)."""
+
+
+class EventBatcher:
+    """
+    Cola acotada en memoria y un hilo que envía los eventos a un webhook de n8n
+    en lotes, con la session compartida de n8n (conexiones reutilizadas).
+    
+    - Backpressure: si la cola está llena, `submit` espera como mucho
+      `put_timeout` segundos y después descarta el evento (métrica `dropped`)
+    - Cada lote se envía como {'event_type': 'batch', 'count': n, 'events': [...]}
+      y se reintenta `max_retries` veces; si sigue fallando, sus eventos cuentan
+      como `failed`
+    - `close()` (registrado en atexit) envía lo que quede en la cola antes de salir
+    - `submit_acked` devuelve un Future que se resuelve cuando n8n acepta el lote
+      del evento, o falla con EventBusError
+    
+    Los eventos que no se pueden perder deben ir por la outbox, no por aquí.
+    """
+    
+    def __init__(
+        self,
+        url: str,
+        batch_size: int = 50,
+        flush_interval: float = 0.5,
+        max_queue: int = 1000,
+        put_timeout: float = 0.05,
+        timeout: float = 10,
+        max_retries: int = 2
+    ):
+        self.url = url
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self.metrics = {'enqueued': 0, 'dropped': 0, 'sent': 0, 'failed': 0, 'batches': 0, 'retries': 0}
+        self.last_error: Optional[str] = None
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self._atexit_registered = False
+    
+    def _count(self, metric: str, value: int = 1) -> None:
+        with self._lock:
+            self.metrics[metric] += value
+    
+    def _ensure_started(self) -> None:
+        with self._lock:
+            # Tras un fork (gunicorn) el hilo del proceso padre no existe en el hijo
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._stopping.clear()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='event-bus-flusher', daemon=True)
+            self._thread.start()
+            if not self._atexit_registered:
+                atexit.register(self.close)
+                self._atexit_registered = True
+    
+    def _put(self, event: Dict[str, Any], future: Optional[Future]) -> bool:
+        self._ensure_started()
+        try:
+            self.queue.put((event, future), timeout=self.put_timeout)
+        except queue.Full:
+            self._count('dropped')
+            logger.warning(f"⚠️ Cola del Event Bus llena ({self.queue.maxsize}), evento descartado: {self.url}")
+            return False
+        self._count('enqueued')
+        return True
+    
+    def submit(self, event: Dict[str, Any]) -> bool:
+        """Encola un evento. False si se descartó porque la cola está llena."""
+        return self._put(event, None)
+    
+    def submit_acked(self, event: Dict[str, Any]) -> Future:
+        """Encola un evento; el Future se resuelve cuando n8n acepta su lote."""
+        future: Future = Future()
+        if not self._put(event, future):
+            future.set_exception(EventBusError(f"Cola del Event Bus llena ({self.queue.maxsize})"))
+        return future
+    
+    def _next_batch(self) -> List[Tuple[Dict[str, Any], Optional[Future]]]:
+        """Espera el primer evento y junta hasta `batch_size` durante `flush_interval`."""
+        try:
+            batch = [self.queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = 0 if self._stopping.is_set() else deadline - time.monotonic()
+            try:
+                batch.append(self.queue.get(timeout=remaining) if remaining > 0 else self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+    
+    def _run(self) -> None:
+        while True:
+            batch = self._next_batch()
+            if batch:
+                error = self._flush(http_clients.session('n8n'), [event for event, _ in batch])
+                for _, future in batch:
+                    if future is not None:
+                        if error is None:
+                            future.set_result(True)
+                        else:
+                            future.set_exception(EventBusError(error))
+                    self.queue.task_done()
+            elif self._stopping.is_set():
+                return
+    
+    def _flush(self, session: requests.Session, batch: List[Dict[str, Any]]) -> Optional[str]:
+        """Envía un lote; devuelve el último error o None si n8n lo aceptó."""
+        timestamp = datetime.utcnow().isoformat() + 'Z'
+        payload = {'event_type': 'batch', 'timestamp': timestamp, 'count': len(batch), 'events': batch}
+        headers = {
+            'Content-Type': 'application/json',
+            'X-Event-Timestamp': timestamp,
+            'X-Event-Source': 'findyourwork-django',
+            'X-Event-ID': f"batch-{datetime.utcnow().timestamp()}",
+            'X-Event-Count': str(len(batch)),
+        }
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                self._count('retries')
+                if not self._stopping.is_set():
+                    time.sleep(min(0.5 * 2 ** (attempt - 1), 5))
+            try:
+                response = session.post(self.url, json=payload, headers=headers, timeout=self.timeout)
+                if response.status_code in [200, 201, 202]:
+                    with self._lock:
+                        self.metrics['sent'] += len(batch)
+                        self.metrics['batches'] += 1
+                    logger.debug(f"✅ Lote de {len(batch)} eventos enviado a n8n")
+                    return None
+                error = f"HTTP {response.status_code}: {response.text[:200]}"
+            except requests.exceptions.RequestException as e:
+                error = f"{type(e).__name__}: {e}"
+        self.last_error = error
+        self._count('failed', len(batch))
+        logger.error(f"❌ Lote de {len(batch)} eventos descartado tras {self.max_retries + 1} intentos: {error}")
+        return error
+    
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Espera a que la cola se vacíe. True si se vació a tiempo."""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            with self.queue.all_tasks_done:
+                if not self.queue.unfinished_tasks:
+                    return True
+            time.sleep(0.01)
+        return False
+    
+    def close(self, timeout: float = 5.0) -> None:
+        """Envía lo pendiente y detiene el hilo."""
+        self._stopping.set()
+        thread = self._thread
+        if thread is not None and thread.is_alive():
+            thread.join(timeout)
+    
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self.metrics)
+        stats.update(queue_depth=self.queue.qsize(), max_queue=self.queue.maxsize, last_error=self.last_error)
+        return stats
+
+
 class EventBusService:
     """
     Servicio para enviar eventos al Event Bus (n8n).
@@ -37,11 +221,71 @@ class EventBusService:
         event_bus.emit_mcp_message('telegram', 'Hola', 'user123')
     """
     
-    def __init__(self):
+    def __init__(self, batching: Optional[bool] = None):
+        """
+        Args:
+            batching: Si False, el modo async también envía en la llamada
+                (por defecto, EVENT_BUS_BATCHING)
+        """
         self.n8n_base_url = getattr(settings, 'N8N_WEBHOOK_URL', 'http://localhost:5678')
         self.timeout = getattr(settings, 'N8N_TIMEOUT', 10)
         self.partner_secret = getattr(settings, 'PARTNER_WEBHOOK_SECRET', '')
         self.enabled = getattr(settings, 'EVENT_BUS_ENABLED', True)
+        self.batching = getattr(settings, 'EVENT_BUS_BATCHING', True) if batching is None else batching
+        self._batchers: Dict[str, EventBatcher] = {}
+        self._batchers_lock = threading.Lock()
+    
+    def batcher(self, webhook_path: str) -> EventBatcher:
+        """Cola y hilo de envío en lotes para un webhook de n8n."""
+        with self._batchers_lock:
+            batcher = self._batchers.get(webhook_path)
+            if batcher is None:
+                batcher = EventBatcher(
+                    f"{self.n8n_base_url}/webhook/{webhook_path}",
+                    batch_size=getattr(settings, 'EVENT_BUS_BATCH_SIZE', 50),
+                    flush_interval=getattr(settings, 'EVENT_BUS_FLUSH_INTERVAL', 0.5),
+                    max_queue=getattr(settings, 'EVENT_BUS_MAX_QUEUE', 1000),
+                    put_timeout=getattr(settings, 'EVENT_BUS_PUT_TIMEOUT', 0.05),
+                    timeout=self.timeout,
+                )
+                self._batchers[webhook_path] = batcher
+            return batcher
+    
+    def submit(self, webhook_path: str, payload: Dict[str, Any]) -> Future:
+        """
+        Envía un evento como el modo async, pero devuelve un Future que se
+        resuelve cuando n8n acepta su lote (o falla con EventBusError).
+        Sin batching el evento se envía en la llamada.
+        """
+        if self.enabled and self.batching:
+            return self.batcher(webhook_path).submit_acked(payload)
+        future: Future = Future()
+        if self._send_to_n8n(webhook_path, payload):
+            future.set_result(True)
+        else:
+            future.set_exception(EventBusError('n8n no aceptó el evento'))
+        return future
+    
+    def business_event(self, event_type: str, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Payload de un evento de negocio (`business-events`)."""
+        return {
+            'event_type': event_type,
+            'timestamp': self._get_timestamp(),
+            'data': data
+        }
+    
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Métricas de las colas de envío en lotes, por webhook."""
+        with self._batchers_lock:
+            batchers = dict(self._batchers)
+        return {path: batcher.stats() for path, batcher in batchers.items()}
+    
+    def close(self, timeout: float = 5.0) -> None:
+        """Envía los eventos encolados y detiene los hilos de envío."""
+        with self._batchers_lock:
+            batchers = list(self._batchers.values())
+        for batcher in batchers:
+            batcher.close(timeout)
     
     def _get_timestamp(self) -> str:
         """Retorna timestamp ISO 8601 con zona horaria UTC"""
@@ -71,14 +315,18 @@ class EventBusService:
             webhook_path: Ruta del webhook (sin /webhook/)
             payload: Datos a enviar
             headers: Headers adicionales
-            async_mode: Si True, no espera respuesta
+            async_mode: Si True, encola el evento y lo envía un hilo en lotes
+                (los headers adicionales no se envían en este modo)
             
         Returns:
-            bool: True si se envió correctamente
+            bool: True si se envió correctamente (o se encoló, en modo async)
         """
         if not self.enabled:
             logger.debug(f"Event Bus deshabilitado. Evento ignorado: {webhook_path}")
             return True
+        
+        if async_mode and self.batching:
+            return self.batcher(webhook_path).submit(payload)
             
         try:
             url = f"{self.n8n_base_url}/webhook/{webhook_path}"
@@ -93,13 +341,11 @@ class EventBusService:
             if headers:
                 default_headers.update(headers)
             
-            timeout = 1 if async_mode else self.timeout
-            
-            response = requests.post(
+            response = http_clients.session('n8n').post(
                 url,
                 json=payload,
                 headers=default_headers,
-                timeout=timeout
+                timeout=self.timeout
             )
             
             if response.status_code in [200, 201, 202]:
@@ -112,9 +358,6 @@ class EventBusService:
                 return False
                 
         except requests.exceptions.Timeout:
-            if async_mode:
-                logger.debug(f"Evento enviado en modo async: {webhook_path}")
-                return True
             logger.error(f"❌ Timeout enviando evento a n8n: {webhook_path}")
             return False
         except requests.exceptions.ConnectionError:
@@ -478,3 +721,7 @@ class EventBusService:
 
 # Singleton instance
 event_bus = EventBusService()
+
+# Envío síncrono para los eventos que no van en lotes y dispatch_outbox necesita
+# confirmar en la llamada (pagos, cancelaciones)
+event_bus_blocking = EventBusService(batching=False)
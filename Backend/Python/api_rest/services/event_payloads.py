@@ -0,0 +1,221 @@
+"""
+Event Payloads - Payloads de eventos por modelo
+================================================
+Pilar 2: Webhooks B2B / Pilar 4: n8n - Event Bus
+
+Un builder por modelo que carga una sola vez los datos relacionados que
+necesita (con select_related / values) y expone los payloads de cada destino:
+- `realtime`: WebSocket y Event Bus (n8n)
+- `b2b`: webhooks a partners
+
+Los ids de las FK se leen de `<campo>_id` en lugar de cargar el objeto
+relacionado, así que construir los payloads cuesta a lo sumo una o dos queries
+sin importar cuántos servicios tenga una reserva.
+
+Uso:
+    payloads = ReservaEventPayloads(reserva)
+    notify_websocket('reservation_updated', payloads.realtime)
+    notify_b2b_partners('booking.confirmed', payloads.b2b)
+"""
+from functools import cached_property
+from typing import Any, Dict, List, Optional
+
+from ..models import Cliente, ReservaServicio
+
+
+def cliente_email(instance) -> Optional[str]:
+    """Email del cliente de `instance`; Cliente no lo guarda (vive en el Auth Service), así que no hay query."""
+    if not hasattr(Cliente, 'email'):
+        return None
+    return instance.cliente.email
+
+
+class ReservaEventPayloads:
+    """Payloads de una Reserva. Carga sus detalles con el servicio en una sola query."""
+
+    def __init__(self, reserva):
+        self.reserva = reserva
+
+    @cached_property
+    def detalles(self) -> List[ReservaServicio]:
+        return list(
+            ReservaServicio.objects.filter(reserva_id=self.reserva.id)
+            .select_related('servicio')
+            .order_by('id')
+        )
+
+    @cached_property
+    def realtime(self) -> Dict[str, Any]:
+        reserva = self.reserva
+        data = {
+            'id': reserva.id,
+            'cliente_id': reserva.cliente_id,
+            'cliente_email': cliente_email(reserva),
+            'estado': reserva.estado,
+            'total_estimado': str(reserva.total_estimado),
+            'fecha_creacion': str(reserva.created_at),
+        }
+        # Proveedor y nombre del primer servicio, si la reserva tiene servicios
+        if self.detalles:
+            primer_servicio = self.detalles[0].servicio
+            data['proveedor_id'] = primer_servicio.proveedor_id
+            data['servicio_nombre'] = primer_servicio.nombre_servicio
+        return data
+
+    @cached_property
+    def b2b(self) -> Dict[str, Any]:
+        reserva = self.reserva
+        data = {
+            'reserva_id': reserva.id,
+            'cliente_id': reserva.cliente_id,
+            'estado': reserva.estado,
+            'fecha': str(reserva.fecha),
+            'hora': str(reserva.hora),
+            'total_estimado': str(reserva.total_estimado),
+            'created_at': str(reserva.created_at),
+        }
+        if self.detalles:
+            data['servicios'] = [
+                {
+                    'servicio_id': detalle.servicio_id,
+                    'nombre': detalle.servicio.nombre_servicio,
+                    # ReservaServicio no tiene cantidad: cada detalle es una unidad
+                    'cantidad': getattr(detalle, 'cantidad', 1),
+                }
+                for detalle in self.detalles
+            ]
+        return data
+
+    @cached_property
+    def deleted(self) -> Dict[str, Any]:
+        return {
+            'id': self.reserva.id,
+            'cliente_id': self.reserva.cliente_id,
+            'estado': 'deleted',
+        }
+
+
+class PagoEventPayloads:
+    """Payloads de un Pago: su reserva (si no está cargada) y el proveedor en una query cada uno."""
+
+    def __init__(self, pago):
+        self.pago = pago
+
+    @cached_property
+    def proveedor_id(self) -> Optional[int]:
+        # Proveedor del primer servicio de la reserva, sin cargar servicio ni proveedor
+        return (
+            ReservaServicio.objects.filter(reserva_id=self.pago.reserva_id)
+            .order_by('id')
+            .values_list('servicio__proveedor_id', flat=True)
+            .first()
+        )
+
+    @cached_property
+    def realtime(self) -> Dict[str, Any]:
+        pago = self.pago
+        data = {
+            'id': pago.id,
+            'reserva_id': pago.reserva_id,
+            'monto': str(pago.monto),
+            'metodo': pago.metodo_pago,
+            'fecha': str(pago.fecha_pago),
+            'estado': getattr(pago, 'estado', 'completed'),
+            'cliente_id': pago.reserva.cliente_id,
+            'cliente_email': cliente_email(pago.reserva),
+        }
+        if self.proveedor_id is not None:
+            data['proveedor_id'] = self.proveedor_id
+        return data
+
+    @cached_property
+    def b2b(self) -> Dict[str, Any]:
+        pago = self.pago
+        return {
+            'pago_id': pago.id,
+            'reserva_id': pago.reserva_id,
+            'monto': str(pago.monto),
+            'metodo_pago': pago.metodo_pago,
+            'estado': pago.estado,
+            'referencia': pago.referencia,
+            'fecha_pago': str(pago.fecha_pago) if pago.fecha_pago else None,
+        }
+
+
+class ServicioEventPayloads:
+    """Payloads de un Servicio. Sólo usa columnas propias: no hace queries."""
+
+    def __init__(self, servicio):
+        self.servicio = servicio
+
+    @cached_property
+    def realtime(self) -> Dict[str, Any]:
+        servicio = self.servicio
+        return {
+            'id': servicio.id,
+            'nombre': servicio.nombre_servicio,
+            'proveedor_id': servicio.proveedor_id,
+            'precio': str(servicio.precio),
+            'duracion': str(servicio.duracion) if servicio.duracion else None,
+            'categoria_id': servicio.categoria_id,
+        }
+
+    @cached_property
+    def b2b(self) -> Dict[str, Any]:
+        servicio = self.servicio
+        return {
+            'servicio_id': servicio.id,
+            'nombre': servicio.nombre_servicio,
+            'proveedor_id': servicio.proveedor_id,
+            'precio': str(servicio.precio),
+            'categoria_id': servicio.categoria_id,
+        }
+
+    @cached_property
+    def deleted(self) -> Dict[str, Any]:
+        return {
+            'id': self.servicio.id,
+            'nombre': self.servicio.nombre_servicio,
+            'proveedor_id': self.servicio.proveedor_id,
+        }
+
+
+class ComentarioEventPayloads:
+    """Payloads de un Comentario: carga el servicio (si no está cargado) en una query."""
+
+    def __init__(self, comentario):
+        self.comentario = comentario
+
+    @cached_property
+    def realtime(self) -> Dict[str, Any]:
+        comentario = self.comentario
+        return {
+            'id': comentario.id,
+            'servicio_id': comentario.servicio_id,
+            'servicio_nombre': comentario.servicio.nombre_servicio,
+            'cliente_id': comentario.cliente_id,
+            'titulo': comentario.titulo,
+            'texto': comentario.texto,
+            'type': 'comment',
+            'proveedor_id': comentario.servicio.proveedor_id,
+        }
+
+
+class CalificacionEventPayloads:
+    """Payloads de una Calificacion: carga el servicio (si no está cargado) en una query."""
+
+    def __init__(self, calificacion):
+        self.calificacion = calificacion
+
+    @cached_property
+    def realtime(self) -> Dict[str, Any]:
+        calificacion = self.calificacion
+        return {
+            'id': calificacion.id,
+            'servicio_id': calificacion.servicio_id,
+            'servicio_nombre': calificacion.servicio.nombre_servicio,
+            'cliente_id': calificacion.cliente_id,
+            'puntuacion': calificacion.puntuacion,
+            'type': 'rating',
+            'proveedor_id': calificacion.servicio.proveedor_id,
+        }
@@ -0,0 +1,161 @@
+"""
+HTTP saliente - Sessions compartidas por destino
+=================================================
+
+Todas las llamadas HTTP que salen de Django (n8n, dashboard NestJS, partners B2B,
+AI Orchestrator, pasarelas de pago) usan una requests.Session por destino en
+lugar de `requests.post` suelto, que abre una conexión TCP/TLS nueva cada vez:
+
+- Pool de conexiones keep-alive por host (`pool_connections` hosts, hasta
+  `pool_maxsize` conexiones cada uno)
+- Reintentos con backoff: errores de conexión siempre (la petición no llegó a
+  salir); errores de lectura y 502/503/504 sólo en métodos idempotentes
+- Timeout por defecto del destino si la llamada no pasa uno
+- Latencia por destino (media, p50, p95, máximo y errores) en `stats()`
+
+La configuración está en settings.OUTBOUND_HTTP.
+
+Uso:
+    from api_rest.services.http_clients import http_clients
+
+    http_clients.session('n8n').post(url, json=payload)
+"""
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, Optional
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+DEFAULT_DESTINATION = {
+    'timeout': 10,
+    'pool_connections': 10,
+    'pool_maxsize': 10,
+    'retries': 1,
+    'backoff_factor': 0.2,
+}
+
+
+class LatencyStats:
+    """Latencias recientes (ms) y contadores de un destino"""
+
+    def __init__(self, window: int = 1000):
+        self._samples = deque(maxlen=window)
+        self.requests = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def record(self, elapsed_ms: float, error: bool = False) -> None:
+        with self._lock:
+            self.requests += 1
+            self.errors += int(error)
+            self._samples.append(elapsed_ms)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            samples = sorted(self._samples)
+            requests_count, errors = self.requests, self.errors
+        if not samples:
+            return {'requests': requests_count, 'errors': errors}
+
+        def percentile(p):
+            return round(samples[min(len(samples) - 1, int(len(samples) * p))], 1)
+
+        return {
+            'requests': requests_count,
+            'errors': errors,
+            'avg_ms': round(sum(samples) / len(samples), 1),
+            'p50_ms': percentile(0.5),
+            'p95_ms': percentile(0.95),
+            'max_ms': round(samples[-1], 1),
+        }
+
+
+class DestinationSession(requests.Session):
+    """Session de un destino: timeout por defecto y medición de cada petición"""
+
+    def __init__(self, destination: str, timeout: float, stats: LatencyStats):
+        super().__init__()
+        self.destination = destination
+        self.default_timeout = timeout
+        self.stats = stats
+
+    def request(self, method, url, *args, **kwargs):
+        if kwargs.get('timeout') is None:
+            kwargs['timeout'] = self.default_timeout
+        start = time.perf_counter()
+        try:
+            response = super().request(method, url, *args, **kwargs)
+        except requests.exceptions.RequestException:
+            self.stats.record((time.perf_counter() - start) * 1000, error=True)
+            raise
+        self.stats.record((time.perf_counter() - start) * 1000, error=response.status_code >= 500)
+        return response
+
+
+class HttpClients:
+    """
+    Registro de sessions por destino, creadas la primera vez que se piden.
+
+    Las sessions se comparten entre hilos; tras un fork (gunicorn) cada proceso
+    crea las suyas.
+    """
+
+    def __init__(self, destinations: Optional[Dict[str, Dict[str, Any]]] = None):
+        self.destinations = destinations or {}
+        self._sessions: Dict[str, DestinationSession] = {}
+        self._stats: Dict[str, LatencyStats] = {}
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+
+    def config(self, destination: str) -> Dict[str, Any]:
+        return {**DEFAULT_DESTINATION, **self.destinations.get(destination, {})}
+
+    def session(self, destination: str) -> DestinationSession:
+        """Session con pool de conexiones del destino ('n8n', 'partners', ...)."""
+        with self._lock:
+            if self._pid != os.getpid():
+                self._sessions.clear()
+                self._pid = os.getpid()
+            session = self._sessions.get(destination)
+            if session is None:
+                session = self._build(destination)
+                self._sessions[destination] = session
+            return session
+
+    def _build(self, destination: str) -> DestinationSession:
+        config = self.config(destination)
+        retry = Retry(
+            total=config['retries'],
+            backoff_factor=config['backoff_factor'],
+            status_forcelist=(502, 503, 504),
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(
+            pool_connections=config['pool_connections'],
+            pool_maxsize=config['pool_maxsize'],
+            max_retries=retry,
+        )
+        stats = self._stats.setdefault(destination, LatencyStats())
+        session = DestinationSession(destination, config['timeout'], stats)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Latencia y errores por destino desde que arrancó el proceso."""
+        with self._lock:
+            stats = dict(self._stats)
+        return {destination: item.snapshot() for destination, item in stats.items()}
+
+    def close(self) -> None:
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
+
+
+http_clients = HttpClients(getattr(settings, 'OUTBOUND_HTTP', {}))
@@ -0,0 +1,241 @@
+"""
+Outbox Service - Envío diferido de eventos salientes
+=====================================================
+Pilar 4: n8n - Event Bus
+
+Los signals encolan aquí sus notificaciones en lugar de hacer HTTP dentro de la
+request. Este módulo se encarga de:
+1. Escribir el OutboxEvent en la transacción en curso (`enqueue`)
+2. Reclamar lotes de eventos con SELECT ... FOR UPDATE SKIP LOCKED
+3. Enviarlos en paralelo al WebSocket, al Event Bus (n8n) o a los partners B2B;
+   los eventos de negocio de n8n van juntos en lotes por el EventBatcher
+4. Guardar el resultado en lote y reprogramar los fallos con backoff
+
+Uso:
+    python manage.py dispatch_outbox            # proceso continuo
+    python manage.py dispatch_outbox --once     # drena la cola y termina
+"""
+import json
+import logging
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Union
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from .http_clients import http_clients
+
+logger = logging.getLogger(__name__)
+
+
+class OutboxDeliveryError(Exception):
+    """El destino rechazó el evento; se reintentará con backoff."""
+
+
+def enqueue(destination: str, event_type: str, payload: Dict[str, Any]):
+    """
+    Registra un evento saliente en la outbox.
+
+    Se escribe con la conexión de la request, así que forma parte de la misma
+    transacción que el cambio que lo origina: si ésta hace rollback, el evento
+    tampoco existe.
+    """
+    from ..models import OutboxEvent
+
+    return OutboxEvent.objects.create(
+        destination=destination,
+        event_type=event_type,
+        payload=json.loads(json.dumps(payload, default=str)),
+        max_attempts=getattr(settings, 'OUTBOX_MAX_ATTEMPTS', 5),
+    )
+
+
+# ========================================
+# Envío por destino
+# ========================================
+
+def send_websocket(event) -> None:
+    """Envía el evento al servidor WebSocket de NestJS."""
+    response = http_clients.session('dashboard').post(settings.WEBSOCKET_SERVER_URL, json=event.payload)
+    if response.status_code != 200:
+        raise OutboxDeliveryError(f"HTTP {response.status_code}")
+
+
+# Eventos de la outbox que n8n recibe en 'business-events' (modo async del Event Bus)
+BUSINESS_EVENTS = {
+    'reservation_created': 'reserva.created',
+    'reservation_updated': 'reserva.updated',
+    'service_created': 'servicio.created',
+    'service_updated': 'servicio.updated',
+    'rating_created': 'review.created',
+    'comment_created': 'review.created',
+}
+
+
+def send_event_bus(event) -> Optional[Future]:
+    """
+    Envía el evento al Event Bus (n8n) con el método que le corresponde.
+
+    Pagos y cancelaciones usan el cliente síncrono. Los eventos de negocio se
+    encolan en el EventBatcher y se devuelve un Future que se resuelve cuando n8n
+    acepta su lote. En ambos casos el evento sólo se marca enviado si n8n lo aceptó.
+    """
+    from .event_bus import event_bus, event_bus_blocking
+
+    event_mapping = {
+        'reservation_deleted': event_bus_blocking.emit_reserva_cancelled,
+        'payment_created': event_bus_blocking.emit_payment_confirmed,
+        'payment_updated': event_bus_blocking.emit_payment_confirmed,
+    }
+
+    emit = event_mapping.get(event.event_type)
+    if emit is not None:
+        if not emit(event.payload):
+            raise OutboxDeliveryError('n8n no aceptó el evento')
+        return None
+
+    business_event = BUSINESS_EVENTS.get(event.event_type)
+    if business_event is not None:
+        payload = event_bus.business_event(business_event, event.payload)
+    else:
+        # Para eventos no mapeados, usar business-events genérico
+        payload = {'event_type': event.event_type, 'data': event.payload}
+    return event_bus.submit('business-events', payload)
+
+
+def send_b2b(event) -> None:
+    """Crea las entregas a los partners B2B suscritos; las envía el worker `deliver_webhooks`."""
+    from .webhooks import webhook_dispatcher
+
+    webhook_dispatcher.dispatch_event(event.event_type, event.payload)
+
+
+# Un sender termina el envío o devuelve un Future si la confirmación llega después
+SENDERS: Dict[str, Callable[[Any], Optional[Future]]] = {
+    'websocket': send_websocket,
+    'event_bus': send_event_bus,
+    'b2b': send_b2b,
+}
+
+
+# ========================================
+# Dispatcher
+# ========================================
+
+class OutboxDispatcher:
+    """
+    Drena la outbox en lotes.
+
+    Cada lote se reclama dentro de una transacción corta con
+    `select_for_update(skip_locked=True)` y se le asigna un lease (`available_at`
+    en el futuro), de modo que varios dispatchers pueden correr a la vez y un
+    proceso caído no deja eventos bloqueados. Los envíos se hacen en paralelo y
+    el resultado del lote se guarda con un único `bulk_update`; los eventos que
+    se confirman después (lotes de n8n) se esperan como mucho `lease_seconds`.
+    """
+
+    def __init__(self, batch_size: int = 100, concurrency: int = 8, lease_seconds: int = 60):
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.lease_seconds = lease_seconds
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def claim_batch(self) -> List[Any]:
+        """Reclama hasta `batch_size` eventos pendientes y disponibles."""
+        from ..models import OutboxEvent
+
+        now = timezone.now()
+        with transaction.atomic():
+            events = list(
+                OutboxEvent.objects.select_for_update(skip_locked=True)
+                .filter(status='pending', available_at__lte=now)
+                .order_by('id')[:self.batch_size]
+            )
+            if events:
+                OutboxEvent.objects.filter(id__in=[e.id for e in events]).update(
+                    available_at=now + timezone.timedelta(seconds=self.lease_seconds)
+                )
+        return events
+
+    def _deliver(self, event) -> Union[str, Future, None]:
+        """Envía un evento; devuelve el error, un Future pendiente o None si se entregó."""
+        try:
+            sender = SENDERS.get(event.destination)
+            if sender is None:
+                raise OutboxDeliveryError(f"Destino desconocido: {event.destination}")
+            result = sender(event)
+            return result if isinstance(result, Future) else None
+        except Exception as e:
+            return f"{type(e).__name__}: {e}"
+        finally:
+            if self.concurrency > 1:
+                # Los eventos B2B crean entregas desde el hilo del pool
+                close_old_connections()
+
+    def _wait(self, result: Union[str, Future, None]) -> Optional[str]:
+        if not isinstance(result, Future):
+            return result
+        try:
+            result.result(timeout=self.lease_seconds)
+            return None
+        except Exception as e:
+            return f"{type(e).__name__}: {e}"
+
+    def _map(self, events: List[Any]) -> List[Optional[str]]:
+        if self.concurrency <= 1:
+            results = [self._deliver(event) for event in events]
+        else:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='outbox')
+            results = list(self._executor.map(self._deliver, events))
+        # Todos los eventos en lotes ya están encolados: se esperan sus confirmaciones
+        return [self._wait(result) for result in results]
+
+    def dispatch_batch(self) -> Dict[str, int]:
+        """Reclama y envía un lote. Devuelve contadores del lote."""
+        from ..models import OutboxEvent
+
+        events = self.claim_batch()
+        stats = {'claimed': len(events), 'sent': 0, 'retrying': 0, 'failed': 0}
+        if not events:
+            return stats
+
+        for event, error in zip(events, self._map(events)):
+            if error is None:
+                event.mark_as_sent()
+                stats['sent'] += 1
+            else:
+                event.mark_as_failed(error)
+                stats['failed' if event.status == 'failed' else 'retrying'] += 1
+                logger.warning("Outbox %s/%s #%s falló (intento %s): %s",
+                               event.destination, event.event_type, event.id, event.attempts, error)
+
+        OutboxEvent.objects.bulk_update(
+            events, ['status', 'attempts', 'available_at', 'last_error', 'sent_at']
+        )
+        logger.debug("Outbox: lote procesado %s", stats)
+        return stats
+
+    def run(self, poll_interval: float = 1.0, once: bool = False) -> Dict[str, int]:
+        """
+        Procesa lotes hasta que se interrumpa el proceso.
+        Con `once` termina cuando no quedan eventos disponibles.
+        """
+        totals = {'claimed': 0, 'sent': 0, 'retrying': 0, 'failed': 0}
+        try:
+            while True:
+                stats = self.dispatch_batch()
+                for key, value in stats.items():
+                    totals[key] += value
+                if stats['claimed'] < self.batch_size:
+                    if once:
+                        return totals
+                    time.sleep(poll_interval)
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
@@ -398,6 +398,10 @@ class StripePaymentAdapter(PaymentProvider):
             try:
                 import stripe
                 stripe.api_key = self._secret_key
+                # Conexiones reutilizadas con el pool HTTP de pagos
+                from .http_clients import http_clients
+                requests_client = getattr(stripe, 'RequestsClient', None) or stripe.http_client.RequestsClient
+                stripe.default_http_client = requests_client(session=http_clients.session('payments'))
                 self._stripe = stripe
             except ImportError:
                 logger.warning("Stripe library no instalada. Ejecutar: pip install stripe")
@@ -0,0 +1,139 @@
+"""
+Tabla de rutas de webhooks - event_type -> partners suscritos
+==============================================================
+Pilar 2: Webhooks e Interoperabilidad B2B
+
+Las suscripciones cambian muy poco y se consultan en cada evento, así que cada
+proceso guarda en memoria, por tipo de evento, los partners activos suscritos
+(con su webhook_url y secret). Un evento sin suscriptores no hace ninguna query.
+
+Invalidación:
+- post_save / post_delete de Partner y WebhookSubscription vacían la tabla local
+  y cambian la versión guardada en la caché 'shared' (Redis o base de datos)
+- los demás procesos leen esa versión como mucho una vez cada `check_seconds` y
+  recargan si cambió; con la caché en la base de datos esa lectura es una query,
+  con Redis ninguna
+- además, una tabla con más de `max_age_seconds` se recarga siempre, por si se
+  perdió una invalidación
+
+Las operaciones en bloque (`update`, `bulk_create`) no disparan signals: después
+hay que llamar a `subscription_routes.invalidate()`.
+"""
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional, Tuple
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.connection import ConnectionProxy
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+
+# Visible para todos los procesos (settings.CACHES)
+shared_cache = ConnectionProxy(caches, 'shared')
+
+# Campos de Partner que no cambian las rutas (p. ej. la fecha de la última entrega)
+ROUTE_FIELDS = {'name', 'code', 'status', 'webhook_url', 'webhook_secret'}
+
+
+@dataclass(frozen=True)
+class Route:
+    """Partner suscrito, con lo necesario para crear y firmar sus entregas"""
+    partner_id: int
+    code: str
+    name: str
+    webhook_url: str
+    webhook_secret: str
+
+
+class SubscriptionRoutingTable:
+    """
+    Rutas por tipo de evento, cargadas con una sola query y compartidas por los
+    hilos del proceso.
+    """
+
+    VERSION_KEY = 'webhook_routes:version'
+
+    def __init__(self, check_seconds: float = 1.0, max_age_seconds: float = 60.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.check_seconds = check_seconds
+        self.max_age_seconds = max_age_seconds
+        self.clock = clock
+        self._routes: Optional[Dict[str, Tuple[Route, ...]]] = None
+        self._version = None
+        self._checked_at = 0.0
+        self._loaded_at = 0.0
+        # Cambia con cada invalidación local: una carga en curso no instala datos viejos
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def routes(self, event_type: str) -> Tuple[Route, ...]:
+        """Partners activos suscritos a `event_type` (tupla vacía si no hay)."""
+        return self._table().get(event_type, ())
+
+    def _table(self) -> Dict[str, Tuple[Route, ...]]:
+        now = self.clock()
+        with self._lock:
+            fresh = self._routes is not None and now - self._loaded_at < self.max_age_seconds
+            if fresh and now - self._checked_at < self.check_seconds:
+                return self._routes
+            generation = self._generation
+        version = shared_cache.get(self.VERSION_KEY)
+        with self._lock:
+            if fresh and version == self._version and generation == self._generation:
+                self._checked_at = now
+                return self._routes
+        return self._load(version, generation)
+
+    def _load(self, version, generation) -> Dict[str, Tuple[Route, ...]]:
+        from ..models import WebhookSubscription
+
+        table: Dict[str, list] = {}
+        subscriptions = WebhookSubscription.objects.filter(
+            is_active=True,
+            partner__status='active'
+        ).select_related('partner')
+        for subscription in subscriptions:
+            partner = subscription.partner
+            table.setdefault(subscription.event_type, []).append(Route(
+                partner_id=partner.id,
+                code=partner.code,
+                name=partner.name,
+                webhook_url=partner.webhook_url,
+                webhook_secret=partner.webhook_secret,
+            ))
+        routes = {event_type: tuple(items) for event_type, items in table.items()}
+        with self._lock:
+            if generation == self._generation:
+                self._routes = routes
+                self._version = version
+                self._checked_at = self._loaded_at = self.clock()
+        return routes
+
+    def invalidate(self) -> None:
+        """Descarta la tabla de este proceso y avisa a los demás con una versión nueva."""
+        with self._lock:
+            self._routes = None
+            self._generation += 1
+        shared_cache.set(self.VERSION_KEY, uuid.uuid4().hex, timeout=None)
+
+
+subscription_routes = SubscriptionRoutingTable(
+    check_seconds=getattr(settings, 'WEBHOOK_ROUTES_CHECK_SECONDS', 1.0),
+    max_age_seconds=getattr(settings, 'WEBHOOK_ROUTES_MAX_AGE_SECONDS', 60.0),
+)
+
+
+def _invalidate_routes(sender, **kwargs):
+    update_fields = kwargs.get('update_fields')
+    if sender._meta.model_name == 'partner' and update_fields and not ROUTE_FIELDS & set(update_fields):
+        return
+    subscription_routes.invalidate()
+    # Otra vez al confirmar, por si otro proceso recargó antes del COMMIT
+    transaction.on_commit(subscription_routes.invalidate)
+
+
+for _model in ('api_rest.Partner', 'api_rest.WebhookSubscription'):
+    post_save.connect(_invalidate_routes, sender=_model, dispatch_uid=f'webhook_routes_save_{_model}')
+    post_delete.connect(_invalidate_routes, sender=_model, dispatch_uid=f'webhook_routes_delete_{_model}')
@@ -0,0 +1,232 @@
+"""
+Webhook Delivery Worker - Cola durable de entregas B2B
+=======================================================
+Pilar 2: Webhooks e Interoperabilidad B2B
+
+Las entregas (WebhookDelivery) son la cola: `dispatch_event` las crea como
+'pending' y este worker:
+1. Reclama lotes con SELECT ... FOR UPDATE SKIP LOCKED y un lease (`locked_until`)
+2. Envía el lote en paralelo, con la session compartida de partners (un pool de
+   conexiones keep-alive por host, ver services/http_clients.py) y como mucho `per_partner_concurrency` envíos simultáneos a un mismo partner
+3. Guarda los resultados del lote con un único bulk_update
+
+`WebhookRetrySweeper` reutiliza el mismo worker para el barrido de reintentos
+bajo demanda (`webhook_dispatcher.retry_failed_deliveries`), con un número
+acotado de lotes y un informe de duración y backlog.
+
+Si un worker muere con entregas reclamadas, el lease vence y otro las reenvía
+(semántica at-least-once: los partners deben deduplicar por X-Delivery-ID).
+
+Uso:
+    python manage.py deliver_webhooks            # proceso continuo
+    python manage.py deliver_webhooks --once     # drena la cola y termina
+"""
+import logging
+import time
+from collections import Counter, defaultdict, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Dict, List, Optional
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from .http_clients import http_clients
+from .webhooks import DeliveryResult, webhook_dispatcher
+
+logger = logging.getLogger(__name__)
+
+
+class WebhookDeliveryWorker:
+    """
+    Envía las entregas de webhooks pendientes en lotes concurrentes.
+
+    Reclama las entregas 'pending', las 'retrying' cuyo reintento ya venció y las
+    'sent' cuyo lease expiró (worker caído). Mientras se envían quedan 'sent'.
+    """
+
+    FIELDS = [
+        'status', 'response_code', 'response_body', 'error_message',
+        'attempts', 'next_retry_at', 'delivered_at', 'locked_until',
+    ]
+
+    def __init__(self, batch_size: int = 50, concurrency: int = 8, lease_seconds: int = 120,
+                 dispatcher=None, per_partner_concurrency: Optional[int] = None):
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.lease_seconds = lease_seconds
+        # Un partner lento o caído no puede ocupar todos los hilos del lote
+        self.per_partner_concurrency = per_partner_concurrency or concurrency
+        self.dispatcher = dispatcher or webhook_dispatcher
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def due_deliveries(self, now=None):
+        """Entregas listas para enviarse."""
+        from ..models import WebhookDelivery
+
+        now = now or timezone.now()
+        return WebhookDelivery.objects.filter(
+            Q(status='pending')
+            | Q(status='retrying', next_retry_at__lte=now)
+            | Q(status='sent', locked_until__lte=now)
+        )
+
+    def claim_batch(self) -> List[Any]:
+        """Reclama hasta `batch_size` entregas y las marca 'sent' con un lease."""
+        from ..models import WebhookDelivery
+
+        now = timezone.now()
+        with transaction.atomic():
+            deliveries = list(
+                self.due_deliveries(now)
+                .select_for_update(skip_locked=True, of=('self',))
+                .select_related('partner')
+                .order_by('id')[:self.batch_size]
+            )
+            if deliveries:
+                locked_until = now + timezone.timedelta(seconds=self.lease_seconds)
+                WebhookDelivery.objects.filter(id__in=[d.id for d in deliveries]).update(
+                    status='sent', locked_until=locked_until
+                )
+        return deliveries
+
+    def _send(self, delivery) -> DeliveryResult:
+        # Los reintentos reenvían el body firmado guardado; el intento va en X-Delivery-Attempt
+        partner = delivery.partner
+        return self.dispatcher.post_webhook(
+            partner, delivery.payload, delivery, session=http_clients.session('partners')
+        )
+
+    def _map(self, deliveries: List[Any]) -> List[DeliveryResult]:
+        if self.concurrency <= 1:
+            return [self._send(delivery) for delivery in deliveries]
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='webhooks')
+
+        # Cola por partner; se envía la siguiente entrega de un partner cuando termina una suya
+        queues = defaultdict(deque)
+        for index, delivery in enumerate(deliveries):
+            queues[delivery.partner_id].append(index)
+        results: List[Optional[DeliveryResult]] = [None] * len(deliveries)
+        running = Counter()
+        in_flight = {}
+
+        def submit_ready():
+            for partner_id, queue in queues.items():
+                while queue and running[partner_id] < self.per_partner_concurrency:
+                    index = queue.popleft()
+                    future = self._executor.submit(self._send, deliveries[index])
+                    in_flight[future] = (index, partner_id)
+                    running[partner_id] += 1
+
+        submit_ready()
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                index, partner_id = in_flight.pop(future)
+                running[partner_id] -= 1
+                results[index] = future.result()
+            submit_ready()
+        return results
+
+    def process_batch(self) -> Dict[str, int]:
+        """Reclama, envía y guarda un lote. Devuelve contadores del lote."""
+        from ..models import Partner, WebhookDelivery
+
+        deliveries = self.claim_batch()
+        stats = {'claimed': len(deliveries), 'delivered': 0, 'retrying': 0, 'failed': 0}
+        if not deliveries:
+            return stats
+
+        delivered_partners = set()
+        for delivery, result in zip(deliveries, self._map(deliveries)):
+            self.dispatcher.apply_result(delivery, result, save=False)
+            if result.ok:
+                delivered_partners.add(delivery.partner_id)
+                stats['delivered'] += 1
+            else:
+                stats[delivery.status] += 1
+
+        with transaction.atomic():
+            WebhookDelivery.objects.bulk_update(deliveries, self.FIELDS + ['body', 'signature'])
+            if delivered_partners:
+                Partner.objects.filter(id__in=delivered_partners).update(last_webhook_at=timezone.now())
+        logger.debug("Webhooks: lote procesado %s", stats)
+        return stats
+
+    def run(self, poll_interval: float = 1.0, once: bool = False) -> Dict[str, int]:
+        """
+        Procesa lotes hasta que se interrumpa el proceso.
+        Con `once` termina cuando no quedan entregas disponibles.
+        """
+        totals = {'claimed': 0, 'delivered': 0, 'retrying': 0, 'failed': 0}
+        try:
+            while True:
+                stats = self.process_batch()
+                for key, value in stats.items():
+                    totals[key] += value
+                if stats['claimed'] < self.batch_size:
+                    if once:
+                        return totals
+                    time.sleep(poll_interval)
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+
+class WebhookRetrySweeper(WebhookDeliveryWorker):
+    """
+    Barrido de reintentos vencidos ('retrying' con next_retry_at pasado).
+
+    Procesa como mucho `max_batches` lotes para que una llamada desde la API
+    termine en un tiempo acotado; lo que quede lo recoge el siguiente barrido
+    o el worker `deliver_webhooks`.
+    """
+
+    def __init__(self, max_batches: int = 10, **kwargs):
+        super().__init__(**kwargs)
+        self.max_batches = max_batches
+
+    def due_deliveries(self, now=None):
+        from ..models import WebhookDelivery
+
+        return WebhookDelivery.objects.filter(status='retrying', next_retry_at__lte=now or timezone.now())
+
+    def backlog(self) -> Dict[str, int]:
+        """Entregas pendientes de envío: reintentos vencidos, programados y nuevas."""
+        from ..models import WebhookDelivery
+
+        now = timezone.now()
+        return WebhookDelivery.objects.aggregate(
+            due=Count('id', filter=Q(status='retrying', next_retry_at__lte=now)),
+            scheduled=Count('id', filter=Q(status='retrying', next_retry_at__gt=now)),
+            pending=Count('id', filter=Q(status='pending')),
+        )
+
+    def sweep(self) -> Dict[str, Any]:
+        """Reintenta hasta `max_batches` lotes y devuelve contadores, duración y backlog."""
+        start = time.perf_counter()
+        totals = {'claimed': 0, 'delivered': 0, 'retrying': 0, 'failed': 0}
+        batches = 0
+        try:
+            while batches < self.max_batches:
+                stats = self.process_batch()
+                batches += 1
+                for key, value in stats.items():
+                    totals[key] += value
+                if stats['claimed'] < self.batch_size:
+                    break
+        finally:
+            self.close()
+        report = {
+            **totals,
+            'batches': batches,
+            'duration_ms': round((time.perf_counter() - start) * 1000, 1),
+            'backlog': self.backlog(),
+        }
+        if totals['claimed']:
+            logger.info("🔄 Barrido de reintentos: %s", report)
+        return report
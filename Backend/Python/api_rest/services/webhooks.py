@@ -9,27 +9,60 @@ Este servicio se encarga de:
 3. Manejar reintentos en caso de fallo
 4. Registrar logs de entregas
 
+Las entregas quedan como WebhookDelivery 'pending' y las envía el worker
+`python manage.py deliver_webhooks` (ver services/webhook_worker.py), así que
+sobreviven a reinicios y escalan con el número de workers.
+
 Headers enviados:
 - X-Signature: sha256=<firma_hmac>
 - X-Timestamp: <timestamp_iso>
 - X-Event-Type: <tipo_de_evento>
 - X-Delivery-ID: <id_unico_entrega>
+- X-Delivery-Attempt: <numero_de_intento>
 - Content-Type: application/json
+
+El body se serializa una sola vez por entrega (JSON canónico: claves ordenadas,
+sin espacios) y la firma cubre exactamente esos bytes, que se guardan en
+`WebhookDelivery.body` y se reenvían tal cual en los reintentos. El partner
+verifica la firma sobre el body crudo que recibe.
+
+Los partners suscritos a cada evento salen de una tabla en memoria
+(services/webhook_routes.py) que se invalida al cambiar partners o suscripciones.
+
+Cada partner tiene un circuit breaker (services/circuit_breaker.py): si su
+endpoint acumula fallos, las entregas se posponen sin hacer la petición.
 """
 import json
 import hashlib
 import hmac
 import logging
+import time
 import requests
+from dataclasses import dataclass
 from datetime import datetime
 from typing import Dict, Any, List, Optional
-from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
 from django.utils import timezone
 from django.db import transaction
 
+from .circuit_breaker import circuit_breaker
+from .http_clients import http_clients
+from .webhook_routes import subscription_routes
+
 logger = logging.getLogger(__name__)
 
 
+@dataclass
+class DeliveryResult:
+    """Resultado de un envío HTTP, antes de guardarlo en el WebhookDelivery"""
+    ok: bool
+    response_code: Optional[int] = None
+    response_body: Optional[str] = None
+    error_message: Optional[str] = None
+    # Sin petición: el circuito del partner está abierto, reintentar a partir de esta fecha
+    deferred_until: Optional[datetime] = None
+
+
 class WebhookDispatcher:
     """
     Servicio para despachar webhooks a partners B2B.
@@ -44,15 +77,12 @@ class WebhookDispatcher:
         partners = webhook_dispatcher.get_subscribers('payment.success')
     """
     
-    def __init__(self, timeout: int = 10, max_workers: int = 5):
+    def __init__(self, timeout: int = 10):
         """
         Args:
             timeout: Timeout para las requests HTTP
-            max_workers: Número de workers para envíos paralelos
         """
         self.timeout = timeout
-        self.max_workers = max_workers
-        self._executor = ThreadPoolExecutor(max_workers=max_workers)
     
     def dispatch_event(
         self, 
@@ -66,65 +96,62 @@ class WebhookDispatcher:
         Args:
             event_type: Tipo de evento (ej: 'booking.confirmed')
             data: Datos del evento
-            async_mode: Si True, envía de forma asíncrona
+            async_mode: Si True, deja las entregas 'pending' para el worker
+                `deliver_webhooks`; si False, las envía en esta llamada
             
         Returns:
             Lista de partner_codes a los que se enviará
         """
-        from ..models import Partner, WebhookSubscription, WebhookDelivery, WebhookEventLog
+        from ..models import Partner, WebhookDelivery, WebhookEventLog
         
-        # Obtener partners suscritos a este evento
-        subscriptions = WebhookSubscription.objects.filter(
-            event_type=event_type,
-            is_active=True,
-            partner__status='active'
-        ).select_related('partner')
+        # Partners suscritos, desde la tabla de rutas en memoria
+        routes = subscription_routes.routes(event_type)
         
-        if not subscriptions.exists():
+        if not routes:
             logger.debug(f"No hay partners suscritos a '{event_type}'")
             return []
         
-        partner_codes = []
-        
-        for subscription in subscriptions:
-            partner = subscription.partner
-            partner_codes.append(partner.code)
-            
-            # Preparar payload con metadata
-            payload = self._build_payload(event_type, data, partner.code)
-            
-            # Crear registro de entrega
-            delivery = WebhookDelivery.objects.create(
-                partner=partner,
+        # Preparar todas las entregas (payload, body canónico y firma) antes de escribir
+        deliveries = []
+        for route in routes:
+            payload = self._build_payload(event_type, data, route.code)
+            body = self.serialize_payload(payload)
+            deliveries.append(WebhookDelivery(
+                partner_id=route.partner_id,
                 event_type=event_type,
                 payload=payload,
+                body=body,
+                signature=self._sign_body(body, route.webhook_secret),
                 status='pending'
-            )
-            
-            # Log del evento saliente
-            WebhookEventLog.objects.create(
-                partner=partner,
-                direction='outgoing',
-                event_type=event_type,
-                payload=payload,
-                headers={
-                    'X-Event-Type': event_type,
-                    'X-Delivery-ID': str(delivery.id),
-                }
-            )
-            
-            if async_mode:
-                # Envío asíncrono
-                self._executor.submit(
-                    self._send_webhook,
-                    partner,
-                    payload,
-                    delivery
+            ))
+        
+        # Entregas y logs salientes en dos INSERT, dentro de una transacción
+        with transaction.atomic():
+            WebhookDelivery.objects.bulk_create(deliveries)
+            WebhookEventLog.objects.bulk_create([
+                WebhookEventLog(
+                    partner_id=delivery.partner_id,
+                    direction='outgoing',
+                    event_type=event_type,
+                    payload=delivery.payload,
+                    signature=delivery.signature,
+                    headers={
+                        'X-Event-Type': event_type,
+                        'X-Delivery-ID': str(delivery.id),
+                    }
                 )
-            else:
-                # Envío síncrono
-                self._send_webhook(partner, payload, delivery)
+                for delivery in deliveries
+            ])
         
+        if not async_mode:
+            # Envío síncrono, una vez guardadas todas las entregas
+            partners = Partner.objects.in_bulk([route.partner_id for route in routes])
+            for delivery in deliveries:
+                partner = partners[delivery.partner_id]
+                delivery.partner = partner
+                self._send_webhook(partner, delivery.payload, delivery)
+        
+        partner_codes = [route.code for route in routes]
         logger.info(f"📤 Evento '{event_type}' despachado a {len(partner_codes)} partners")
         return partner_codes
     
@@ -147,25 +174,44 @@ class WebhookDispatcher:
             }
         }
     
-    def _sign_payload(self, payload: Dict[str, Any], secret: str) -> str:
+    @staticmethod
+    def serialize_payload(payload: Dict[str, Any]) -> str:
+        """JSON canónico del payload: es el body que se firma y se envía"""
+        return json.dumps(payload, sort_keys=True, separators=(',', ':'), default=str)
+    
+    def _sign_body(self, body: str, secret: str) -> str:
         """
-        Firma el payload con HMAC-SHA256.
+        Firma el body con HMAC-SHA256.
         
         Args:
-            payload: Payload a firmar
+            body: Body serializado, tal cual se envía
             secret: Secret del partner
             
         Returns:
             Firma en formato 'sha256=<hex>'
         """
-        payload_str = json.dumps(payload, sort_keys=True, default=str)
         signature = hmac.new(
             secret.encode('utf-8'),
-            payload_str.encode('utf-8'),
+            body.encode('utf-8'),
             hashlib.sha256
         ).hexdigest()
         return f"sha256={signature}"
     
+    def prepare_body(self, partner, payload: Dict[str, Any], delivery):
+        """
+        Devuelve el body y la firma de la entrega.
+        
+        Se calculan una sola vez y quedan en la entrega; los reintentos reenvían
+        los mismos bytes con la misma firma. Las entregas anteriores a este
+        campo se serializan aquí la primera vez.
+        """
+        if not delivery.body:
+            delivery.body = self.serialize_payload(payload)
+            delivery.signature = None
+        if not delivery.signature:
+            delivery.signature = self._sign_body(delivery.body, partner.webhook_secret)
+        return delivery.body, delivery.signature
+    
     def _send_webhook(
         self, 
         partner, 
@@ -173,7 +219,7 @@ class WebhookDispatcher:
         delivery
     ) -> bool:
         """
-        Envía el webhook a un partner específico.
+        Envía el webhook a un partner específico y guarda el resultado.
         
         Args:
             partner: Instancia del modelo Partner
@@ -183,11 +229,42 @@ class WebhookDispatcher:
         Returns:
             True si se envió correctamente
         """
-        from ..models import Partner
+        result = self.post_webhook(partner, payload, delivery)
+        self.apply_result(delivery, result)
+        if result.ok:
+            # Actualizar última entrega del partner
+            partner.last_webhook_at = timezone.now()
+            partner.save(update_fields=['last_webhook_at'])
+        return result.ok
+    
+    def post_webhook(
+        self,
+        partner,
+        payload: Dict[str, Any],
+        delivery,
+        session: Optional[requests.Session] = None
+    ) -> DeliveryResult:
+        """
+        Hace el POST firmado al partner sin tocar la base de datos.
         
+        Args:
+            partner: Instancia del modelo Partner
+            payload: Payload a enviar
+            delivery: Instancia del modelo WebhookDelivery
+            session: Session con pool de conexiones (por defecto, la de partners)
+        """
+        if not circuit_breaker.allow(partner.code):
+            logger.debug(f"⏸️ Circuito abierto para {partner.code}, entrega {delivery.id} pospuesta")
+            return DeliveryResult(
+                ok=False,
+                error_message=f"Circuit breaker abierto para {partner.code}",
+                deferred_until=circuit_breaker.retry_at(partner.code)
+            )
+        
+        start = time.perf_counter()
         try:
             timestamp = datetime.utcnow().isoformat() + 'Z'
-            signature = self._sign_payload(payload, partner.webhook_secret)
+            body, signature = self.prepare_body(partner, payload, delivery)
             
             headers = {
                 'Content-Type': 'application/json',
@@ -195,54 +272,72 @@ class WebhookDispatcher:
                 'X-Timestamp': timestamp,
                 'X-Event-Type': payload.get('event', ''),
                 'X-Delivery-ID': str(delivery.id),
+                'X-Delivery-Attempt': str(delivery.attempts + 1),
                 'X-Source': 'findyourwork',
                 'User-Agent': 'FindYourWork-Webhook/1.0',
             }
             
             logger.debug(f"📤 Enviando webhook a {partner.code}: {partner.webhook_url}")
             
-            response = requests.post(
+            response = (session or http_clients.session('partners')).post(
                 partner.webhook_url,
-                json=payload,
+                data=body.encode('utf-8'),
                 headers=headers,
                 timeout=self.timeout
             )
+            latency_ms = (time.perf_counter() - start) * 1000
+            
+            # Un 4xx indica que el endpoint responde; sólo 5xx y 429 cuentan para el circuito
+            if response.status_code >= 500 or response.status_code == 429:
+                circuit_breaker.record_failure(partner.code, latency_ms)
+            else:
+                circuit_breaker.record_success(partner.code, latency_ms)
             
-            # Actualizar estado de entrega
             if response.status_code in [200, 201, 202, 204]:
-                delivery.mark_as_delivered(
+                logger.info(f"✅ Webhook entregado a {partner.code}: {response.status_code}")
+                return DeliveryResult(
+                    ok=True,
                     response_code=response.status_code,
                     response_body=response.text[:1000]  # Limitar tamaño
                 )
-                
-                # Actualizar última entrega del partner
-                partner.last_webhook_at = timezone.now()
-                partner.save(update_fields=['last_webhook_at'])
-                
-                logger.info(f"✅ Webhook entregado a {partner.code}: {response.status_code}")
-                return True
-            else:
-                delivery.mark_as_failed(
-                    error_message=f"HTTP {response.status_code}: {response.text[:500]}",
-                    response_code=response.status_code
-                )
-                logger.warning(f"⚠️ Webhook rechazado por {partner.code}: {response.status_code}")
-                return False
+            logger.warning(f"⚠️ Webhook rechazado por {partner.code}: {response.status_code}")
+            return DeliveryResult(
+                ok=False,
+                response_code=response.status_code,
+                error_message=f"HTTP {response.status_code}: {response.text[:500]}"
+            )
                 
         except requests.exceptions.Timeout:
-            delivery.mark_as_failed(error_message="Timeout")
             logger.error(f"❌ Timeout enviando webhook a {partner.code}")
-            return False
+            circuit_breaker.record_failure(partner.code, (time.perf_counter() - start) * 1000)
+            return DeliveryResult(ok=False, error_message="Timeout")
             
         except requests.exceptions.ConnectionError as e:
-            delivery.mark_as_failed(error_message=f"Connection error: {str(e)}")
             logger.error(f"❌ Error de conexión a {partner.code}: {e}")
-            return False
+            circuit_breaker.record_failure(partner.code, (time.perf_counter() - start) * 1000)
+            return DeliveryResult(ok=False, error_message=f"Connection error: {str(e)}")
             
         except Exception as e:
-            delivery.mark_as_failed(error_message=str(e))
             logger.exception(f"❌ Error enviando webhook a {partner.code}: {e}")
-            return False
+            return DeliveryResult(ok=False, error_message=str(e))
+    
+    @staticmethod
+    def apply_result(delivery, result: DeliveryResult, save: bool = True):
+        """Actualiza el estado de la entrega con el resultado del envío"""
+        if result.deferred_until is not None:
+            delivery.mark_as_deferred(result.deferred_until, result.error_message, save=save)
+        elif result.ok:
+            delivery.mark_as_delivered(
+                response_code=result.response_code,
+                response_body=result.response_body,
+                save=save
+            )
+        else:
+            delivery.mark_as_failed(
+                error_message=result.error_message,
+                response_code=result.response_code,
+                save=save
+            )
     
     def get_subscribers(self, event_type: str) -> List[Dict[str, str]]:
         """
@@ -254,48 +349,37 @@ class WebhookDispatcher:
         Returns:
             Lista de diccionarios con info de partners
         """
-        from ..models import WebhookSubscription
-        
-        subscriptions = WebhookSubscription.objects.filter(
-            event_type=event_type,
-            is_active=True,
-            partner__status='active'
-        ).select_related('partner')
-        
         return [
             {
-                'partner_code': sub.partner.code,
-                'partner_name': sub.partner.name,
-                'webhook_url': sub.partner.webhook_url,
+                'partner_code': route.code,
+                'partner_name': route.name,
+                'webhook_url': route.webhook_url,
             }
-            for sub in subscriptions
+            for route in subscription_routes.routes(event_type)
         ]
     
-    def retry_failed_deliveries(self) -> int:
+    def retry_failed_deliveries(self) -> Dict[str, Any]:
         """
         Reintenta las entregas fallidas programadas.
         
+        Envía los reintentos vencidos en lotes concurrentes, con un tope de
+        envíos simultáneos por partner, y reenvía el mismo body y firma (el
+        número de intento va en X-Delivery-Attempt).
+        
         Returns:
-            Número de entregas reintentadas
+            Informe del barrido: contadores, lotes, duración (ms) y backlog
         """
-        from ..models import WebhookDelivery
-        
-        pending_retries = WebhookDelivery.objects.filter(
-            status='retrying',
-            next_retry_at__lte=timezone.now()
-        ).select_related('partner')
+        from .webhook_worker import WebhookRetrySweeper
         
-        count = 0
-        for delivery in pending_retries:
-            # Actualizar metadata con intento
-            delivery.payload['metadata']['delivery_attempt'] = delivery.attempts + 1
-            self._send_webhook(delivery.partner, delivery.payload, delivery)
-            count += 1
-        
-        if count > 0:
-            logger.info(f"🔄 Reintentadas {count} entregas fallidas")
-        
-        return count
+        sweeper = WebhookRetrySweeper(
+            batch_size=getattr(settings, 'WEBHOOK_WORKER_BATCH_SIZE', 50),
+            concurrency=getattr(settings, 'WEBHOOK_WORKER_CONCURRENCY', 8),
+            per_partner_concurrency=getattr(settings, 'WEBHOOK_WORKER_PER_PARTNER_CONCURRENCY', 2),
+            lease_seconds=getattr(settings, 'WEBHOOK_WORKER_LEASE_SECONDS', 120),
+            max_batches=getattr(settings, 'WEBHOOK_RETRY_MAX_BATCHES', 10),
+            dispatcher=self,
+        )
+        return sweeper.sweep()
     
     def verify_incoming_signature(
         self, 
@@ -0,0 +1,78 @@
+"""
+Tests para JWTAuthentication: clave pública parseada una vez y caché de tokens verificados
+"""
+import time
+from unittest.mock import patch
+
+import jwt
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from django.test import RequestFactory, SimpleTestCase
+from rest_framework.exceptions import AuthenticationFailed
+
+from api_rest.authentication import JWTAuthentication, verified_tokens
+
+
+def make_keypair():
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    pem = private_key.public_key().public_bytes(
+        serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+    ).decode()
+    # Igual que en el .env: saltos de línea escapados
+    return private_key, pem.replace('\n', '\\n')
+
+
+class JWTAuthenticationCacheTests(SimpleTestCase):
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.private_key, self.public_pem = make_keypair()
+        verified_tokens.clear()
+        env = patch.dict('os.environ', {'JWT_PUBLIC_KEY': self.public_pem})
+        env.start()
+        self.addCleanup(env.stop)
+
+    def authenticate(self, token):
+        request = self.factory.get('/', HTTP_AUTHORIZATION=f'Bearer {token}')
+        return JWTAuthentication().authenticate(request)
+
+    def make_token(self, private_key=None, **claims):
+        claims.setdefault('sub', '7')
+        return jwt.encode(claims, private_key or self.private_key, algorithm='RS256')
+
+    def test_verified_tokens_skip_decode_until_exp(self):
+        exp = int(time.time()) + 300
+        token = self.make_token(exp=exp)
+
+        with patch('api_rest.authentication.jwt.decode', wraps=jwt.decode) as decode:
+            _, payload = self.authenticate(token)
+            payload['sub'] = 'mutado'
+            _, payload = self.authenticate(token)
+            self.assertEqual(payload['sub'], '7')
+            self.assertEqual(decode.call_count, 1)
+
+            # Pasado el exp la entrada caduca y el token se vuelve a verificar
+            with patch('api_rest.authentication.time.time', return_value=exp + 1):
+                self.authenticate(token)
+            self.assertEqual(decode.call_count, 2)
+
+    def test_tokens_without_exp_and_forged_tokens_are_not_cached(self):
+        token = self.make_token()
+        with patch('api_rest.authentication.jwt.decode', wraps=jwt.decode) as decode:
+            self.authenticate(token)
+            self.authenticate(token)
+            self.assertEqual(decode.call_count, 2)
+
+        forged = self.make_token(private_key=make_keypair()[0], exp=int(time.time()) + 300)
+        for _ in range(2):
+            with self.assertRaises(AuthenticationFailed):
+                self.authenticate(forged)
+
+    def test_rotating_the_public_key_drops_cached_tokens(self):
+        token = self.make_token(exp=int(time.time()) + 300)
+        self.authenticate(token)
+
+        _, other_pem = make_keypair()
+        with patch.dict('os.environ', {'JWT_PUBLIC_KEY': other_pem}):
+            with self.assertRaises(AuthenticationFailed):
+                self.authenticate(token)
@@ -0,0 +1,172 @@
+"""
+Tests para el circuit breaker por partner de los webhooks salientes (Pilar 2)
+"""
+from unittest.mock import MagicMock, patch
+
+import requests
+from django.db import connection
+from django.test import TestCase
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from api_rest.models import Partner, WebhookDelivery
+from api_rest.services.circuit_breaker import PartnerCircuitBreaker, shared_cache
+from api_rest.services.webhook_worker import WebhookDeliveryWorker
+from api_rest.views.b2b_views import WebhookDeliveriesView
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+class PartnerCircuitBreakerTests(TestCase):
+
+    def setUp(self):
+        shared_cache.clear()
+        self.clock = FakeClock()
+        self.breaker = PartnerCircuitBreaker(failure_threshold=3, reset_seconds=30, clock=self.clock)
+
+    def test_opens_after_consecutive_failures(self):
+        self.breaker.record_failure('tours', 100)
+        self.breaker.record_failure('tours', 200)
+        self.breaker.record_success('tours', 50)
+        self.breaker.record_failure('tours')
+        self.breaker.record_failure('tours')
+        self.assertTrue(self.breaker.allow('tours'))
+
+        self.breaker.record_failure('tours')
+        self.assertFalse(self.breaker.allow('tours'))
+        self.assertTrue(self.breaker.allow('hotel'))
+
+        state = self.breaker.states(['tours'])['tours']
+        self.assertEqual(state['state'], 'open')
+        self.assertEqual(state['consecutive_failures'], 3)
+        self.assertEqual(state['latency_ms'], 106.0)  # EWMA de 100, 200 y 50
+        self.assertEqual(state['retry_at'].timestamp(), self.clock.now + 30)
+
+    def test_half_open_probe_closes_or_reopens(self):
+        for _ in range(3):
+            self.breaker.record_failure('tours')
+        self.clock.now += 30
+
+        self.assertTrue(self.breaker.allow('tours'))   # sonda
+        self.assertFalse(self.breaker.allow('tours'))  # sólo una a la vez
+        self.breaker.record_failure('tours')
+        self.assertEqual(self.breaker.states(['tours'])['tours']['state'], 'open')
+        self.assertFalse(self.breaker.allow('tours'))
+
+        self.clock.now += 30
+        self.assertTrue(self.breaker.allow('tours'))
+        self.breaker.record_success('tours', 20)
+        self.assertEqual(self.breaker.states(['tours'])['tours']['state'], 'closed')
+        self.assertTrue(self.breaker.allow('tours'))
+
+    def test_lost_probe_is_replaced_after_reset_seconds(self):
+        for _ in range(3):
+            self.breaker.record_failure('tours')
+        self.clock.now += 30
+        self.assertTrue(self.breaker.allow('tours'))
+        self.clock.now += 30
+        self.assertTrue(self.breaker.allow('tours'))
+
+    def test_only_state_changes_are_written(self):
+        self.breaker.record_success('tours', 40)
+        # Circuito cerrado y sin fallos: una lectura y ninguna escritura
+        with self.assertNumQueries(1):
+            self.breaker.record_success('tours', 40)
+        with self.assertNumQueries(1):
+            self.assertTrue(self.breaker.allow('tours'))
+
+        for _ in range(3):
+            self.breaker.record_failure('tours')
+        # Abierto y en espera: los fallos tardíos no escriben
+        with self.assertNumQueries(1):
+            self.breaker.record_failure('tours')
+        self.assertEqual(self.breaker.states(['tours'])['tours']['consecutive_failures'], 3)
+
+    def test_processes_share_the_probe(self):
+        other = PartnerCircuitBreaker(failure_threshold=3, reset_seconds=30, clock=self.clock)
+        for _ in range(3):
+            other.record_failure('tours')
+        self.clock.now += 30
+
+        self.assertTrue(self.breaker.allow('tours'))
+        self.assertFalse(other.allow('tours'))
+
+
+class CircuitBreakerDeliveryTests(TestCase):
+
+    def setUp(self):
+        shared_cache.clear()
+        self.partner = Partner.objects.create(name='caido', code='caido', webhook_url='https://caido.example.com/hook')
+        WebhookDelivery.objects.bulk_create([
+            WebhookDelivery(partner=self.partner, event_type='booking.created', payload={'event': 'booking.created'})
+            for _ in range(5)
+        ])
+        # webhooks y la vista usan la instancia del módulo
+        self.breaker = PartnerCircuitBreaker(failure_threshold=2, reset_seconds=60)
+        for module in ('api_rest.services.webhooks', 'api_rest.views.b2b_views'):
+            patcher = patch(f'{module}.circuit_breaker', self.breaker)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    @patch('requests.Session.post', side_effect=requests.exceptions.ConnectionError('refused'))
+    def test_open_circuit_defers_without_network(self, session_post):
+        totals = WebhookDeliveryWorker(concurrency=1).run(once=True)
+
+        self.assertEqual(session_post.call_count, 2)
+        self.assertEqual(totals['retrying'], 5)
+        deferred = WebhookDelivery.objects.filter(attempts=0)
+        self.assertEqual(deferred.count(), 3)
+        for delivery in deferred:
+            self.assertEqual(delivery.status, 'retrying')
+            self.assertIn('Circuit breaker', delivery.error_message)
+            self.assertIsNotNone(delivery.next_retry_at)
+
+    @patch('requests.Session.post', return_value=MagicMock(status_code=503, text='down'))
+    def test_deliveries_view_shows_circuit_state(self, session_post):
+        WebhookDeliveryWorker(concurrency=1).run(once=True)
+
+        request = APIRequestFactory().get('/webhooks/b2b/deliveries')
+        force_authenticate(request, user=MagicMock(is_staff=True))
+        response = WebhookDeliveriesView.as_view()(request)
+
+        self.assertEqual(response.status_code, 200)
+        circuit = response.data['circuits']['caido']
+        self.assertEqual(circuit['state'], 'open')
+        self.assertEqual(circuit['consecutive_failures'], 2)
+        self.assertIsNotNone(circuit['latency_ms'])
+
+
+class SharedCircuitStateTests(TestCase):
+    """El worker (deliver_webhooks) y la vista (proceso web) usan instancias distintas."""
+
+    def setUp(self):
+        shared_cache.clear()
+        self.partner = Partner.objects.create(name='caido', code='caido', webhook_url='https://caido.example.com/hook')
+
+    def test_view_reads_state_recorded_by_another_breaker(self):
+        worker_breaker = PartnerCircuitBreaker(failure_threshold=2, reset_seconds=60, latency_publish_seconds=0)
+        worker_breaker.record_failure('caido', 120)
+        worker_breaker.record_failure('caido', 80)
+
+        # El estado queda en la tabla de la caché compartida, no en memoria del proceso
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT COUNT(*) FROM django_cache WHERE cache_key = %s',
+                [shared_cache.make_key(worker_breaker._key('caido'))],
+            )
+            self.assertEqual(cursor.fetchone()[0], 1)
+
+        request = APIRequestFactory().get('/webhooks/b2b/deliveries', {'partner': 'caido'})
+        force_authenticate(request, user=MagicMock(is_staff=True))
+        response = WebhookDeliveriesView.as_view()(request)
+
+        self.assertEqual(response.status_code, 200)
+        circuit = response.data['circuits']['caido']
+        self.assertEqual(circuit['state'], 'open')
+        self.assertEqual(circuit['consecutive_failures'], 2)
+        self.assertEqual(circuit['latency_ms'], 112.0)
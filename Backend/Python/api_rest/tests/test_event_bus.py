@@ -0,0 +1,110 @@
+"""
+Tests para el envío en lotes del Event Bus (Pilar 4)
+"""
+import threading
+from unittest.mock import MagicMock, patch
+
+from django.test import SimpleTestCase
+
+from api_rest.services import outbox
+from api_rest.services.event_bus import EventBatcher, EventBusError, EventBusService
+
+
+def ok(*args, **kwargs):
+    return MagicMock(status_code=200, text='ok')
+
+
+class EventBatcherTests(SimpleTestCase):
+
+    def make_batcher(self, **kwargs):
+        options = {'batch_size': 2, 'flush_interval': 0.02, 'max_queue': 10, 'put_timeout': 0.01}
+        options.update(kwargs)
+        batcher = EventBatcher('http://n8n.test/webhook/business-events', **options)
+        self.addCleanup(batcher.close)
+        return batcher
+
+    @patch('requests.Session.post', side_effect=ok)
+    def test_events_are_sent_in_batches_and_flushed_on_close(self, session_post):
+        batcher = self.make_batcher()
+        for i in range(5):
+            self.assertTrue(batcher.submit({'event_type': 'reserva.created', 'data': {'id': i}}))
+        batcher.close()
+
+        sent = [event['data']['id'] for call in session_post.call_args_list for event in call.kwargs['json']['events']]
+        self.assertEqual(sent, [0, 1, 2, 3, 4])
+        self.assertTrue(all(len(call.kwargs['json']['events']) <= 2 for call in session_post.call_args_list))
+        self.assertEqual(session_post.call_args.args[0], 'http://n8n.test/webhook/business-events')
+        stats = batcher.stats()
+        self.assertEqual((stats['enqueued'], stats['sent'], stats['dropped'], stats['queue_depth']), (5, 5, 0, 0))
+
+    def test_full_queue_drops_events_without_blocking(self):
+        entered, release = threading.Event(), threading.Event()
+
+        def slow_post(*args, **kwargs):
+            entered.set()
+            release.wait(5)
+            return ok()
+
+        batcher = self.make_batcher(batch_size=1, max_queue=2)
+        with patch('requests.Session.post', side_effect=slow_post):
+            batcher.submit({'id': 1})
+            self.assertTrue(entered.wait(5))
+            results = [batcher.submit({'id': i}) for i in (2, 3, 4)]
+            release.set()
+            batcher.close()
+
+        self.assertEqual(results, [True, True, False])
+        stats = batcher.stats()
+        self.assertEqual((stats['enqueued'], stats['dropped'], stats['sent']), (3, 1, 3))
+
+    @patch('requests.Session.post', return_value=MagicMock(status_code=503, text='down'))
+    def test_failed_batches_are_retried_then_counted(self, session_post):
+        batcher = self.make_batcher(max_retries=1)
+        batcher.submit({'id': 1})
+        batcher.close()
+
+        self.assertEqual(session_post.call_count, 2)
+        stats = batcher.stats()
+        self.assertEqual((stats['failed'], stats['retries'], stats['sent']), (1, 1, 0))
+        self.assertIn('HTTP 503', stats['last_error'])
+
+    def test_acked_events_resolve_with_their_batch(self):
+        batcher = self.make_batcher(max_retries=0)
+        with patch('requests.Session.post', side_effect=ok):
+            sent = [batcher.submit_acked({'id': i}) for i in range(3)]
+            self.assertEqual([future.result(5) for future in sent], [True, True, True])
+
+        with patch('requests.Session.post', return_value=MagicMock(status_code=503, text='down')):
+            rejected = batcher.submit_acked({'id': 4})
+            with self.assertRaisesRegex(EventBusError, 'HTTP 503'):
+                rejected.result(5)
+
+
+class EventBusAsyncModeTests(SimpleTestCase):
+
+    def test_async_events_do_not_block_the_caller(self):
+        release = threading.Event()
+
+        def slow_post(*args, **kwargs):
+            release.wait(5)
+            return ok()
+
+        service = EventBusService(batching=True)
+        service.enabled = True
+        self.addCleanup(service.close)
+
+        with patch('requests.Session.post', side_effect=slow_post) as session_post:
+            # n8n todavía no responde y el emisor ya volvió
+            self.assertTrue(service.emit_reserva_created({'id': 1}))
+            release.set()
+            service.close()
+
+        self.assertEqual(session_post.call_args.kwargs['json']['events'][0]['event_type'], 'reserva.created')
+        self.assertEqual(service.stats()['business-events']['sent'], 1)
+
+    @patch('requests.Session.post', return_value=MagicMock(status_code=500, text='error'))
+    def test_outbox_payments_use_the_blocking_client(self, mock_post):
+        event = MagicMock(event_type='payment_created', payload={'id': 1})
+        with self.assertRaises(outbox.OutboxDeliveryError):
+            outbox.send_event_bus(event)
+        self.assertIn('payment-confirmed', mock_post.call_args.args[0])
@@ -0,0 +1,87 @@
+"""
+Tests para los builders de payloads de eventos: número de queries acotado
+"""
+from django.test import TestCase
+
+from api_rest import signals
+from api_rest.models import (
+    Categoria, Cliente, Comentario, Pago, Proveedor, Reserva, ReservaServicio, Servicio,
+)
+from api_rest.services.event_payloads import (
+    ComentarioEventPayloads, PagoEventPayloads, ReservaEventPayloads, ServicioEventPayloads,
+)
+
+
+class EventPayloadQueryTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        categoria = Categoria.objects.create(nombre="Cat")
+        cls.cliente = Cliente.objects.create(user_id="11111111-1111-1111-1111-111111111111", telefono="456")
+        cls.servicios = [
+            Servicio.objects.create(
+                nombre_servicio=f"Servicio {i}", precio=10 * (i + 1), categoria=categoria,
+                proveedor=Proveedor.objects.create(user_id=f"00000000-0000-0000-0000-00000000000{i}", telefono="1"),
+            )
+            for i in range(3)
+        ]
+        cls.reserva = Reserva.objects.create(
+            cliente=cls.cliente, fecha="2025-12-25", hora="10:00", estado="confirmada", total_estimado=60
+        )
+        for servicio in cls.servicios:
+            ReservaServicio.objects.create(reserva=cls.reserva, servicio=servicio)
+        cls.pago = Pago.objects.create(reserva=cls.reserva, metodo_pago="tarjeta", monto=60, estado="pagado")
+
+    def test_reserva_payloads_load_related_data_in_one_query(self):
+        reserva = Reserva.objects.get(pk=self.reserva.pk)
+
+        with self.assertNumQueries(1):
+            payloads = ReservaEventPayloads(reserva)
+            realtime, b2b = payloads.realtime, payloads.b2b
+
+        self.assertEqual(realtime['cliente_id'], self.cliente.id)
+        self.assertEqual(realtime['proveedor_id'], self.servicios[0].proveedor_id)
+        self.assertEqual(realtime['servicio_nombre'], "Servicio 0")
+        self.assertEqual(
+            [s['nombre'] for s in b2b['servicios']], ["Servicio 0", "Servicio 1", "Servicio 2"]
+        )
+
+    def test_reserva_signal_cost_does_not_grow_with_servicios(self):
+        def signal_queries():
+            reserva = Reserva.objects.get(pk=self.reserva.pk)
+            with self.assertNumQueries(4) as ctx:  # detalles + 3 inserts en la outbox
+                signals.reserva_saved(sender=Reserva, instance=reserva, created=True)
+            return len(ctx.captured_queries)
+
+        before = signal_queries()
+        ReservaServicio.objects.create(reserva=self.reserva, servicio=self.servicios[1])
+        self.assertEqual(signal_queries(), before)
+
+    def test_pago_payloads(self):
+        pago = Pago.objects.get(pk=self.pago.pk)
+        with self.assertNumQueries(2):  # reserva + proveedor del primer servicio
+            payloads = PagoEventPayloads(pago)
+            realtime, b2b = payloads.realtime, payloads.b2b
+
+        self.assertEqual(realtime['cliente_id'], self.cliente.id)
+        self.assertEqual(realtime['proveedor_id'], self.servicios[0].proveedor_id)
+        self.assertEqual(b2b['reserva_id'], self.reserva.id)
+
+        pago = Pago.objects.select_related('reserva').get(pk=self.pago.pk)
+        with self.assertNumQueries(1):
+            PagoEventPayloads(pago).realtime
+
+    def test_servicio_and_comentario_payloads(self):
+        servicio = Servicio.objects.get(pk=self.servicios[2].pk)
+        with self.assertNumQueries(0):
+            payloads = ServicioEventPayloads(servicio)
+            self.assertEqual(payloads.realtime['proveedor_id'], servicio.proveedor_id)
+            self.assertEqual(payloads.b2b['categoria_id'], servicio.categoria_id)
+
+        comentario = Comentario.objects.create(
+            cliente=self.cliente, servicio=self.servicios[1], titulo="Bien", texto="Muy bien"
+        )
+        comentario = Comentario.objects.get(pk=comentario.pk)
+        with self.assertNumQueries(1):
+            data = ComentarioEventPayloads(comentario).realtime
+        self.assertEqual(data['proveedor_id'], self.servicios[1].proveedor_id)
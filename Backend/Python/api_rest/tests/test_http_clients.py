@@ -0,0 +1,58 @@
+"""
+Tests para las sessions HTTP salientes compartidas por destino
+"""
+from unittest.mock import patch
+
+import requests
+from django.test import SimpleTestCase
+
+from api_rest.services.http_clients import HttpClients
+
+
+def fake_send(adapter, request, **kwargs):
+    response = requests.Response()
+    response.status_code = 503 if 'caido' in request.url else 200
+    response.request = request
+    response.url = request.url
+    return response
+
+
+class HttpClientsTests(SimpleTestCase):
+
+    def setUp(self):
+        self.clients = HttpClients({
+            'partners': {'timeout': 3, 'pool_maxsize': 8, 'retries': 0, 'pool_connections': 50},
+        })
+        self.addCleanup(self.clients.close)
+
+    def test_one_session_per_destination_with_pools_per_host(self):
+        session = self.clients.session('partners')
+        self.assertIs(self.clients.session('partners'), session)
+        self.assertIsNot(self.clients.session('n8n'), session)
+
+        adapter = session.get_adapter('https://partner.example.com/tours')
+        self.assertEqual(adapter._pool_maxsize, 8)
+        self.assertEqual(adapter.max_retries.total, 0)
+        pool = adapter.poolmanager.connection_from_url('https://partner.example.com/tours')
+        self.assertIs(adapter.poolmanager.connection_from_url('https://partner.example.com/hotel'), pool)
+        self.assertIsNot(adapter.poolmanager.connection_from_url('https://caido.example.com/hook'), pool)
+
+        # Sin configuración propia, valores por defecto
+        self.assertEqual(self.clients.session('n8n').get_adapter('http://n8n:5678').max_retries.total, 1)
+
+    def test_default_timeout_and_latency_stats(self):
+        session = self.clients.session('partners')
+        with patch('requests.adapters.HTTPAdapter.send', autospec=True, side_effect=fake_send) as send:
+            session.post('https://partner.example.com/tours', json={'a': 1})
+            session.post('https://caido.example.com/hook', json={'a': 1}, timeout=1)
+            with patch.object(requests.adapters.HTTPAdapter, 'send',
+                              side_effect=requests.exceptions.ConnectionError('refused')):
+                with self.assertRaises(requests.exceptions.ConnectionError):
+                    session.post('https://caido.example.com/hook')
+
+        self.assertEqual([call.kwargs['timeout'] for call in send.call_args_list], [3, 1])
+        stats = self.clients.stats()['partners']
+        self.assertEqual((stats['requests'], stats['errors']), (3, 2))
+        self.assertLessEqual(stats['p50_ms'], stats['p95_ms'])
+        self.assertLessEqual(stats['p95_ms'], stats['max_ms'])
+        self.assertEqual(self.clients.stats().keys(), {'partners'})
@@ -2,7 +2,7 @@ from django.test import TestCase
 from rest_framework.test import APITestCase
 from rest_framework import status
 from django.contrib.auth.models import User
-from . import models
+from api_rest import models
 from django.core.files.uploadedfile import SimpleUploadedFile
 
 
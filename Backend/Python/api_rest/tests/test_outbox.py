@@ -0,0 +1,145 @@
+"""
+Tests para la outbox transaccional de eventos salientes (Pilar 4)
+"""
+from unittest.mock import MagicMock, patch
+
+from django.db import transaction
+from django.test import TestCase
+from django.utils import timezone
+
+import api_rest.signals  # noqa: F401  (conecta los receivers)
+from api_rest.models import Cliente, OutboxEvent, Reserva
+from api_rest.services import outbox
+from api_rest.services.event_bus import EventBusService
+from api_rest.services.outbox import OutboxDispatcher
+
+
+class OutboxEnqueueTests(TestCase):
+
+    def setUp(self):
+        self.cliente = Cliente.objects.create(user_id="11111111-1111-1111-1111-111111111111", telefono="456")
+
+    def crear_reserva(self):
+        return Reserva.objects.create(
+            cliente=self.cliente, fecha="2025-12-25", hora="10:00", estado="pendiente", total_estimado=100.00
+        )
+
+    @patch('requests.Session.post')
+    def test_saving_a_reserva_writes_outbox_rows_without_http(self, mock_post):
+        reserva = self.crear_reserva()
+
+        mock_post.assert_not_called()
+        events = list(OutboxEvent.objects.values_list('destination', 'event_type'))
+        self.assertEqual(events, [
+            ('websocket', 'reservation_created'),
+            ('event_bus', 'reservation_created'),
+            ('b2b', 'booking.created'),
+        ])
+        websocket = OutboxEvent.objects.get(destination='websocket')
+        self.assertEqual(websocket.payload['data']['id'], reserva.id)
+        self.assertEqual(websocket.payload['data']['total_estimado'], '100.0')
+        self.assertEqual(websocket.status, 'pending')
+
+    def test_rolled_back_changes_leave_no_events(self):
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                self.crear_reserva()
+                raise RuntimeError('rollback')
+
+        self.assertFalse(OutboxEvent.objects.exists())
+
+
+class OutboxDispatcherTests(TestCase):
+
+    def setUp(self):
+        self.websocket = MagicMock()
+        self.event_bus = MagicMock(side_effect=outbox.OutboxDeliveryError('n8n caído'))
+        senders = patch.dict(outbox.SENDERS, {'websocket': self.websocket, 'event_bus': self.event_bus})
+        senders.start()
+        self.addCleanup(senders.stop)
+
+    def test_batches_are_sent_and_failures_back_off(self):
+        for i in range(3):
+            outbox.enqueue('websocket', 'reservation_created', {'id': i})
+        outbox.enqueue('event_bus', 'reservation_created', {'id': 9})
+
+        dispatcher = OutboxDispatcher(batch_size=2, concurrency=1)
+        totals = dispatcher.run(once=True)
+
+        self.assertEqual(totals, {'claimed': 4, 'sent': 3, 'retrying': 1, 'failed': 0})
+        self.assertEqual(self.websocket.call_count, 3)
+        self.assertEqual(OutboxEvent.objects.filter(status='sent').count(), 3)
+
+        failed = OutboxEvent.objects.get(destination='event_bus')
+        self.assertEqual((failed.status, failed.attempts), ('pending', 1))
+        self.assertIn('n8n caído', failed.last_error)
+        self.assertGreater(failed.available_at, timezone.now())
+        # En backoff: no se vuelve a reclamar todavía
+        self.assertEqual(dispatcher.dispatch_batch()['claimed'], 0)
+
+    def test_events_fail_after_max_attempts(self):
+        event = outbox.enqueue('event_bus', 'service_updated', {'id': 1})
+        OutboxEvent.objects.filter(pk=event.pk).update(attempts=event.max_attempts - 1)
+
+        stats = OutboxDispatcher(concurrency=1).dispatch_batch()
+
+        self.assertEqual(stats['failed'], 1)
+        self.assertEqual(OutboxEvent.objects.get(pk=event.pk).status, 'failed')
+
+    def test_claimed_batches_are_leased(self):
+        outbox.enqueue('websocket', 'reservation_created', {'id': 1})
+        dispatcher = OutboxDispatcher(concurrency=1, lease_seconds=60)
+
+        self.assertEqual(len(dispatcher.claim_batch()), 1)
+        # Otro dispatcher no reclama el evento mientras dura el lease
+        self.assertEqual(dispatcher.claim_batch(), [])
+
+
+class OutboxEventBusBatchTests(TestCase):
+    """Los eventos de negocio de n8n salen juntos en lotes y se confirman por lote."""
+
+    def setUp(self):
+        self.service = EventBusService(batching=True)
+        self.service.enabled = True
+        self.service.batcher('business-events').max_retries = 0
+        self.addCleanup(self.service.close)
+        patcher = patch('api_rest.services.event_bus.event_bus', self.service)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        for i in range(3):
+            outbox.enqueue('event_bus', 'reservation_created', {'id': i})
+        outbox.enqueue('event_bus', 'rating_created', {'id': 3})
+        outbox.enqueue('event_bus', 'payment_created', {'id': 4})
+
+    def posts_to(self, session_post, path):
+        return [call for call in session_post.call_args_list if call.args[0].endswith(f'/webhook/{path}')]
+
+    @patch('requests.Session.post', return_value=MagicMock(status_code=200, text='ok'))
+    def test_business_events_are_sent_in_one_batch(self, session_post):
+        totals = OutboxDispatcher(concurrency=4).run(once=True)
+
+        self.assertEqual(totals['sent'], 5)
+        batches = self.posts_to(session_post, 'business-events')
+        self.assertEqual(len(batches), 1)
+        events = batches[0].kwargs['json']['events']
+        self.assertEqual(
+            sorted((e['event_type'], e['data']['id']) for e in events),
+            [('reserva.created', 0), ('reserva.created', 1), ('reserva.created', 2), ('review.created', 3)],
+        )
+        self.assertEqual(len(self.posts_to(session_post, 'payment-confirmed')), 1)
+        self.assertFalse(OutboxEvent.objects.exclude(status='sent').exists())
+
+    def test_rows_stay_pending_when_their_batch_fails(self):
+        def post(url, *args, **kwargs):
+            status = 503 if url.endswith('business-events') else 200
+            return MagicMock(status_code=status, text='down')
+
+        with patch('requests.Session.post', side_effect=post):
+            totals = OutboxDispatcher(concurrency=1).run(once=True)
+
+        self.assertEqual((totals['sent'], totals['retrying']), (1, 4))
+        self.assertEqual(OutboxEvent.objects.get(status='sent').event_type, 'payment_created')
+        for event in OutboxEvent.objects.filter(status='pending'):
+            self.assertEqual(event.attempts, 1)
+            self.assertIn('HTTP 503', event.last_error)
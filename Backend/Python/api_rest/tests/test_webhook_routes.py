@@ -0,0 +1,103 @@
+"""
+Tests para la tabla de rutas en memoria de los webhooks B2B (Pilar 2)
+"""
+from django.db import connection
+from django.test import TestCase
+
+from api_rest.models import Partner, WebhookDelivery, WebhookSubscription
+from api_rest.services.webhook_routes import SubscriptionRoutingTable, shared_cache, subscription_routes
+from api_rest.services.webhooks import webhook_dispatcher
+
+
+class SubscriptionRoutingTableTests(TestCase):
+
+    def setUp(self):
+        subscription_routes.invalidate()
+        self.partner = Partner.objects.create(name='Tours', code='tours', webhook_url='https://tours.example.com/hook')
+        WebhookSubscription.objects.create(partner=self.partner, event_type='booking.created')
+
+    def test_events_without_subscribers_cost_no_queries(self):
+        subscription_routes.routes('booking.created')  # carga la tabla
+
+        with self.assertNumQueries(0):
+            self.assertEqual(webhook_dispatcher.dispatch_event('payment.failed', {'pago_id': 1}), [])
+            self.assertEqual(webhook_dispatcher.get_subscribers('payment.failed'), [])
+            subscribers = webhook_dispatcher.get_subscribers('booking.created')
+
+        self.assertEqual(subscribers, [{
+            'partner_code': 'tours', 'partner_name': 'Tours', 'webhook_url': 'https://tours.example.com/hook',
+        }])
+
+    def test_signals_invalidate_the_table(self):
+        self.assertEqual(webhook_dispatcher.dispatch_event('booking.created', {'reserva_id': 1}), ['tours'])
+        delivery = WebhookDelivery.objects.get()
+        self.assertTrue(self.partner.verify_signature(delivery.body, delivery.signature))
+
+        self.partner.webhook_secret = 'rotado'
+        self.partner.save()
+        self.assertEqual(subscription_routes.routes('booking.created')[0].webhook_secret, 'rotado')
+
+        # La fecha de la última entrega no cambia las rutas
+        subscription_routes.routes('booking.created')
+        with self.assertNumQueries(1):
+            self.partner.save(update_fields=['last_webhook_at'])
+            subscription_routes.routes('booking.created')
+
+        WebhookSubscription.objects.create(partner=self.partner, event_type='payment.success')
+        self.assertEqual(len(subscription_routes.routes('payment.success')), 1)
+
+        self.partner.status = 'suspended'
+        self.partner.save()
+        self.assertEqual(subscription_routes.routes('booking.created'), ())
+
+        WebhookSubscription.objects.all().delete()
+        self.partner.status = 'active'
+        self.partner.save(update_fields=['status'])
+        self.assertEqual(webhook_dispatcher.dispatch_event('booking.created', {'reserva_id': 2}), [])
+
+    def _other_process(self):
+        """Tabla de otro proceso (dispatch_outbox), con su propio reloj."""
+        self.now = 1000.0
+        return SubscriptionRoutingTable(check_seconds=1, max_age_seconds=60, clock=lambda: self.now)
+
+    def test_other_processes_reload_when_a_partner_changes(self):
+        other = self._other_process()
+        old_secret = self.partner.webhook_secret
+        self.assertEqual(other.routes('booking.created')[0].webhook_secret, old_secret)
+        with self.assertNumQueries(0):
+            other.routes('booking.created')
+        # Pasado `check_seconds`: una lectura de la versión (una query con la caché en base de datos)
+        self.now += 1
+        with self.assertNumQueries(1):
+            other.routes('booking.created')
+
+        # El proceso web rota el secret: la versión nueva queda en la caché compartida
+        self.partner.webhook_secret = 'rotado'
+        self.partner.save()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT COUNT(*) FROM django_cache WHERE cache_key = %s',
+                [shared_cache.make_key(SubscriptionRoutingTable.VERSION_KEY)],
+            )
+            self.assertEqual(cursor.fetchone()[0], 1)
+
+        # Como mucho `check_seconds` con la tabla anterior
+        self.assertEqual(other.routes('booking.created')[0].webhook_secret, old_secret)
+        self.now += 1
+        self.assertEqual(other.routes('booking.created')[0].webhook_secret, 'rotado')
+
+        self.partner.status = 'suspended'
+        self.partner.save()
+        self.now += 1
+        self.assertEqual(other.routes('booking.created'), ())
+
+    def test_tables_are_reloaded_after_max_age(self):
+        other = self._other_process()
+        self.assertEqual(len(other.routes('booking.created')), 1)
+
+        # Cambio en bloque sin invalidate(): la versión no cambia
+        WebhookSubscription.objects.update(is_active=False)
+        self.now += 30
+        self.assertEqual(len(other.routes('booking.created')), 1)
+        self.now += 30
+        self.assertEqual(other.routes('booking.created'), ())
@@ -0,0 +1,217 @@
+"""
+Tests para el worker de entregas de webhooks B2B (Pilar 2)
+"""
+import json
+import threading
+import time
+from collections import Counter
+from unittest.mock import MagicMock, patch
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from api_rest.models import Partner, WebhookDelivery, WebhookEventLog, WebhookSubscription
+from api_rest.services.circuit_breaker import shared_cache
+from api_rest.services.webhook_worker import WebhookDeliveryWorker
+from api_rest.services.webhooks import DeliveryResult, webhook_dispatcher
+
+
+def fake_post(url, **kwargs):
+    response = MagicMock(status_code=500 if 'caido' in url else 200, text='ok')
+    return response
+
+
+class WebhookDeliveryWorkerTests(TestCase):
+
+    def setUp(self):
+        shared_cache.clear()  # estado de los circuit breakers
+        self.partners = [
+            Partner.objects.create(name=code, code=code, webhook_url=url)
+            for code, url in [
+                ('tours', 'https://partner.example.com/tours'),
+                ('hotel', 'https://partner.example.com/hotel'),
+                ('caido', 'https://caido.example.com/hook'),
+            ]
+        ]
+        for partner in self.partners:
+            WebhookSubscription.objects.create(partner=partner, event_type='booking.created')
+
+    @patch('requests.Session.post', side_effect=fake_post)
+    @patch('requests.post')
+    def test_dispatch_only_queues_and_worker_delivers(self, mock_post, session_post):
+        partners = webhook_dispatcher.dispatch_event('booking.created', {'reserva_id': 1})
+
+        self.assertEqual(sorted(partners), ['caido', 'hotel', 'tours'])
+        self.assertEqual(WebhookDelivery.objects.filter(status='pending').count(), 3)
+        session_post.assert_not_called()
+
+        worker = WebhookDeliveryWorker(batch_size=2, concurrency=1)
+        totals = worker.run(once=True)
+
+        self.assertEqual(totals, {'claimed': 3, 'delivered': 2, 'retrying': 1, 'failed': 0})
+        mock_post.assert_not_called()
+        statuses = dict(WebhookDelivery.objects.values_list('partner__code', 'status'))
+        self.assertEqual(statuses, {'tours': 'delivered', 'hotel': 'delivered', 'caido': 'retrying'})
+        self.assertIsNotNone(Partner.objects.get(code='tours').last_webhook_at)
+        self.assertIsNone(Partner.objects.get(code='caido').last_webhook_at)
+
+    def test_claims_are_leased_and_expired_leases_are_reclaimed(self):
+        webhook_dispatcher.dispatch_event('booking.created', {'reserva_id': 1})
+        worker = WebhookDeliveryWorker(concurrency=1, lease_seconds=60)
+
+        self.assertEqual(len(worker.claim_batch()), 3)
+        self.assertEqual(worker.claim_batch(), [])
+        self.assertEqual(WebhookDelivery.objects.filter(status='sent').count(), 3)
+
+        # Un worker caído: el lease vence y las entregas vuelven a estar disponibles
+        WebhookDelivery.objects.update(locked_until=timezone.now() - timezone.timedelta(seconds=1))
+        self.assertEqual(len(worker.claim_batch()), 3)
+
+
+class DispatchEventBulkTests(TestCase):
+
+    def subscribe(self, count, start=0):
+        for i in range(start, start + count):
+            partner = Partner.objects.create(name=f'p{i}', code=f'p{i}', webhook_url='https://partner.example.com/hook')
+            WebhookSubscription.objects.create(partner=partner, event_type='payment.success')
+
+    def queries_per_dispatch(self):
+        with CaptureQueriesContext(connection) as ctx:
+            webhook_dispatcher.dispatch_event('payment.success', {'pago_id': 1})
+        return len(ctx)
+
+    def test_fan_out_cost_does_not_grow_with_partners(self):
+        self.subscribe(2)
+        with_two = self.queries_per_dispatch()
+        self.subscribe(8, start=2)
+        self.assertEqual(self.queries_per_dispatch(), with_two)
+
+        deliveries = WebhookDelivery.objects.filter(payload__data__pago_id=1)
+        self.assertEqual(deliveries.count(), 12)
+        logs = WebhookEventLog.objects.filter(direction='outgoing')
+        self.assertEqual(
+            {log.headers['X-Delivery-ID'] for log in logs}, {str(d.id) for d in deliveries}
+        )
+
+
+class SignedBodyTests(TestCase):
+
+    def setUp(self):
+        shared_cache.clear()  # estado de los circuit breakers
+        self.partner = Partner.objects.create(
+            name='tours', code='tours', webhook_url='https://partner.example.com/tours'
+        )
+        WebhookSubscription.objects.create(partner=self.partner, event_type='booking.created')
+
+    @patch('requests.Session.post', return_value=MagicMock(status_code=503, text='down'))
+    def test_retries_resend_the_same_signed_bytes(self, session_post):
+        webhook_dispatcher.dispatch_event('booking.created', {'reserva_id': 1, 'nombre': 'Ñandú'})
+        delivery = WebhookDelivery.objects.get()
+        self.assertEqual(
+            WebhookEventLog.objects.get(direction='outgoing').signature, delivery.signature
+        )
+
+        worker = WebhookDeliveryWorker(concurrency=1)
+        worker.run(once=True)
+        WebhookDelivery.objects.update(next_retry_at=timezone.now())
+        worker.run(once=True)
+
+        self.assertEqual(session_post.call_count, 2)
+        (first_args, first), (_, second) = session_post.call_args_list
+        self.assertEqual(first_args[0], self.partner.webhook_url)
+        self.assertEqual(first['data'], delivery.body.encode('utf-8'))
+        self.assertEqual(second['data'], first['data'])
+        self.assertEqual(second['headers']['X-Signature'], first['headers']['X-Signature'])
+        self.assertEqual(
+            [first['headers']['X-Delivery-Attempt'], second['headers']['X-Delivery-Attempt']], ['1', '2']
+        )
+        self.assertTrue(
+            self.partner.verify_signature(first['data'].decode('utf-8'), first['headers']['X-Signature'])
+        )
+        self.assertEqual(json.loads(first['data']), delivery.payload)
+
+    @patch('requests.Session.post', return_value=MagicMock(status_code=200, text='ok'))
+    def test_legacy_delivery_without_body_is_serialized_once(self, mock_post):
+        payload = webhook_dispatcher._build_payload('booking.created', {'reserva_id': 2}, 'tours')
+        delivery = WebhookDelivery.objects.create(
+            partner=self.partner, event_type='booking.created', payload=payload
+        )
+
+        self.assertTrue(webhook_dispatcher._send_webhook(self.partner, payload, delivery))
+
+        delivery.refresh_from_db()
+        sent = mock_post.call_args.kwargs
+        self.assertEqual(sent['data'], delivery.body.encode('utf-8'))
+        self.assertEqual(sent['headers']['X-Signature'], delivery.signature)
+        self.assertTrue(self.partner.verify_signature(delivery.body, delivery.signature))
+
+
+class RetrySweepTests(TestCase):
+
+    def setUp(self):
+        shared_cache.clear()  # estado de los circuit breakers
+        self.partners = [
+            Partner.objects.create(name=code, code=code, webhook_url=f'https://{code}.example.com/hook')
+            for code in ('tours', 'caido')
+        ]
+
+    def add_deliveries(self, partner, count, status='retrying', due=True):
+        offset = timezone.timedelta(seconds=-1 if due else 600)
+        WebhookDelivery.objects.bulk_create([
+            WebhookDelivery(partner=partner, event_type='booking.created', payload={'event': 'booking.created'},
+                            status=status, attempts=1, next_retry_at=timezone.now() + offset)
+            for _ in range(count)
+        ])
+
+    def test_failed_retry_is_rescheduled_with_jitter(self):
+        self.add_deliveries(self.partners[0], 20)
+        for delivery in WebhookDelivery.objects.all():
+            before = timezone.now()
+            delivery.mark_as_failed('HTTP 503', response_code=503)
+            delay = (delivery.next_retry_at - before).total_seconds()
+            self.assertTrue(300 * 0.8 - 1 <= delay <= 300 * 1.2 + 1, delay)
+        delays = {d.next_retry_at for d in WebhookDelivery.objects.all()}
+        self.assertGreater(len(delays), 1)
+
+    def test_per_partner_concurrency_cap(self):
+        self.add_deliveries(self.partners[0], 6)
+        self.add_deliveries(self.partners[1], 6)
+        running, peak = Counter(), Counter()
+        lock = threading.Lock()
+
+        def slow_post(partner, payload, delivery, session=None):
+            with lock:
+                running[partner.code] += 1
+                peak[partner.code] = max(peak[partner.code], running[partner.code])
+            time.sleep(0.02)
+            with lock:
+                running[partner.code] -= 1
+            return DeliveryResult(ok=partner.code == 'tours', error_message='caído')
+
+        worker = WebhookDeliveryWorker(concurrency=6, per_partner_concurrency=2)
+        with patch.object(webhook_dispatcher, 'post_webhook', side_effect=slow_post):
+            totals = worker.run(once=True)
+
+        self.assertEqual(totals, {'claimed': 12, 'delivered': 6, 'retrying': 6, 'failed': 0})
+        self.assertEqual(peak, Counter({'tours': 2, 'caido': 2}))
+
+    @patch('requests.Session.post', side_effect=fake_post)
+    def test_retry_sweep_reports_duration_and_backlog(self, session_post):
+        self.add_deliveries(self.partners[0], 3)
+        self.add_deliveries(self.partners[1], 2)
+        self.add_deliveries(self.partners[0], 4, due=False)
+        self.add_deliveries(self.partners[0], 1, status='pending')
+
+        with self.settings(WEBHOOK_WORKER_BATCH_SIZE=2, WEBHOOK_WORKER_CONCURRENCY=1, WEBHOOK_RETRY_MAX_BATCHES=2):
+            report = webhook_dispatcher.retry_failed_deliveries()
+
+        self.assertEqual(report['batches'], 2)
+        self.assertEqual(report['claimed'], 4)
+        self.assertEqual(session_post.call_count, 4)
+        self.assertGreaterEqual(report['duration_ms'], 0)
+        # Queda un reintento vencido; los fallidos del barrido vuelven a estar programados
+        self.assertEqual(report['backlog']['due'], 1)
+        self.assertEqual(report['backlog']['scheduled'], 4 + report['retrying'])
+        self.assertEqual(report['backlog']['pending'], 1)
@@ -332,7 +332,7 @@ class EventBusServiceTests(TestCase):
         result = service.verify_partner_signature(payload, full_signature)
         self.assertTrue(result)
     
-    @patch('requests.post')
+    @patch('requests.Session.post')
     def test_send_to_n8n_success(self, mock_post):
         """Test envío exitoso a n8n"""
         from api_rest.services.event_bus import EventBusService
@@ -350,7 +350,7 @@ class EventBusServiceTests(TestCase):
         self.assertTrue(result)
         mock_post.assert_called_once()
     
-    @patch('requests.post')
+    @patch('requests.Session.post')
     def test_send_to_n8n_disabled(self, mock_post):
         """Test que no envía cuando está deshabilitado"""
         from api_rest.services.event_bus import EventBusService
@@ -363,7 +363,7 @@ class EventBusServiceTests(TestCase):
         self.assertTrue(result)  # Retorna True pero no envía
         mock_post.assert_not_called()
     
-    @patch('requests.post')
+    @patch('requests.Session.post')
     def test_emit_payment_received(self, mock_post):
         """Test emitir evento de pago recibido"""
         from api_rest.services.event_bus import EventBusService
@@ -392,7 +392,7 @@ class EventBusServiceTests(TestCase):
         call_args = mock_post.call_args
         self.assertIn('payment-handler', call_args[0][0])
     
-    @patch('requests.post')
+    @patch('requests.Session.post')
     def test_emit_mcp_message(self, mock_post):
         """Test emitir mensaje MCP"""
         from api_rest.services.event_bus import EventBusService
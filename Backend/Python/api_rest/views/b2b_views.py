@@ -38,6 +38,7 @@ from ..serializers.partner import (
     IncomingWebhookSerializer,
 )
 from ..services.webhooks import webhook_dispatcher
+from ..services.circuit_breaker import circuit_breaker
 
 logger = logging.getLogger(__name__)
 
@@ -480,7 +481,8 @@ class WebhookDeliveriesView(APIView):
     """
     GET /webhooks/b2b/deliveries
     
-    Lista el historial de entregas de webhooks.
+    Lista el historial de entregas de webhooks y el estado del circuit breaker
+    de cada partner (closed / open / half_open, fallos consecutivos y latencia).
     """
     permission_classes = [IsAdminUser]
     
@@ -497,12 +499,15 @@ class WebhookDeliveriesView(APIView):
         if status_filter:
             deliveries = deliveries.filter(status=status_filter)
         
-        deliveries = deliveries.order_by('-created_at')[:limit]
+        deliveries = deliveries.select_related('partner').order_by('-created_at')[:limit]
         serializer = WebhookDeliverySerializer(deliveries, many=True)
         
+        partner_codes = [partner_code] if partner_code else [d['partner_code'] for d in serializer.data]
+        
         return Response({
             'count': len(serializer.data),
-            'deliveries': serializer.data
+            'deliveries': serializer.data,
+            'circuits': circuit_breaker.states(partner_codes)
         })
 
 
@@ -540,16 +545,23 @@ class RetryFailedDeliveriesView(APIView):
     """
     POST /webhooks/b2b/retry
     
-    Reintenta las entregas fallidas.
+    Reintenta las entregas fallidas cuyo reintento ya venció.
+    Devuelve el resultado del barrido, su duración y el backlog restante.
     """
     permission_classes = [IsAdminUser]
     
     def post(self, request):
-        count = webhook_dispatcher.retry_failed_deliveries()
+        report = webhook_dispatcher.retry_failed_deliveries()
+        count = report['claimed']
         
         return Response({
             'status': 'success',
             'retried_count': count,
+            'delivered': report['delivered'],
+            'retrying': report['retrying'],
+            'failed': report['failed'],
+            'duration_ms': report['duration_ms'],
+            'backlog': report['backlog'],
             'message': f'{count} entregas reintentadas'
         })
 
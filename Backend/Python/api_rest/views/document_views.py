@@ -4,9 +4,9 @@ from rest_framework import viewsets, status
 from rest_framework.response import Response
 from rest_framework.parsers import MultiPartParser, FormParser
 from django.conf import settings
-import requests
 
 from .. import models, serializers
+from ..services.http_clients import http_clients
 
 
 class DocumentView(viewsets.ModelViewSet):
@@ -27,7 +27,7 @@ class DocumentView(viewsets.ModelViewSet):
                     headers = {}
                     if api_key:
                         headers['Authorization'] = f"Bearer {api_key}"
-                    resp = requests.post(ingest_url, files={'file': f}, headers=headers, timeout=30)
+                    resp = http_clients.session('orchestrator').post(ingest_url, files={'file': f}, headers=headers)
                     # optionally handle resp status
             except Exception:
                 # log exception in production
@@ -84,22 +84,9 @@ class PagoView(viewsets.ModelViewSet):
         # Notificar WebSocket
         try:
             from ..signals import notify_websocket
+            from ..services.event_payloads import PagoEventPayloads
 
-            data = {
-                'id': pago.id,
-                'reserva_id': reserva.id,
-                'monto': str(pago.monto),
-                'metodo': pago.metodo_pago,
-                'fecha': str(pago.fecha_pago),
-                'estado': pago.estado,
-                'cliente_id': reserva.cliente_id,
-            }
-
-            servicios = models.ReservaServicio.objects.filter(reserva=reserva)
-            if servicios.exists():
-                data['proveedor_id'] = servicios.first().servicio.proveedor_id
-
-            notify_websocket('payment_updated', data)
+            notify_websocket('payment_updated', PagoEventPayloads(pago).realtime)
         except Exception:
             logger.exception(
                 'No se pudo notificar WebSocket tras marcar pago'
@@ -356,7 +356,8 @@ def system_health_check(request):
         from ..services.event_bus import event_bus
         health_status['components']['event_bus'] = {
             'status': 'configured',
-            'base_url': event_bus.n8n_base_url or 'not configured'
+            'base_url': event_bus.n8n_base_url or 'not configured',
+            'queues': event_bus.stats()
         }
     except Exception as e:
         health_status['components']['event_bus'] = {
@@ -364,6 +365,10 @@ def system_health_check(request):
             'error': str(e)
         }
     
+    # Latencia de las llamadas HTTP salientes, por destino
+    from ..services.http_clients import http_clients
+    health_status['components']['outbound_http'] = http_clients.stats()
+    
     # Basic stats
     health_status['stats'] = {
         'total_reservas': Reserva.objects.count(),
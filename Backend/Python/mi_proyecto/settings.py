@@ -98,6 +98,29 @@ DATABASES = {
     }
 }
 
+# Cache
+# 'default' es la caché local de cada proceso (la de Django por defecto).
+# 'shared' guarda el estado que deben ver todos los procesos (web, dispatch_outbox,
+# deliver_webhooks): versión de las rutas de webhooks y circuit breakers. Con
+# REDIS_CACHE_URL usa Redis (recomendado: sin queries a la base de datos e incr atómico);
+# si no, la tabla django_cache de la base de datos (creada por la migración 0012).
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'django_cache',
+    },
+}
+if os.environ.get('REDIS_CACHE_URL'):
+    CACHES['shared'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ['REDIS_CACHE_URL'],
+    }
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -183,16 +206,79 @@ N8N_TIMEOUT = int(os.environ.get('N8N_TIMEOUT', '10'))
 # Habilitar/deshabilitar Event Bus
 EVENT_BUS_ENABLED = os.environ.get('EVENT_BUS_ENABLED', 'true').lower() == 'true'
 
+# Eventos async (business-events): cola en memoria enviada por un hilo en lotes
+# (dispatch_outbox espera la confirmación de cada lote). Tamaño de lote, espera máxima
+# para juntar un lote (s), capacidad de la cola y cuánto se espera si la cola está
+# llena antes de descartar el evento (s)
+EVENT_BUS_BATCHING = os.environ.get('EVENT_BUS_BATCHING', 'true').lower() == 'true'
+EVENT_BUS_BATCH_SIZE = int(os.environ.get('EVENT_BUS_BATCH_SIZE', '50'))
+EVENT_BUS_FLUSH_INTERVAL = float(os.environ.get('EVENT_BUS_FLUSH_INTERVAL', '0.5'))
+EVENT_BUS_MAX_QUEUE = int(os.environ.get('EVENT_BUS_MAX_QUEUE', '1000'))
+EVENT_BUS_PUT_TIMEOUT = float(os.environ.get('EVENT_BUS_PUT_TIMEOUT', '0.05'))
+
+# Servidor WebSocket (NestJS) que recibe los eventos del dashboard
+WEBSOCKET_SERVER_URL = os.environ.get('WEBSOCKET_SERVER_URL', 'http://localhost:4000/dashboard/emit-event')
+WEBSOCKET_TIMEOUT = int(os.environ.get('WEBSOCKET_TIMEOUT', '2'))
+
+# Outbox de eventos salientes (ver `python manage.py dispatch_outbox`):
+# eventos por lote, envíos en paralelo, intentos por evento y lease de un lote reclamado (segundos)
+OUTBOX_BATCH_SIZE = int(os.environ.get('OUTBOX_BATCH_SIZE', '100'))
+OUTBOX_CONCURRENCY = int(os.environ.get('OUTBOX_CONCURRENCY', '8'))
+OUTBOX_MAX_ATTEMPTS = int(os.environ.get('OUTBOX_MAX_ATTEMPTS', '5'))
+OUTBOX_LEASE_SECONDS = int(os.environ.get('OUTBOX_LEASE_SECONDS', '60'))
+
 # Partner Integration
 PARTNER_WEBHOOK_SECRET = os.environ.get('PARTNER_WEBHOOK_SECRET', 'your-partner-secret')
 PARTNER_WEBHOOK_URL = os.environ.get('PARTNER_WEBHOOK_URL', '')
 
+# Worker de entregas B2B (ver `python manage.py deliver_webhooks`):
+# entregas por lote, envíos en paralelo (en total y por partner) y lease de un lote reclamado (segundos)
+WEBHOOK_WORKER_BATCH_SIZE = int(os.environ.get('WEBHOOK_WORKER_BATCH_SIZE', '50'))
+WEBHOOK_WORKER_CONCURRENCY = int(os.environ.get('WEBHOOK_WORKER_CONCURRENCY', '8'))
+WEBHOOK_WORKER_PER_PARTNER_CONCURRENCY = int(os.environ.get('WEBHOOK_WORKER_PER_PARTNER_CONCURRENCY', '2'))
+WEBHOOK_WORKER_LEASE_SECONDS = int(os.environ.get('WEBHOOK_WORKER_LEASE_SECONDS', '120'))
+# Lotes como mucho por barrido de reintentos (POST /webhooks/b2b/retry)
+WEBHOOK_RETRY_MAX_BATCHES = int(os.environ.get('WEBHOOK_RETRY_MAX_BATCHES', '10'))
+# Circuit breaker por partner: fallos consecutivos que lo abren, espera antes de
+# probar de nuevo (segundos) y peticiones de prueba en half-open
+WEBHOOK_CIRCUIT_FAILURE_THRESHOLD = int(os.environ.get('WEBHOOK_CIRCUIT_FAILURE_THRESHOLD', '5'))
+WEBHOOK_CIRCUIT_RESET_SECONDS = int(os.environ.get('WEBHOOK_CIRCUIT_RESET_SECONDS', '60'))
+WEBHOOK_CIRCUIT_HALF_OPEN_PROBES = int(os.environ.get('WEBHOOK_CIRCUIT_HALF_OPEN_PROBES', '1'))
+# Cada cuántos segundos un proceso comprueba en la caché 'shared' si cambiaron las suscripciones a webhooks,
+# y antigüedad máxima de su tabla de rutas aunque la versión no haya cambiado
+WEBHOOK_ROUTES_CHECK_SECONDS = float(os.environ.get('WEBHOOK_ROUTES_CHECK_SECONDS', '1.0'))
+WEBHOOK_ROUTES_MAX_AGE_SECONDS = float(os.environ.get('WEBHOOK_ROUTES_MAX_AGE_SECONDS', '60'))
+
 # Payment Gateway Webhooks
 STRIPE_WEBHOOK_SECRET = os.environ.get('STRIPE_WEBHOOK_SECRET', '')
 PAYU_MERCHANT_ID = os.environ.get('PAYU_MERCHANT_ID', '')
 PAYU_API_KEY = os.environ.get('PAYU_API_KEY', '')
 MERCADOPAGO_ACCESS_TOKEN = os.environ.get('MERCADOPAGO_ACCESS_TOKEN', '')
 
+
+# HTTP saliente por destino (ver api_rest/services/http_clients.py): timeout (s),
+# hosts con pool, conexiones por host y reintentos. Cada valor se puede cambiar con
+# HTTP_<DESTINO>_TIMEOUT, HTTP_<DESTINO>_POOL_SIZE y HTTP_<DESTINO>_RETRIES
+def _outbound_http(name, timeout, pool_maxsize=10, retries=1, pool_connections=10):
+    prefix = f'HTTP_{name.upper()}_'
+    return {
+        'timeout': float(os.environ.get(prefix + 'TIMEOUT', timeout)),
+        'pool_connections': pool_connections,
+        'pool_maxsize': int(os.environ.get(prefix + 'POOL_SIZE', pool_maxsize)),
+        'retries': int(os.environ.get(prefix + 'RETRIES', retries)),
+    }
+
+
+OUTBOUND_HTTP = {
+    'n8n': _outbound_http('n8n', N8N_TIMEOUT, retries=2),
+    'dashboard': _outbound_http('dashboard', WEBSOCKET_TIMEOUT),
+    # Un pool por partner; los fallos los reintenta el worker de webhooks
+    'partners': _outbound_http('partners', 10, pool_maxsize=WEBHOOK_WORKER_CONCURRENCY, retries=0,
+                               pool_connections=100),
+    'orchestrator': _outbound_http('orchestrator', 30, pool_maxsize=4),
+    'payments': _outbound_http('payments', 30, pool_maxsize=4),
+}
+
 # Telegram Bot
 TELEGRAM_BOT_TOKEN = os.environ.get('TELEGRAM_BOT_TOKEN', '')
 
@@ -225,3 +311,5 @@ if not JWT_PUBLIC_KEY:
     raise RuntimeError("JWT_PUBLIC_KEY no está definida en el entorno. Verifica el archivo .env")
 JWT_PUBLIC_KEY = JWT_PUBLIC_KEY.replace("\\n", "\n")
 
+# Máximo de tokens JWT ya verificados que se cachean en memoria (0 desactiva la caché)
+JWT_VERIFIED_TOKEN_CACHE_SIZE = int(os.environ.get('JWT_VERIFIED_TOKEN_CACHE_SIZE', '1024'))